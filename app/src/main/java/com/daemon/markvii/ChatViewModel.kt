@@ -12,6 +12,7 @@ import com.daemon.markvii.data.ChatSession
 import com.daemon.markvii.data.ErrorInfo
 import com.daemon.markvii.data.FirestoreChatManager
 import com.daemon.markvii.data.GeminiClient
+import com.daemon.markvii.data.SerializableChat
 import kotlinx.coroutines.Dispatchers
 import kotlinx.coroutines.flow.MutableStateFlow
 import kotlinx.coroutines.flow.asStateFlow
@@ -764,6 +765,18 @@ class ChatViewModel : ViewModel() {
         }
     }
     
+    /**
+     * Messages of a session with the turns the pruning job archived put back
+     * in front (shown only; saving never writes them back to the session)
+     */
+    private suspend fun withArchive(session: ChatSession): List<SerializableChat> {
+        val archived = FirestoreChatManager.loadArchivedMessages(session).getOrElse { error ->
+            Log.e("ChatViewModel", "Failed to load older messages: ${error.message}")
+            emptyList()
+        }
+        return archived + session.messages
+    }
+    
     /**
      * Switch to a different session
      */
@@ -771,7 +784,9 @@ class ChatViewModel : ViewModel() {
         viewModelScope.launch(Dispatchers.IO) {
             val sessionInMemory = _chatState.value.chatSessions.find { it.id == sessionId }
             if (sessionInMemory != null) {
-                val chatList = FirestoreChatManager.serializableToChatList(sessionInMemory.messages)
+                // Sessions from the drawer list still hold image references
+                val session = FirestoreChatManager.resolveImages(sessionInMemory)
+                val chatList = FirestoreChatManager.serializableToChatList(withArchive(session))
                 _chatState.update {
                     it.copy(
                         chatList = chatList.toMutableList(),
@@ -788,7 +803,7 @@ class ChatViewModel : ViewModel() {
             if (currentUser != null) {
                 val result = FirestoreChatManager.loadSession(sessionId)
                 result.onSuccess { session ->
-                    val chatList = FirestoreChatManager.serializableToChatList(session.messages)
+                    val chatList = FirestoreChatManager.serializableToChatList(withArchive(session))
                     
                     _chatState.update {
                         it.copy(
@@ -857,7 +872,7 @@ class ChatViewModel : ViewModel() {
         viewModelScope.launch {
             val currentUser = _chatState.value.currentUser
             if (currentUser != null) {
-                val result = FirestoreChatManager.deleteSession(sessionId)
+                val result = FirestoreChatManager.deleteSession(sessionId, currentUser.uid)
                 result.onSuccess {
                     _chatState.update { state ->
                         val updatedSessions = state.chatSessions.filter { it.id != sessionId }
@@ -93,6 +93,9 @@ object ChatData {
             // Use a map to deduplicate models by base ID (without :free suffix)
             val uniqueModels = mutableMapOf<String, ModelInfo>()
             
+            // Exception keys are looked up per model, so build the set once
+            val exceptionKeys = exceptionModelsMap.keys.mapTo(HashSet()) { FirebaseConfigManager.exceptionKey(it) }
+            
             allModels.forEach { model ->
                 if (model.id.isBlank()) return@forEach
                 val pricing = model.pricing
@@ -112,10 +115,7 @@ object ChatData {
                 val modelIdWithoutFree = model.id.replace(":free", "", ignoreCase = true)
                 
                 // Check if this model (without :free) is in exception list
-                val isInExceptionList = exceptionModelsMap.keys.any { exceptionId ->
-                    val exceptionIdWithoutFree = exceptionId.replace(":free", "", ignoreCase = true)
-                    exceptionIdWithoutFree.equals(modelIdWithoutFree, ignoreCase = true)
-                }
+                val isInExceptionList = FirebaseConfigManager.exceptionKey(model.id) in exceptionKeys
                 
                 // Determine final API model ID
                 val cleanApiModel = if (isInExceptionList) {
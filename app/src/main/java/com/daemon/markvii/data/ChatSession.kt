@@ -13,7 +13,8 @@ data class ChatSession(
     val title: String = "New Chat", // Auto-generated from first message
     val createdAt: Timestamp = Timestamp.now(),
     val updatedAt: Timestamp = Timestamp.now(),
-    val messages: List<SerializableChat> = emptyList()
+    val messages: List<SerializableChat> = emptyList(),
+    val archivedMessages: Int = 0 // Older turns moved to chat_sessions/<id>/archive by the pruning job
 ) {
     /**
      * Convert to Firestore-compatible map
@@ -25,7 +26,8 @@ data class ChatSession(
             "title" to title,
             "createdAt" to createdAt,
             "updatedAt" to updatedAt,
-            "messages" to messages.map { it.toMap() }
+            "messages" to messages.map { it.toMap() },
+            "archivedMessages" to archivedMessages
         )
     }
     
@@ -44,7 +46,8 @@ data class ChatSession(
                 title = map["title"] as? String ?: "New Chat",
                 createdAt = map["createdAt"] as? Timestamp ?: Timestamp.now(),
                 updatedAt = map["updatedAt"] as? Timestamp ?: Timestamp.now(),
-                messages = messages
+                messages = messages,
+                archivedMessages = (map["archivedMessages"] as? Number)?.toInt() ?: 0
             )
         }
     }
@@ -52,7 +55,8 @@ data class ChatSession(
 
 /**
  * Serializable version of Chat for Firestore storage
- * (Bitmaps are stored as Base64 strings)
+ * (Bitmaps are stored as Base64 strings, or in Firestore as a reference to a
+ * chat_blobs document named by the SHA-256 of the image bytes)
  */
 data class SerializableChat(
     val prompt: String,
@@ -60,7 +64,8 @@ data class SerializableChat(
     val isFromUser: Boolean,
     val modelUsed: String,
     val isStreaming: Boolean,
-    val id: String
+    val id: String,
+    val bitmapRef: String? = null
 ) {
     fun toMap(): Map<String, Any?> {
         return mapOf(
@@ -69,7 +74,8 @@ data class SerializableChat(
             "isFromUser" to isFromUser,
             "modelUsed" to modelUsed,
             "isStreaming" to isStreaming,
-            "id" to id
+            "id" to id,
+            "bitmapRef" to bitmapRef
         )
     }
     
@@ -81,7 +87,8 @@ data class SerializableChat(
                 isFromUser = map["isFromUser"] as? Boolean ?: false,
                 modelUsed = map["modelUsed"] as? String ?: "",
                 isStreaming = map["isStreaming"] as? Boolean ?: false,
-                id = map["id"] as? String ?: UUID.randomUUID().toString()
+                id = map["id"] as? String ?: UUID.randomUUID().toString(),
+                bitmapRef = map["bitmapRef"] as? String
             )
         }
     }
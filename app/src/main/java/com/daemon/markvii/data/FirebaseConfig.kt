@@ -11,7 +11,23 @@ data class FirebaseModelInfo(
     val apiModel: String = "",
     val isAvailable: Boolean = true,
     val order: Int = 0,
-    val isPro: Boolean = false
+    val isPro: Boolean = false,
+    // Optional metadata, only present when the catalog CSV sets it
+    val provider: String? = null,
+    val contextLength: Int? = null,
+    val promptPrice: Double? = null,      // USD per prompt token
+    val completionPrice: Double? = null,  // USD per completion token
+    val capabilities: List<String> = emptyList()
+)
+
+/**
+ * Aggregated usage of one model (app_config/model_usage)
+ */
+@Keep
+data class ModelUsageInfo(
+    val model: String = "",
+    val messages: Long = 0,
+    val sessions: Long = 0
 )
 
 /**
@@ -1,7 +1,14 @@
 package com.daemon.markvii.data
 
 import android.util.Log
+import com.google.firebase.firestore.DocumentSnapshot
+import com.google.firebase.firestore.FieldPath
+import com.google.firebase.firestore.FieldValue
 import com.google.firebase.firestore.FirebaseFirestore
+import com.google.firebase.firestore.FirebaseFirestoreException
+import kotlinx.coroutines.async
+import kotlinx.coroutines.awaitAll
+import kotlinx.coroutines.coroutineScope
 import kotlinx.coroutines.tasks.await
 import kotlinx.coroutines.flow.MutableStateFlow
 import kotlinx.coroutines.flow.StateFlow
@@ -18,6 +25,11 @@ object FirebaseConfigManager {
     private const val DOC_MODELS = "models"
     private const val DOC_GEMINI_MODELS = "gemini_models"
     private const val DOC_API_KEYS = "api_keys"
+    private const val DOC_MODEL_USAGE = "model_usage"
+    private const val DOC_EXP_MODELS = "exp_models"
+    // Map of exception models keyed by exceptionKey(), next to the "list" mirror
+    private const val FIELD_EXP_BY_ID = "byId"
+    private const val COLLECTION_SHARDS = "shards"
     
     private val firestore = FirebaseFirestore.getInstance()
     
@@ -80,6 +92,63 @@ object FirebaseConfigManager {
         }
     }
     
+    /**
+     * Convert one catalog entry to FirebaseModelInfo; extended fields are optional
+     */
+    private fun toModelInfo(modelMap: Map<String, Any>): FirebaseModelInfo {
+        @Suppress("UNCHECKED_CAST")
+        return FirebaseModelInfo(
+            displayName = modelMap["displayName"] as? String ?: "",
+            apiModel = modelMap["apiModel"] as? String ?: "",
+            isAvailable = modelMap["isAvailable"] as? Boolean ?: true,
+            order = (modelMap["order"] as? Long)?.toInt() ?: 0,
+            isPro = modelMap["isPro"] as? Boolean ?: false,
+            provider = modelMap["provider"] as? String,
+            contextLength = (modelMap["contextLength"] as? Number)?.toInt(),
+            promptPrice = (modelMap["promptPrice"] as? Number)?.toDouble(),
+            completionPrice = (modelMap["completionPrice"] as? Number)?.toDouble(),
+            capabilities = (modelMap["capabilities"] as? List<String>) ?: emptyList()
+        )
+    }
+    
+    /**
+     * Read the "list" of a models document
+     * Large catalogs are published as a manifest plus shard documents
+     * (app_config/<doc>/shards/<id>), which are fetched in parallel
+     */
+    private suspend fun readModelList(document: DocumentSnapshot): List<Map<String, Any>> {
+        if (document.getBoolean("sharded") != true) {
+            @Suppress("UNCHECKED_CAST")
+            return document.get("list") as? List<Map<String, Any>> ?: emptyList()
+        }
+        
+        @Suppress("UNCHECKED_CAST")
+        val shardIds = document.get("shards") as? List<String> ?: emptyList()
+        val shards = coroutineScope {
+            shardIds.map { shardId ->
+                async {
+                    document.reference.collection(COLLECTION_SHARDS)
+                        .document(shardId)
+                        .get()
+                        .await()
+                }
+            }.awaitAll()
+        }
+        
+        // Shards carry the published positions of their rows
+        val placed = mutableListOf<Pair<Long, Map<String, Any>>>()
+        shards.forEach { shard ->
+            @Suppress("UNCHECKED_CAST")
+            val rows = shard.get("list") as? List<Map<String, Any>> ?: emptyList()
+            @Suppress("UNCHECKED_CAST")
+            val positions = shard.get("positions") as? List<Long>
+            rows.forEachIndexed { index, row ->
+                placed.add((positions?.getOrNull(index) ?: placed.size.toLong()) to row)
+            }
+        }
+        return placed.sortedBy { it.first }.map { it.second }
+    }
+    
     /**
      * Fetch models from Firebase Firestore
      */
@@ -92,18 +161,10 @@ object FirebaseConfigManager {
             
             if (document.exists()) {
                 val modelsList = mutableListOf<FirebaseModelInfo>()
-                @Suppress("UNCHECKED_CAST")
-                val modelsData = document.get("list") as? List<Map<String, Any>>
+                val modelsData = readModelList(document)
                 
                 modelsData?.forEach { modelMap ->
-                    val model = FirebaseModelInfo(
-                        displayName = modelMap["displayName"] as? String ?: "",
-                        apiModel = modelMap["apiModel"] as? String ?: "",
-                        isAvailable = modelMap["isAvailable"] as? Boolean ?: true,
-                        order = (modelMap["order"] as? Long)?.toInt() ?: 0,
-                        isPro = modelMap["isPro"] as? Boolean ?: false
-                    )
-                    modelsList.add(model)
+                    modelsList.add(toModelInfo(modelMap))
                 }
                 
                 // Sort by order
@@ -131,18 +192,10 @@ object FirebaseConfigManager {
             
             if (document.exists()) {
                 val modelsList = mutableListOf<FirebaseModelInfo>()
-                @Suppress("UNCHECKED_CAST")
-                val modelsData = document.get("list") as? List<Map<String, Any>>
+                val modelsData = readModelList(document)
                 
                 modelsData?.forEach { modelMap ->
-                    val model = FirebaseModelInfo(
-                        displayName = modelMap["displayName"] as? String ?: "",
-                        apiModel = modelMap["apiModel"] as? String ?: "",
-                        isAvailable = modelMap["isAvailable"] as? Boolean ?: true,
-                        order = (modelMap["order"] as? Long)?.toInt() ?: 0,
-                        isPro = modelMap["isPro"] as? Boolean ?: false
-                    )
-                    modelsList.add(model)
+                    modelsList.add(toModelInfo(modelMap))
                 }
                 
                 // Sort by order
@@ -186,6 +239,32 @@ object FirebaseConfigManager {
         }
     }
     
+    /**
+     * Fetch the most used models, as aggregated by update_models/aggregate_model_usage.py
+     * (the list is already sorted by reply count; empty if it was never published)
+     */
+    suspend fun fetchModelUsage(limit: Int = 5): List<ModelUsageInfo> {
+        return try {
+            val document = firestore.collection(COLLECTION_CONFIG)
+                .document(DOC_MODEL_USAGE)
+                .get()
+                .await()
+            
+            @Suppress("UNCHECKED_CAST")
+            val usageList = document.get("list") as? List<Map<String, Any>> ?: emptyList()
+            usageList.take(limit).map { entry ->
+                ModelUsageInfo(
+                    model = entry["model"] as? String ?: "",
+                    messages = entry["messages"] as? Long ?: 0,
+                    sessions = entry["sessions"] as? Long ?: 0
+                )
+            }
+        } catch (e: Exception) {
+            Log.e(TAG, "Error fetching model usage", e)
+            emptyList()
+        }
+    }
+    
     /**
      * Fetch exception models list from Firebase
      * These models require ":free" postfix to work properly
@@ -193,15 +272,22 @@ object FirebaseConfigManager {
     private suspend fun fetchExceptionModels() {
         try {
             val document = firestore.collection(COLLECTION_CONFIG)
-                .document("exp_models")
+                .document(DOC_EXP_MODELS)
                 .get()
                 .await()
             
             if (document.exists()) {
+                // Older app versions only write the list, newer ones write both
+                val modelsMap = linkedMapOf<String, String>()
+                @Suppress("UNCHECKED_CAST")
+                val modelsList = document.get("list") as? List<Map<String, Any?>> ?: emptyList()
                 @Suppress("UNCHECKED_CAST")
-                val modelsList = document.get("list") as? List<Map<String, String>> ?: emptyList()
-                val modelsMap = modelsList.associate { 
-                    (it["modelId"] ?: "") to (it["modelName"] ?: "")
+                val byId = document.get(FIELD_EXP_BY_ID) as? Map<String, Map<String, Any?>> ?: emptyMap()
+                (modelsList + byId.values).forEach { entry ->
+                    val modelId = entry["modelId"] as? String ?: return@forEach
+                    if (modelId.isNotBlank()) {
+                        modelsMap.putIfAbsent(modelId, entry["modelName"] as? String ?: "")
+                    }
                 }
                 _exceptionModels.value = modelsMap
             } else {
@@ -213,56 +299,47 @@ object FirebaseConfigManager {
         }
     }
     
+    /**
+     * Key of an exception model in the byId map: its id without ":free", lower-cased
+     * Must match exp_key() in update_models/catalog_sync.py
+     */
+    fun exceptionKey(modelId: String): String {
+        return modelId.replace(":free", "", ignoreCase = true).trim().lowercase()
+    }
+    
     /**
      * Add a model to the exception list in Firebase
      * This model will keep its ":free" postfix
      */
     suspend fun addExceptionModel(modelId: String, modelName: String) {
+        if (isExceptionModel(modelId)) {
+            return
+        }
         try {
-            // Get current list from Firestore directly to ensure we have latest data
-            val document = firestore.collection(COLLECTION_CONFIG)
-                .document("exp_models")
-                .get()
-                .await()
+            val entry = hashMapOf("modelId" to modelId, "modelName" to modelName)
+            val docRef = firestore.collection(COLLECTION_CONFIG).document(DOC_EXP_MODELS)
             
-            val currentMap = if (document.exists()) {
-                @Suppress("UNCHECKED_CAST")
-                val existingList = document.get("list") as? List<Map<String, String>> ?: emptyList()
-                existingList.associate { 
-                    (it["modelId"] ?: "") to (it["modelName"] ?: "")
-                }.toMutableMap()
-            } else {
-                mutableMapOf<String, String>()
-            }
-            
-            // Check if already exists
-            if (currentMap.containsKey(modelId)) {
-                return
-            }
-            
-            currentMap[modelId] = modelName
-            
-            // Convert to list of maps for Firebase
-            val listForFirebase = currentMap.map { (id, name) ->
-                hashMapOf(
-                    "modelId" to id,
-                    "modelName" to name
+            // Field-level writes instead of rewriting the whole list, so devices
+            // adding exceptions at the same time do not overwrite each other
+            try {
+                docRef.update(
+                    FieldPath.of(FIELD_EXP_BY_ID, exceptionKey(modelId)),
+                    entry + ("addedAt" to FieldValue.serverTimestamp()),
+                    FieldPath.of("list"), FieldValue.arrayUnion(entry),
+                    FieldPath.of("lastUpdated"), FieldValue.serverTimestamp()
+                ).await()
+            } catch (e: FirebaseFirestoreException) {
+                if (e.code != FirebaseFirestoreException.Code.NOT_FOUND) throw e
+                val data = hashMapOf(
+                    "list" to listOf(entry),
+                    FIELD_EXP_BY_ID to mapOf(exceptionKey(modelId) to entry + ("addedAt" to FieldValue.serverTimestamp())),
+                    "lastUpdated" to FieldValue.serverTimestamp()
                 )
+                docRef.set(data, com.google.firebase.firestore.SetOptions.merge()).await()
             }
             
-            val data = hashMapOf(
-                "list" to listForFirebase,
-                "lastUpdated" to com.google.firebase.Timestamp.now()
-            )
-            
-            // Use set with merge to create or update the document
-            firestore.collection(COLLECTION_CONFIG)
-                .document("exp_models")
-                .set(data, com.google.firebase.firestore.SetOptions.merge())
-                .await()
-            
             // Update local state
-            _exceptionModels.value = currentMap
+            _exceptionModels.value = _exceptionModels.value + (modelId to modelName)
         } catch (e: Exception) {
             Log.e(TAG, "Error adding exception model: $modelId", e)
         }
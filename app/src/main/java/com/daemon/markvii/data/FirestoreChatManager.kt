@@ -5,11 +5,20 @@ import android.graphics.BitmapFactory
 import android.util.Base64
 import android.util.Log
 import com.google.firebase.Timestamp
+import com.google.firebase.firestore.FieldValue
 import com.google.firebase.firestore.FirebaseFirestore
+import com.google.firebase.firestore.FirebaseFirestoreException
 import com.google.firebase.firestore.Query
+import kotlinx.coroutines.async
+import kotlinx.coroutines.awaitAll
+import kotlinx.coroutines.coroutineScope
 import kotlinx.coroutines.tasks.await
 import java.io.ByteArrayOutputStream
+import java.security.MessageDigest
+import java.util.Collections
 import java.util.UUID
+import java.util.WeakHashMap
+import java.util.concurrent.ConcurrentHashMap
 
 /**
  * Manages chat sessions in Firestore
@@ -19,9 +28,23 @@ object FirestoreChatManager {
     
     private const val TAG = "FirestoreChatManager"
     private const val COLLECTION_SESSIONS = "chat_sessions"
+    private const val COLLECTION_BLOBS = "chat_blobs"
+    private const val COLLECTION_ARCHIVE = "archive"
     
     private val firestore = FirebaseFirestore.getInstance()
     
+    // Image data by SHA-256, for blobs already fetched or uploaded
+    private val blobCache = ConcurrentHashMap<String, String>()
+    
+    // Blob reference of bitmaps loaded from (or saved to) chat_blobs
+    private val bitmapRefs: MutableMap<Bitmap, String> = Collections.synchronizedMap(WeakHashMap())
+    
+    // blobKey() of blobs known to list the user in userIds (read or stored by them)
+    private val blobUsers: MutableSet<String> = ConcurrentHashMap.newKeySet()
+    
+    // Ids of messages loaded from a session's archive; they are shown but never saved back
+    private val archivedIds: MutableSet<String> = ConcurrentHashMap.newKeySet()
+    
     /**
      * Create a new chat session for a user
      */
@@ -51,6 +74,8 @@ object FirestoreChatManager {
     
     /**
      * Load all sessions for a user, ordered by most recent
+     * (images stay as chat_blobs references until the session is opened,
+     * see resolveImages)
      */
     suspend fun loadUserSessions(userId: String): Result<List<ChatSession>> {
         return try {
@@ -91,7 +116,7 @@ object FirestoreChatManager {
                 return Result.failure(Exception("SESSION_NOT_FOUND|Session not found: $sessionId"))
             }
             
-            val session = ChatSession.fromMap(doc.data ?: emptyMap())
+            val session = resolveImages(ChatSession.fromMap(doc.data ?: emptyMap()))
             Log.d(TAG, "Loaded session: $sessionId")
             Result.success(session)
         } catch (e: Exception) {
@@ -105,15 +130,19 @@ object FirestoreChatManager {
      */
     suspend fun saveSession(session: ChatSession, chatList: List<Chat>): Result<Unit> {
         return try {
-            // Convert Chat objects to SerializableChat
-            val serializableMessages = chatList.map { chat ->
+            // Images go to chat_blobs first; the session only keeps references
+            val uploaded = mutableMapOf<Bitmap, Pair<String, String>>()
+            
+            // Convert Chat objects to SerializableChat (archived turns stay in the archive)
+            val serializableMessages = chatList.filterNot { it.id in archivedIds }.map { chat ->
                 SerializableChat(
                     prompt = chat.prompt,
-                    bitmapBase64 = chat.bitmap?.let { bitmapToBase64(it) },
+                    bitmapBase64 = null,
                     isFromUser = chat.isFromUser,
                     modelUsed = chat.modelUsed,
                     isStreaming = false, // Don't persist streaming state
-                    id = chat.id
+                    id = chat.id,
+                    bitmapRef = chat.bitmap?.let { blobRefFor(it, session.userId, uploaded) }
                 )
             }
             
@@ -131,10 +160,21 @@ object FirestoreChatManager {
                 messages = serializableMessages
             )
             
-            firestore.collection(COLLECTION_SESSIONS)
-                .document(session.id)
-                .set(updatedSession.toMap())
-                .await()
+            // New blobs are stored before the session that references them
+            coroutineScope {
+                uploaded.values.distinctBy { it.first }.map { (ref, base64) ->
+                    async { storeBlob(ref, base64, session.userId) }
+                }.awaitAll()
+            }
+            
+            firestore.collection(COLLECTION_SESSIONS).document(session.id).set(updatedSession.toMap()).await()
+            
+            // Only remember blobs once they are actually stored
+            uploaded.forEach { (bitmap, blob) ->
+                blobCache[blob.first] = blob.second
+                bitmapRefs[bitmap] = blob.first
+                blobUsers.add(blobKey(blob.first, session.userId))
+            }
             
             Log.d(TAG, "Saved session: ${session.id} with ${chatList.size} messages")
             Result.success(Unit)
@@ -145,15 +185,50 @@ object FirestoreChatManager {
     }
     
     /**
-     * Delete a session
+     * Load the older turns of a session that the pruning job moved to its
+     * archive subcollection, oldest first (empty when nothing was archived)
      */
-    suspend fun deleteSession(sessionId: String): Result<Unit> {
+    suspend fun loadArchivedMessages(session: ChatSession): Result<List<SerializableChat>> {
+        if (session.archivedMessages == 0) return Result.success(emptyList())
         return try {
-            firestore.collection(COLLECTION_SESSIONS)
-                .document(sessionId)
-                .delete()
+            val snapshot = firestore.collection(COLLECTION_SESSIONS)
+                .document(session.id)
+                .collection(COLLECTION_ARCHIVE)
+                .whereEqualTo("userId", session.userId)
+                .get()
+                .await()
+            
+            @Suppress("UNCHECKED_CAST")
+            val messages = snapshot.documents
+                .sortedBy { it.getLong("firstIndex") ?: 0L }
+                .flatMap { doc -> doc.get("messages") as? List<Map<String, Any>> ?: emptyList() }
+                .map { SerializableChat.fromMap(it) }
+            archivedIds.addAll(messages.map { it.id })
+            
+            Log.d(TAG, "Loaded ${messages.size} archived messages of session: ${session.id}")
+            Result.success(resolveImages(session.copy(messages = messages)).messages)
+        } catch (e: Exception) {
+            Log.e(TAG, "Failed to load archived messages: ${session.id}", e)
+            Result.failure(Exception("FIRESTORE_ERROR|Failed to load older messages: ${e.message}"))
+        }
+    }
+    
+    /**
+     * Delete a session together with its archived turns
+     */
+    suspend fun deleteSession(sessionId: String, userId: String): Result<Unit> {
+        return try {
+            val session = firestore.collection(COLLECTION_SESSIONS).document(sessionId)
+            val archive = session.collection(COLLECTION_ARCHIVE)
+                .whereEqualTo("userId", userId)
+                .get()
                 .await()
             
+            val batch = firestore.batch()
+            archive.documents.forEach { batch.delete(it.reference) }
+            batch.delete(session)
+            batch.commit().await()
+            
             Log.d(TAG, "Deleted session: $sessionId")
             Result.success(Unit)
         } catch (e: Exception) {
@@ -191,7 +266,8 @@ object FirestoreChatManager {
                 isFromUser = chat.isFromUser,
                 modelUsed = chat.modelUsed,
                 isStreaming = false,
-                id = chat.id
+                id = chat.id,
+                bitmapRef = chat.bitmap?.let { bitmapRefs[it] }
             )
         }
     }
@@ -201,9 +277,13 @@ object FirestoreChatManager {
      */
     fun serializableToChatList(serializableList: List<SerializableChat>): List<Chat> {
         return serializableList.map { serializable ->
+            val bitmap = serializable.bitmapBase64?.let { base64ToBitmap(it) }
+            if (bitmap != null && serializable.bitmapRef != null) {
+                bitmapRefs[bitmap] = serializable.bitmapRef
+            }
             Chat(
                 prompt = serializable.prompt,
-                bitmap = serializable.bitmapBase64?.let { base64ToBitmap(it) },
+                bitmap = bitmap,
                 isFromUser = serializable.isFromUser,
                 modelUsed = serializable.modelUsed,
                 isStreaming = false,
@@ -212,6 +292,110 @@ object FirestoreChatManager {
         }
     }
     
+    /**
+     * Fill in the images of a session loaded with loadUserSessions
+     * (only the blobs not fetched yet are read)
+     */
+    suspend fun resolveImages(session: ChatSession): ChatSession {
+        return resolveBlobs(listOf(session)).first()
+    }
+    
+    /**
+     * Fill in bitmapBase64 for messages that only hold a chat_blobs reference
+     * (each blob is fetched once, in parallel, and cached for later loads)
+     */
+    private suspend fun resolveBlobs(sessions: List<ChatSession>): List<ChatSession> {
+        val missing = sessions.flatMap { it.messages }
+            .mapNotNull { message -> message.bitmapRef.takeIf { message.bitmapBase64 == null } }
+            .distinct()
+            .filterNot { blobCache.containsKey(it) }
+        
+        if (missing.isNotEmpty()) {
+            coroutineScope {
+                missing.map { ref ->
+                    async {
+                        try {
+                            val doc = firestore.collection(COLLECTION_BLOBS).document(ref).get().await()
+                            doc.getString("data")?.let { blobCache[ref] = it }
+                            // Readable, so the rules already list the reader in userIds
+                            sessions.filter { session -> session.messages.any { it.bitmapRef == ref } }
+                                .forEach { blobUsers.add(blobKey(ref, it.userId)) }
+                        } catch (e: Exception) {
+                            Log.e(TAG, "Failed to load image blob: $ref", e)
+                        }
+                    }
+                }.awaitAll()
+            }
+        }
+        
+        return sessions.map { session ->
+            session.copy(messages = session.messages.map { message ->
+                if (message.bitmapBase64 == null && message.bitmapRef != null) {
+                    message.copy(bitmapBase64 = blobCache[message.bitmapRef])
+                } else {
+                    message
+                }
+            })
+        }
+    }
+    
+    private fun blobKey(ref: String, userId: String) = "$userId/$ref"
+    
+    /**
+     * Return the chat_blobs reference of a bitmap; blobs not known to list
+     * userId yet are collected in uploaded for storeBlob
+     */
+    private fun blobRefFor(
+        bitmap: Bitmap,
+        userId: String,
+        uploaded: MutableMap<Bitmap, Pair<String, String>>
+    ): String {
+        bitmapRefs[bitmap]?.takeIf { blobKey(it, userId) in blobUsers }?.let { return it }
+        uploaded[bitmap]?.let { return it.first }
+        
+        val base64 = bitmapToBase64(bitmap)
+        val bytes = Base64.decode(base64, Base64.NO_WRAP)
+        val ref = MessageDigest.getInstance("SHA-256").digest(bytes)
+            .joinToString("") { "%02x".format(it) }
+        
+        if (blobKey(ref, userId) !in blobUsers) {
+            uploaded[bitmap] = ref to base64
+        }
+        return ref
+    }
+    
+    /**
+     * Create a chat_blobs document, or only add userId to it when it already
+     * exists (an existing blob is never rewritten, as the rules require)
+     *
+     * The create is a plain set: the rules only accept it as a create, so an
+     * existing blob (possibly stored by another user, and unreadable to this
+     * one) is rejected and falls back to adding userId. The rules reject
+     * that too when userId is already listed; the blob is then readable.
+     */
+    private suspend fun storeBlob(ref: String, base64: String, userId: String) {
+        val blob = firestore.collection(COLLECTION_BLOBS).document(ref)
+        try {
+            blob.set(
+                mapOf(
+                    "data" to base64,
+                    "size" to Base64.decode(base64, Base64.NO_WRAP).size,
+                    "userIds" to listOf(userId),
+                    "createdAt" to FieldValue.serverTimestamp()
+                )
+            ).await()
+        } catch (e: FirebaseFirestoreException) {
+            if (e.code != FirebaseFirestoreException.Code.PERMISSION_DENIED) throw e
+            try {
+                blob.update("userIds", FieldValue.arrayUnion(userId)).await()
+            } catch (again: FirebaseFirestoreException) {
+                if (again.code != FirebaseFirestoreException.Code.PERMISSION_DENIED) throw again
+                // Fails again unless userId is already listed
+                blob.get().await()
+            }
+        }
+    }
+    
     /**
      * Convert Bitmap to Base64 string for storage
      */
@@ -20,6 +20,8 @@ import androidx.compose.ui.platform.LocalContext
 import androidx.compose.ui.text.font.FontWeight
 import androidx.compose.ui.unit.dp
 import androidx.compose.ui.unit.sp
+import com.daemon.markvii.data.FirebaseConfigManager
+import com.daemon.markvii.data.ModelUsageInfo
 import com.daemon.markvii.data.OpenRouterClient
 import com.daemon.markvii.data.OpenRouterKeyInfo
 import com.daemon.markvii.data.UserApiPreferences
@@ -43,6 +45,13 @@ fun UsagesScreen(onBackClick: () -> Unit) {
     var openRouterUsage by remember { mutableStateOf<OpenRouterKeyInfo?>(null) }
     var isLoadingOpenRouter by remember { mutableStateOf(false) }
 
+    // Most used models across all users (published by the usage aggregator)
+    var modelUsage by remember { mutableStateOf<List<ModelUsageInfo>>(emptyList()) }
+
+    LaunchedEffect(Unit) {
+        modelUsage = FirebaseConfigManager.fetchModelUsage()
+    }
+
     LaunchedEffect(openRouterKey, isOpenRouterEnabled) {
         if (isOpenRouterEnabled && openRouterKey.isNotBlank()) {
             isLoadingOpenRouter = true
@@ -261,6 +270,32 @@ fun UsagesScreen(onBackClick: () -> Unit) {
                 }
             }
 
+            // Most Used Models Card
+            if (modelUsage.isNotEmpty()) {
+                Card(
+                    modifier = Modifier.fillMaxWidth(),
+                    colors = CardDefaults.cardColors(containerColor = appColors.surfaceVariant),
+                    shape = RoundedCornerShape(16.dp)
+                ) {
+                    Column(
+                        modifier = Modifier
+                            .fillMaxWidth()
+                            .padding(16.dp),
+                        verticalArrangement = Arrangement.spacedBy(12.dp)
+                    ) {
+                        Text(
+                            text = "Most Used Models",
+                            fontSize = 18.sp,
+                            fontWeight = FontWeight.Bold,
+                            color = MaterialTheme.colorScheme.onSurface
+                        )
+                        modelUsage.forEach { usage ->
+                            UsageRow(usage.model.substringAfterLast('/'), "${usage.messages} replies")
+                        }
+                    }
+                }
+            }
+
             if (!isGeminiEnabled && !isOpenRouterEnabled && !isGroqEnabled) {
                 Box(
                     modifier = Modifier.fillMaxSize(),
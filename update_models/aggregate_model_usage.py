@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Model Usage Aggregator
+Tallies which models people actually use and publishes the totals to
+app_config/model_usage
+
+For every model (the modelUsed of assistant replies) the document holds:
+
+    {"model", "messages", "sessions", "lastUsed"}
+
+in a "list" sorted by message count, plus overall totals.
+
+Runs are incremental: only sessions whose updatedAt is at or after the
+previous run's high-water mark are read. Because a session is rewritten as
+a whole whenever it changes, the tallies of every session are kept in a
+local state file and replaced (not added) when the session is read again,
+so nothing is counted twice. The turns prune_chat_sessions --max-messages
+moved to a session's archive are read back and counted with the session.
+Deleted sessions are only dropped by a --full rebuild. The document is only
+written when the totals changed.
+
+updatedAt is set by the client, so each run re-reads the last
+--overlap-minutes before the cursor (sessions committed late or with a
+clock behind; re-reading only replaces their tallies), and the cursor never
+moves past the start of the run (clocks ahead).
+
+Usage:
+    python aggregate_model_usage.py                       # Incremental update
+    python aggregate_model_usage.py --full                # Rebuild from scratch
+    python aggregate_model_usage.py --dry-run             # Print, do not publish
+    python aggregate_model_usage.py --emulator localhost:8080
+
+Requirements:
+    pip install firebase-admin
+"""
+
+import argparse
+import os
+import sys
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from firebase_common import SCRIPT_DIR, initialize_firebase, use_emulator
+from catalog_sync import COLLECTION_PATH, HASH_FIELD, compute_catalog_hash
+from document_store import field_values
+from export_chat_history import with_archive
+from firestore_jobs import DEFAULT_PAGE_SIZE, Checkpoint, iter_pages
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+SESSIONS_COLLECTION = "chat_sessions"
+USAGE_DOCUMENT = "model_usage"
+
+# Per-session tallies and the high-water mark (git-ignored)
+DEFAULT_STATE_FILE = os.path.join(SCRIPT_DIR, ".usage_state.json")
+
+# Re-read before the cursor, for sessions committed late or with a skewed clock
+DEFAULT_OVERLAP_MINUTES = 15
+
+# ============================================================================
+# FUNCTIONS
+# ============================================================================
+
+def to_iso(value):
+    """Firestore timestamp as an ISO string in UTC (None stays None)"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+def tally_session(data):
+    """Return {"models": {model: replies}, "updatedAt": iso} for one session"""
+    models = Counter(
+        message.get('modelUsed') for message in data.get('messages') or []
+        if isinstance(message, dict) and not message.get('isFromUser') and message.get('modelUsed')
+    )
+    return {"models": dict(models), "updatedAt": to_iso(data.get('updatedAt'))}
+
+def scan_sessions(db, sessions, since=None, page_size=DEFAULT_PAGE_SIZE):
+    """Read sessions updated at or after since (ISO) and refresh their tallies
+
+    Returns (sessions read, newest updatedAt seen as ISO or since).
+    """
+    filters = [("updatedAt", ">=", datetime.fromisoformat(since))] if since else None
+    read = 0
+    newest = since
+    pages = iter_pages(db.collection(SESSIONS_COLLECTION), page_size, filters=filters, order_by="updatedAt")
+    for snapshots in pages:
+        for snapshot in snapshots:
+            tally = tally_session(with_archive(snapshot, snapshot.to_dict() or {}))
+            if tally["models"]:
+                sessions[snapshot.id] = tally
+            else:
+                sessions.pop(snapshot.id, None)
+            read += 1
+            if tally["updatedAt"] and (newest is None or tally["updatedAt"] > newest):
+                newest = tally["updatedAt"]
+        print(f"   … {read} sessions read")
+    return read, newest
+
+def build_usage(sessions):
+    """Combine per-session tallies into the published usage list"""
+    usage = {}
+    for tally in sessions.values():
+        for model, count in tally["models"].items():
+            entry = usage.setdefault(model, {"model": model, "messages": 0, "sessions": 0, "lastUsed": None})
+            entry["messages"] += count
+            entry["sessions"] += 1
+            if tally["updatedAt"] and (entry["lastUsed"] is None or tally["updatedAt"] > entry["lastUsed"]):
+                entry["lastUsed"] = tally["updatedAt"]
+    return sorted(usage.values(), key=lambda entry: (-entry["messages"], entry["model"]))
+
+def print_usage(usage, limit=20):
+    """Print the most used models"""
+    total = sum(entry["messages"] for entry in usage) or 1
+    print(f"\n📊 Usage of {len(usage)} models:")
+    for entry in usage[:limit]:
+        print(f"   {entry['messages']:8d} replies {entry['messages'] / total * 100:5.1f}%  "
+              f"{entry['sessions']:6d} sessions  {entry['model']}")
+    if len(usage) > limit:
+        print(f"   ... and {len(usage) - limit} more")
+
+def publish_usage(db, usage, session_count):
+    """Write app_config/model_usage unless it already holds the same totals"""
+    usage_hash = compute_catalog_hash(usage)
+    doc_ref = db.collection(COLLECTION_PATH).document(USAGE_DOCUMENT)
+    current = doc_ref.get()
+    if current.exists and (current.to_dict() or {}).get(HASH_FIELD) == usage_hash:
+        print(f"✅ {COLLECTION_PATH}/{USAGE_DOCUMENT} is already up to date - nothing to write")
+        return False
+
+    # lastUsed is stored as a real timestamp so clients can sort and format it
+    doc_ref.set({
+        "list": [dict(entry, lastUsed=datetime.fromisoformat(entry["lastUsed"]) if entry["lastUsed"] else None)
+                 for entry in usage],
+        "totals": {
+            "messages": sum(entry["messages"] for entry in usage),
+            "sessions": session_count,
+            "models": len(usage)
+        },
+        HASH_FIELD: usage_hash,
+        "lastUpdated": field_values(db).SERVER_TIMESTAMP
+    })
+    print(f"✅ Published {COLLECTION_PATH}/{USAGE_DOCUMENT} ({len(usage)} models)")
+    return True
+
+def update_usage(db, args):
+    """Scan the sessions updated since the saved cursor, publish the totals and save the state
+
+    Returns the usage list.
+    """
+    checkpoint = Checkpoint(args.state_file)
+    state = {} if args.full else checkpoint.load()
+    sessions = state.get("sessions", {})
+    cursor = state.get("cursor")
+    since = to_iso(datetime.fromisoformat(cursor) - timedelta(minutes=args.overlap_minutes)) if cursor else None
+    print(f"\n🔎 Reading sessions updated since {since}" if since else "\n🔎 Reading every session")
+
+    started = to_iso(datetime.now(timezone.utc))
+    read, newest = scan_sessions(db, sessions, since, args.page_size)
+    # A client clock running ahead must not push the cursor past sessions still to come
+    if newest and (cursor is None or newest > cursor):
+        cursor = min(newest, started)
+    usage = build_usage(sessions)
+    print_usage(usage)
+
+    if args.dry_run:
+        print("\n✅ Dry run complete (nothing published, state not saved)")
+        return usage
+
+    publish_usage(db, usage, len(sessions))
+    checkpoint.save({"cursor": cursor, "sessions": sessions})
+    print(f"💾 {read} sessions read this run, {len(sessions)} tracked")
+    return usage
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Aggregate per-model usage from chat_sessions into app_config/model_usage"
+    )
+    parser.add_argument("--full", action="store_true",
+                        help="Ignore the saved state and rescan every session")
+    parser.add_argument("--dry-run", action="store_true", help="Print the totals without publishing")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE,
+                        help=f"Sessions read per query page (default: {DEFAULT_PAGE_SIZE})")
+    parser.add_argument("--state-file", default=DEFAULT_STATE_FILE,
+                        help="Where per-session tallies and the cursor are kept")
+    parser.add_argument("--overlap-minutes", type=float, default=DEFAULT_OVERLAP_MINUTES,
+                        help=f"Re-read this long before the cursor for late sessions "
+                             f"(default: {DEFAULT_OVERLAP_MINUTES})")
+    parser.add_argument("--emulator", metavar="HOST:PORT",
+                        help="Use the Firestore emulator instead of production")
+    return parser.parse_args(argv)
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main(argv=None):
+    """Main function"""
+
+    print("\n" + "="*60)
+    print("📈 Model Usage Aggregator for Mark VII")
+    print("="*60)
+
+    args = parse_args(argv)
+    if args.emulator:
+        use_emulator(args.emulator)
+    db = initialize_firebase()
+    update_usage(db, args)
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n👋 Interrupted - state was not saved, the next run repeats this scan")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ Unexpected error: {e}")
+        sys.exit(1)
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Catalog Pipeline Benchmark
+Times every stage of the CSV → Firestore pipeline on synthetic catalogs and
+compares the results with a stored baseline
+
+For each catalog size (50, 1k, 10k and 100k rows by default) a synthetic
+models CSV is generated from a fixed seed, together with a "current"
+catalog that differs by a few percent (renamed, removed, added and moved
+rows), so every run measures the same work. The stages are:
+
+    load        load_models_from_csv()
+    validate    validate_models_csv()
+    hash        compute_catalog_hash()
+    diff        diff_catalogs() against the current catalog
+    plan        choose_layout() + plan_catalog_update()
+    serialize   shard split and the JSON encoding of every document written
+    publish     publish_catalogs() round trip      (only with --emulator or --memory)
+    verify      verify_catalogs() round trip       (only with --emulator or --memory)
+
+Every stage is timed --repeat times (best run kept) and run once more under
+tracemalloc for its peak memory. With --baseline, a stage that is slower or
+uses more memory than the baseline by more than --tolerance fails the run,
+and so does a missing baseline file. pipeline_baseline.json is committed;
+refresh it with --save-baseline (on the machine that runs --baseline) when
+a change is expected to move the numbers.
+Publishing is only ever done against the Firestore emulator, or with
+--memory against document_store.MemoryStore, which times the engine's own
+work without any network round trips.
+
+Usage:
+    python benchmark_pipeline.py                           # All sizes, offline stages
+    python benchmark_pipeline.py --sizes 50 1000           # Selected sizes
+    python benchmark_pipeline.py --emulator localhost:8080 # Include write/verify round trips
+    python benchmark_pipeline.py --memory                  # Write/verify against an in-memory store
+    python benchmark_pipeline.py --save-baseline           # Store the results as the baseline
+    python benchmark_pipeline.py --baseline                # Fail on regressions
+
+Requirements:
+    pip install firebase-admin   (only for --emulator)
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import catalog_cache
+from firebase_common import SCRIPT_DIR, initialize_firebase, use_emulator
+from document_store import MemoryStore
+from catalog_shards import DEFAULT_SHARD_ROWS, choose_layout, split_models
+from catalog_sync import (
+    compute_catalog_hash, diff_catalogs, load_models_from_csv, plan_catalog_update,
+    publish_catalogs, save_models_to_csv, validate_models_csv, verify_catalogs
+)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+DEFAULT_SIZES = [50, 1000, 10000, 100000]
+DEFAULT_REPEAT = 3
+SEED = 7
+
+PROVIDERS = ["openai", "anthropic", "google", "meta-llama", "mistralai", "deepseek", "qwen", "x-ai",
+             "cohere", "nvidia", "microsoft", "amazon"]
+
+# Share of the current catalog that differs from the CSV
+CHANGE_RATE = 0.05
+
+# Committed baseline (regenerate with --save-baseline on the machine that compares)
+DEFAULT_BASELINE = os.path.join(SCRIPT_DIR, "pipeline_baseline.json")
+
+# A stage only regresses if it is slower by the tolerance AND by this much,
+# so sub-millisecond stages do not fail on timer noise
+DEFAULT_TOLERANCE = 0.25
+MIN_SECONDS_DELTA = 0.005
+MIN_BYTES_DELTA = 256 * 1024
+
+# ============================================================================
+# FUNCTIONS
+# ============================================================================
+
+def synthetic_models(rows, seed=SEED):
+    """Generate a reproducible catalog of rows models"""
+    rng = random.Random(seed)
+    models = []
+    for i in range(rows):
+        provider = PROVIDERS[i % len(PROVIDERS)]
+        size = rng.choice(["mini", "small", "medium", "large", "xl"])
+        models.append({
+            "displayName": f"{provider.title()} Model {i} {size.title()}",
+            "apiModel": f"{provider}/model-{i:06d}-{size}",
+            "isAvailable": rng.random() > 0.1,
+            "order": i + 1,
+            "isPro": rng.random() < 0.3
+        })
+    return models
+
+def perturb(models, rate=CHANGE_RATE, seed=SEED):
+    """Return a "currently published" copy of models with rate of its rows changed
+
+    A quarter each is renamed, removed, replaced by an unknown model and
+    moved, so the diff sees every kind of change.
+    """
+    rng = random.Random(seed + 1)
+    current = [dict(model) for model in models]
+    count = max(1, int(len(current) * rate / 4))
+    for model in rng.sample(current, count):
+        model["displayName"] += " (old)"
+    removed = {model["apiModel"] for model in rng.sample(current, count)}
+    current = [model for model in current if model["apiModel"] not in removed]
+    for i in range(count):
+        current.append({**current[0], "apiModel": f"retired/model-{i:06d}", "order": len(current) + 1})
+    for _ in range(count):
+        current.insert(rng.randrange(len(current)), current.pop(rng.randrange(len(current))))
+    return current
+
+def measure(function, repeat):
+    """Best wall time over repeat runs and the peak traced memory of one more run
+
+    Returns (seconds, peak_bytes, result of the last run).
+    """
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    try:
+        result = function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak, result
+
+def quiet(function):
+    """Wrap function so the pipeline's progress prints do not end up in the timings"""
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return function()
+    return run
+
+def benchmark_size(rows, work_dir, repeat, db=None):
+    """Run every stage for one catalog size; returns {stage: {seconds, peakBytes}}"""
+    models = synthetic_models(rows)
+    current = perturb(models)
+    csv_file = os.path.join(work_dir, f"models_{rows}.csv")
+    with contextlib.redirect_stdout(io.StringIO()):
+        save_models_to_csv(csv_file, models)
+
+    state = {}
+
+    def plan():
+        state["plan"] = plan_catalog_update({"list": current}, models, layout=choose_layout(models))
+        return state["plan"]
+
+    stages = [
+        ("load", lambda: load_models_from_csv(csv_file)),
+        ("validate", lambda: validate_models_csv(csv_file)),
+        ("hash", lambda: compute_catalog_hash(models)),
+        ("diff", lambda: diff_catalogs(current, models)),
+        ("plan", plan),
+        ("serialize", lambda: [
+            len(json.dumps(shard, separators=(',', ':'), ensure_ascii=False).encode('utf-8'))
+            for shard in (split_models(models, state["plan"]["layout"], DEFAULT_SHARD_ROWS)
+                          if state["plan"]["layout"] else [models])
+        ]),
+    ]
+    if db is not None:
+        document = f"benchmark_{rows}"
+        target = {"document": document, "models": models, "current": None}
+
+        def publish():
+            # Every round plans against an empty document, so each one is a full write
+            target["plan"] = plan_catalog_update(None, models, layout=choose_layout(models))
+            if not publish_catalogs(db, [target]):
+                raise RuntimeError("nothing was written")
+
+        def verify():
+            if not verify_catalogs(db, [target]):
+                raise RuntimeError("read-back did not match")
+
+        stages.append(("publish", publish))
+        stages.append(("verify", verify))
+
+    results = {}
+    for name, function in stages:
+        try:
+            seconds, peak, _ = measure(quiet(function), repeat)
+        except Exception as e:
+            # Reported with the results; later stages may depend on this one
+            print(f"   ❌ {name} failed: {e}")
+            results[name] = {"error": str(e)}
+            break
+        results[name] = {"seconds": seconds, "peakBytes": peak}
+    return results
+
+def format_seconds(seconds):
+    """Seconds as a short human readable duration"""
+    if seconds < 1:
+        return f"{seconds * 1000:.1f}ms"
+    return f"{seconds:.2f}s"
+
+def format_bytes(size):
+    """Bytes as a short human readable size"""
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Return the regressions of results against a baseline as printable strings"""
+    regressions = []
+    for rows, stages in results.items():
+        for stage, measured in stages.items():
+            expected = baseline.get(rows, {}).get(stage)
+            if not expected or "error" in expected:
+                continue
+            if "error" in measured:
+                regressions.append(f"{rows} rows / {stage}: failed ({measured['error']})")
+                continue
+            if (measured["seconds"] > expected["seconds"] * (1 + tolerance)
+                    and measured["seconds"] - expected["seconds"] > MIN_SECONDS_DELTA):
+                regressions.append(f"{rows} rows / {stage}: {format_seconds(measured['seconds'])} "
+                                   f"(baseline {format_seconds(expected['seconds'])})")
+            if (measured["peakBytes"] > expected["peakBytes"] * (1 + tolerance)
+                    and measured["peakBytes"] - expected["peakBytes"] > MIN_BYTES_DELTA):
+                regressions.append(f"{rows} rows / {stage}: peak {format_bytes(measured['peakBytes'])} "
+                                   f"(baseline {format_bytes(expected['peakBytes'])})")
+    return regressions
+
+def print_results(results, baseline=None):
+    """Print one table row per size and stage, with the change against the baseline"""
+    print(f"\n📊 {'rows':>7s}  {'stage':10s} {'time':>9s} {'peak mem':>9s}  vs baseline")
+    for rows, stages in results.items():
+        for stage, measured in stages.items():
+            if "error" in measured:
+                print(f"   {rows:>7s}  {stage:10s} ❌ {measured['error']}")
+                continue
+            expected = (baseline or {}).get(rows, {}).get(stage)
+            change = ""
+            if expected and expected.get("seconds"):
+                change = f"{(measured['seconds'] / expected['seconds'] - 1) * 100:+.0f}% time"
+            print(f"   {rows:>7s}  {stage:10s} {format_seconds(measured['seconds']):>9s} "
+                  f"{format_bytes(measured['peakBytes']):>9s}  {change}")
+
+def load_baseline(path):
+    """Return the stored baseline results, or None"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file).get("results")
+
+def save_baseline(path, results, args):
+    """Store results as the new baseline"""
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump({
+            "python": sys.version.split()[0],
+            "repeat": args.repeat,
+            "emulator": bool(args.emulator),
+            "memory": args.memory,
+            "results": results
+        }, file, indent=2, sort_keys=True)
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the CSV → Firestore catalog pipeline on synthetic catalogs"
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="Catalog sizes in rows (default: 50 1000 10000 100000)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help=f"Timed runs per stage, the fastest is kept (default: {DEFAULT_REPEAT})")
+    parser.add_argument("--emulator", metavar="HOST:PORT",
+                        help="Also time publish/verify round trips against the Firestore emulator")
+    parser.add_argument("--memory", action="store_true",
+                        help="Also time publish/verify against an in-memory document store")
+    parser.add_argument("--baseline", nargs="?", const=DEFAULT_BASELINE, metavar="FILE",
+                        help="Compare with a baseline and fail on regressions")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, metavar="FILE",
+                        help="Store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"Allowed slowdown/growth before failing (default: {DEFAULT_TOLERANCE:g})")
+    args = parser.parse_args(argv)
+    if args.emulator and args.memory:
+        parser.error("--emulator and --memory cannot be combined")
+    return args
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main(argv=None):
+    """Main function"""
+
+    print("\n" + "="*60)
+    print("⏱️ Catalog Pipeline Benchmark for Mark VII")
+    print("="*60)
+
+    args = parse_args(argv)
+    # Fail before the (long) run rather than after it
+    if args.baseline and not os.path.exists(args.baseline):
+        print(f"❌ No baseline at {args.baseline} - run with --save-baseline first")
+        sys.exit(1)
+
+    db = None
+    if args.emulator:
+        use_emulator(args.emulator)
+        db = initialize_firebase()
+    elif args.memory:
+        db = MemoryStore()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        # Round trips read documents back; keep their snapshots out of the real cache
+        catalog_cache.CACHE_DIR = os.path.join(work_dir, "cache")
+        results = {}
+        for rows in args.sizes:
+            print(f"\n🏗️ {rows} rows...")
+            results[str(rows)] = benchmark_size(rows, work_dir, args.repeat, db)
+
+    baseline = load_baseline(args.baseline) if args.baseline else None
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results, args)
+        print(f"\n💾 Baseline saved to {args.save_baseline}")
+
+    failed = [f"{rows} rows / {stage}" for rows, stages in results.items()
+              for stage, measured in stages.items() if "error" in measured]
+    if failed:
+        print(f"\n❌ Failed stages: {', '.join(failed)}")
+
+    if args.baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} REGRESSION(S) against {os.path.basename(args.baseline)}:")
+            for regression in regressions:
+                print(f"   ❌ {regression}")
+            sys.exit(1)
+        print(f"\n✅ No regressions (tolerance {args.tolerance:.0%})")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n👋 Interrupted by user. Goodbye!")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ Unexpected error: {e}")
+        sys.exit(1)
@@ -0,0 +1,179 @@
+"""
+Catalog Sync API
+The catalog publisher as a library, for services, tests and benchmarks
+
+    from catalog_api import CatalogSync
+    from document_store import open_store
+
+    sync = CatalogSync(open_store("memory"), author="release-service")
+    sync.load({"models": "models.csv", "gemini_models": entries})
+    plans = sync.plan()      # {document: plan}, nothing written yet
+    sync.apply()             # one atomic batch; returns how many catalogs were written
+    sync.verify()            # {document: {"ok", "problem", "entries", "version"}}
+
+update_firebase_catalogs.py runs these steps through CatalogSync; the
+command line only adds arguments, prompts and output on top. Nothing here
+reads sys.argv, asks for input or exits: invalid input raises CatalogError
+with every problem found, and store errors reach the caller unchanged.
+Progress messages (shard counts, snapshot use, cache warnings) go to the
+report callable, which drops them by default; pass report=print or a
+logger method to see them.
+
+The store is anything with the document store API (see document_store): a
+Firestore client, the emulator or the in-memory MemoryStore. The local
+snapshots of catalog_cache are only read and written with cache=True.
+
+Requirements:
+    pip install firebase-admin (not for the memory backend)
+"""
+
+from catalog_readers import source_exists
+from catalog_shards import DEFAULT_SHARD_ROWS, choose_layout
+from catalog_sync import (
+    CATALOGS, check_catalogs, exp_entries, exp_map_updates, merge_exp_models, plan_catalog_update,
+    publish_catalogs, read_catalogs, validate_exp_models, validate_models_csv
+)
+
+# ============================================================================
+# FUNCTIONS
+# ============================================================================
+
+def quiet(message):
+    """Reporter that drops every message (the CatalogSync default)"""
+
+class CatalogError(ValueError):
+    """A catalog source is invalid; errors (and warnings) list every problem"""
+
+    def __init__(self, name, errors, warnings=()):
+        more = f" (and {len(errors) - 1} more)" if len(errors) > 1 else ""
+        super().__init__(f"{name}: {errors[0]}{more}")
+        self.name = name
+        self.errors = list(errors)
+        self.warnings = list(warnings)
+
+def load_target(catalog, source=None, fmt=None):
+    """Load one catalog into a target {catalog, document, entries, warnings}
+
+    source defaults to the catalog's CSV and can be any catalog_readers
+    source, including a list of entries. The exception catalog is optional:
+    None is returned when its file does not exist. Raises CatalogError.
+    """
+    source = catalog["csv"] if source is None else source
+    fmt = fmt or catalog.get("format")
+    if catalog["kind"] == "exp":
+        if not source_exists(source):
+            return None
+        entries, errors = validate_exp_models(source, fmt)
+        warnings = []
+    else:
+        entries, errors, warnings = validate_models_csv(source, catalog["label"], fmt)
+    if errors:
+        raise CatalogError(catalog["name"], errors, warnings)
+    return {"catalog": catalog, "document": catalog["document"], "entries": entries, "warnings": warnings}
+
+def plan_target(db, target, current_data, shard_by="auto", shard_rows=DEFAULT_SHARD_ROWS):
+    """Plan the publish of a loaded target against its current document data"""
+    target["current"] = current_data
+    if target["catalog"]["kind"] == "exp":
+        # Keep the entries devices added at runtime
+        target["models"] = merge_exp_models(exp_entries(current_data), target["entries"])
+        target["plan"] = plan_catalog_update(current_data, target["models"], key='modelId')
+        target["fields"] = exp_map_updates(current_data, target["models"], db)
+    else:
+        target["models"] = target["entries"]
+        target["shardRows"] = shard_rows
+        layout = choose_layout(target["models"], shard_by)
+        target["plan"] = plan_catalog_update(current_data, target["models"], layout=layout)
+    return target
+
+class CatalogSync:
+    """Loads, plans, applies and verifies catalogs against one document store"""
+
+    def __init__(self, store, catalogs=None, author=None, shard_by="auto", shard_rows=DEFAULT_SHARD_ROWS,
+                 project=None, cache=False, report=None):
+        self.store = store
+        self.catalogs = catalogs or CATALOGS
+        self.author = author
+        self.shard_by = shard_by
+        self.shard_rows = shard_rows
+        self.project = project
+        self.cache = cache
+        self.report = report or quiet
+        self.targets = []
+        self.planned = False
+
+    def load(self, sources=None, formats=None):
+        """Load catalogs and return their targets
+
+        sources maps catalog names to a file, "-" or a list of entries; only
+        those catalogs are loaded. Without sources every catalog is loaded
+        from its default CSV. formats maps names to a catalog_readers format.
+        """
+        names = {catalog["name"] for catalog in self.catalogs}
+        unknown = sorted(set(sources or {}) - names)
+        if unknown:
+            raise ValueError(f"unknown catalog(s): {', '.join(unknown)} (use {', '.join(sorted(names))})")
+
+        targets = []
+        for catalog in self.catalogs:
+            if sources and catalog["name"] not in sources:
+                continue
+            target = load_target(catalog, (sources or {}).get(catalog["name"]), (formats or {}).get(catalog["name"]))
+            if target is not None:
+                targets.append(target)
+        self.targets = targets
+        self.planned = False
+        return targets
+
+    def plan(self):
+        """Read the current documents with one get_all() and plan every loaded catalog
+
+        Returns {document: plan}. Nothing is written.
+        """
+        if not self.targets:
+            raise RuntimeError("nothing to plan - call load() first")
+        current = read_catalogs(self.store, [target["document"] for target in self.targets],
+                                use_cache=self.cache, project=self.project, keep_snapshots=self.cache,
+                                report=self.report)
+        for target in self.targets:
+            plan_target(self.store, target, current.get(target["document"]), self.shard_by, self.shard_rows)
+        self.planned = True
+        return {target["document"]: target["plan"] for target in self.targets}
+
+    @property
+    def changed(self):
+        """Planned targets that need a write"""
+        return [target for target in self.targets if "plan" in target and target["plan"]["needsWrite"]]
+
+    def apply(self):
+        """Publish every changed catalog in one atomic batch
+
+        Returns how many catalogs were written (0 when nothing changed; probe
+        measurements of unchanged catalogs are still merged in). A plan is
+        only applied once; plan() again before the next apply().
+        """
+        if not self.planned:
+            raise RuntimeError("nothing planned - call plan() first")
+        self.planned = False
+        return publish_catalogs(self.store, self.targets, self.author, self.report)
+
+    def verify(self):
+        """Read back the catalogs apply() wrote
+
+        Returns {document: {"ok", "problem", "entries", "version"}}.
+        """
+        return check_catalogs(self.store, self.targets, self.project, keep_snapshots=self.cache,
+                              report=self.report)
+
+    def sync(self, sources=None, formats=None):
+        """load(), plan(), apply() and verify() in one call
+
+        Returns {"plans", "written", "verified"}; verified is False when a
+        written catalog did not read back intact.
+        """
+        self.load(sources, formats)
+        plans = self.plan()
+        written = self.apply() if self.changed else 0
+        results = self.verify() if written else {}
+        return {"plans": plans, "written": written,
+                "verified": all(result["ok"] for result in results.values())}
@@ -0,0 +1,120 @@
+"""
+Local Catalog Snapshots
+Keeps the last known copy of each app_config document on disk
+
+Every remote read stores a snapshot together with the document's
+update_time. Later reads still fetch each document (one billed read, which
+carries the update_time) but reuse the snapshot when it still matches, so
+repeated --list and plan runs skip the shard reads of sharded catalogs.
+Unsharded catalogs save nothing online: the snapshots are there for
+offline modes such as --plan, which diff the CSVs against them without
+touching Firestore and print how old they are, and for --list when
+Firestore cannot be reached.
+
+Runs that publish to several Firebase projects keep each project's
+snapshots in a subdirectory named after it.
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Snapshot directory (git-ignored)
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".catalog_cache")
+
+# Snapshots older than this get a staleness warning when used offline
+STALE_AFTER_SECONDS = 24 * 60 * 60
+
+# ============================================================================
+# FUNCTIONS
+# ============================================================================
+
+def snapshot_path(document, project=None):
+    """Path of the snapshot file of a document (of a named project)"""
+    if project:
+        return os.path.join(CACHE_DIR, project, f"{document}.json")
+    return os.path.join(CACHE_DIR, f"{document}.json")
+
+def timestamp_key(value):
+    """Normalize a Firestore update_time (or a cached string) for comparison"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def save_snapshot(document, data, update_time=None, project=None, report=print):
+    """Store the latest known data of a document (None removes the snapshot)
+
+    Failures are only reported (through report), never raised.
+    """
+    try:
+        path = snapshot_path(document, project)
+        if data is None:
+            if os.path.exists(path):
+                os.remove(path)
+            return True
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {
+            "document": document,
+            "updateTime": timestamp_key(update_time),
+            "cachedAt": time.time(),
+            "data": data
+        }
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            # Timestamps (lastUpdated) are stored as strings
+            json.dump(entry, file, ensure_ascii=False, default=str)
+        os.replace(temp_path, path)
+        return True
+    except Exception as e:
+        report(f"⚠️ Warning: Could not cache {document}: {e}")
+        return False
+
+def load_snapshot_entry(document, project=None, report=print):
+    """Return the cached {updateTime, cachedAt, data} of a document, or None"""
+    try:
+        with open(snapshot_path(document, project), 'r', encoding='utf-8') as file:
+            entry = json.load(file)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        report(f"⚠️ Warning: Could not read cached {document}: {e}")
+        return None
+
+    if "data" not in entry:
+        # Snapshot written before update_time was recorded
+        entry = {"document": document, "updateTime": None, "cachedAt": None, "data": entry}
+    return entry
+
+def load_snapshot(document, project=None):
+    """Return the cached data of a document, or None if there is no snapshot"""
+    entry = load_snapshot_entry(document, project)
+    return entry["data"] if entry else None
+
+def is_fresh(entry, update_time):
+    """Return True if a snapshot matches the document's current update_time"""
+    return bool(entry and entry.get("updateTime") and entry["updateTime"] == timestamp_key(update_time))
+
+def format_age(seconds):
+    """Human readable age ("3m", "5h", "2d")"""
+    if seconds < 3600:
+        return f"{int(seconds // 60)}m"
+    if seconds < 86400:
+        return f"{int(seconds // 3600)}h"
+    return f"{int(seconds // 86400)}d"
+
+def describe_snapshot(entry):
+    """One-line age of a snapshot, with a warning prefix once it is stale"""
+    cached_at = entry.get("cachedAt") if entry else None
+    if not cached_at:
+        return "⚠️ cached at an unknown time"
+    age = max(0.0, time.time() - cached_at)
+    prefix = "⚠️ stale, " if age > STALE_AFTER_SECONDS else ""
+    return f"{prefix}cached {format_age(age)} ago"
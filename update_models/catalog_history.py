@@ -0,0 +1,155 @@
+"""
+Catalog History
+Keeps every published catalog version so a bad publish can be rolled back
+
+Each publish adds one document to a history subcollection, in the same
+batch as the catalog itself:
+
+    app_config/<document>/history/v<N>   {version, catalogHash, author, publishedAt,
+                                          entries, diff, snapshot, previousVersion}
+
+snapshot is the gzip-compressed JSON of the published list, so a version
+can be restored exactly without the CSV it came from. diff lists the
+added, removed, changed and reordered keys against the previous version.
+Only the newest HISTORY_KEEP versions are kept; the one that falls out is
+deleted by the same batch, so no extra reads are needed.
+
+Requirements:
+    pip install firebase-admin (only for the functions that write)
+"""
+
+import getpass
+import gzip
+import json
+import os
+import socket
+
+from run_report import count, count_query
+from document_store import field_values
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Subcollection under each catalog document
+HISTORY_COLLECTION = "history"
+
+# Versions kept per catalog
+HISTORY_KEEP = 50
+
+# Snapshots above this (compressed) size are left out; the diff is still kept
+MAX_SNAPSHOT_BYTES = 900 * 1024
+
+# Keys listed per diff category; counts are always complete
+MAX_DIFF_KEYS = 100
+
+# Fields read when listing history (everything but the snapshot)
+SUMMARY_FIELDS = ["version", "catalogHash", "author", "publishedAt", "entries", "diff",
+                  "previousVersion", "rollbackOf"]
+
+# ============================================================================
+# FUNCTIONS
+# ============================================================================
+
+def history_id(version):
+    """Document id of a version, zero-padded so ids sort by version"""
+    return f"v{version:08d}"
+
+def default_author():
+    """Author recorded with a publish: $CATALOG_AUTHOR, else user@host"""
+    author = os.environ.get("CATALOG_AUTHOR")
+    if author:
+        return author
+    try:
+        return f"{getpass.getuser()}@{socket.gethostname()}"
+    except Exception:
+        return socket.gethostname()
+
+def encode_snapshot(models):
+    """gzip-compressed canonical JSON of a model list (mtime 0, so deterministic)"""
+    data = json.dumps(models, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return gzip.compress(data, mtime=0)
+
+def decode_snapshot(blob):
+    """Model list stored by encode_snapshot()"""
+    return json.loads(gzip.decompress(bytes(blob)).decode('utf-8'))
+
+def summarize_diff(diff):
+    """Firestore-friendly form of a catalog diff: counts plus (capped) key lists"""
+    summary = {}
+    for kind in ("added", "removed", "changed", "reordered"):
+        keys = list(diff.get(kind) or [])
+        summary[kind] = len(keys)
+        if keys:
+            summary[f"{kind}Keys"] = keys[:MAX_DIFF_KEYS]
+    return summary
+
+def add_history_write(batch, db, collection_path, document, models, plan, previous_version,
+                      author=None, extra=None, report=print):
+    """Add the history entry of a publish (and drop the oldest kept one) to a batch
+
+    Returns the size of the stored snapshot, or None when it was too
+    large to store (which is reported through report).
+    """
+    history = db.collection(collection_path).document(document).collection(HISTORY_COLLECTION)
+    version = plan["catalogVersion"]
+    snapshot = encode_snapshot(models)
+    entry = {
+        "version": version,
+        "catalogHash": plan["catalogHash"],
+        "author": author or default_author(),
+        "publishedAt": field_values(db).SERVER_TIMESTAMP,
+        "entries": len(models),
+        "diff": summarize_diff(plan["diff"]),
+        "previousVersion": previous_version or 0,
+        **(extra or {})
+    }
+    stored = len(snapshot) <= MAX_SNAPSHOT_BYTES
+    if stored:
+        entry["snapshot"] = snapshot
+    else:
+        report(f"⚠️ {document} v{version}: compressed snapshot is {len(snapshot) // 1024} KB, "
+              f"keeping the diff only (this version cannot be rolled back to)")
+    batch.set(history.document(history_id(version)), entry)
+
+    if version > HISTORY_KEEP:
+        batch.delete(history.document(history_id(version - HISTORY_KEEP)))
+    return len(snapshot) if stored else None
+
+def read_history(db, collection_path, document, limit=20):
+    """Newest history entries of a catalog, without their snapshots"""
+    history = db.collection(collection_path).document(document).collection(HISTORY_COLLECTION)
+    query = history.order_by("version", direction=field_values(db).DESCENDING).limit(limit)
+    return [snapshot.to_dict() for snapshot in count_query(list(query.select(SUMMARY_FIELDS).stream()))]
+
+def load_version(db, collection_path, document, version):
+    """(models, catalogHash) published as a version of a catalog
+
+    Raises ValueError when the version is unknown or has no snapshot.
+    """
+    ref = (db.collection(collection_path).document(document)
+           .collection(HISTORY_COLLECTION).document(history_id(version)))
+    count("reads")
+    snapshot = ref.get()
+    if not snapshot.exists:
+        raise ValueError(f"{document} has no history entry for version {version}")
+    entry = snapshot.to_dict()
+    if not entry.get("snapshot"):
+        raise ValueError(f"{document} version {version} was stored without a snapshot")
+    return decode_snapshot(entry["snapshot"]), entry.get("catalogHash")
+
+def print_history(document, entries):
+    """Print the history entries of one catalog, newest first"""
+    if not entries:
+        print(f"\n📭 No history for {document} yet")
+        return
+    print(f"\n🕓 History of {document}:")
+    for entry in entries:
+        published = entry.get("publishedAt")
+        when = published.strftime("%Y-%m-%d %H:%M") if hasattr(published, "strftime") else "?"
+        diff = entry.get("diff") or {}
+        changes = (f"+{diff.get('added', 0)} -{diff.get('removed', 0)} "
+                   f"~{diff.get('changed', 0)} ↕{diff.get('reordered', 0)}")
+        rollback = f"  (rollback to v{entry['rollbackOf']})" if entry.get("rollbackOf") else ""
+        print(f"   v{entry.get('version')}  {when}  {entry.get('entries', 0):4d} entries  {changes:20s} "
+              f"{(entry.get('catalogHash') or '')[:12]}  {entry.get('author', '?')}{rollback}")
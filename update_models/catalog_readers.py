@@ -0,0 +1,306 @@
+"""
+Catalog Readers
+Streaming readers for catalog input: CSV, JSON, JSONL, Parquet and stdin
+
+    models.csv       CSV with a header row (the default for other extensions)
+    models.json      A JSON array of entries, or a published document {"list": [...]}
+    models.jsonl     One JSON object per line (also .ndjson)
+    models.parquet   One row per entry (needs pyarrow)
+    -                Standard input; the format is sniffed unless given
+    [{...}, ...]     A list of entries already in memory (from the library API)
+
+Every reader is a generator of (line, row) pairs, where row is a dict of
+strings like the ones csv.DictReader produces, so all formats go through
+the same validation. line is the line the entry starts on (the row number
+for Parquet, the position for lists). JSON is read in bounded chunks and
+the entries of an array are decoded one at a time, so a large generated
+(or minified, single-line) catalog is never held in memory as text or
+parsed JSON.
+
+Requirements:
+    pip install pyarrow (only for Parquet input)
+"""
+
+import csv
+import io
+import json
+import os
+import sys
+from contextlib import contextmanager
+
+from model_record import to_csv_row
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+FORMATS = ["csv", "json", "jsonl", "parquet"]
+
+EXTENSIONS = {
+    ".csv": "csv",
+    ".json": "json",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+}
+
+# Source name for standard input
+STDIN = "-"
+
+# Rows per Parquet record batch
+PARQUET_BATCH_ROWS = 1024
+
+# Characters read at a time from JSON input (and to sniff stdin)
+READ_CHUNK_CHARS = 65536
+# Decoded JSON text is only dropped from the buffer once this much has piled up
+JSON_TRIM_CHARS = 1 << 20
+
+# ============================================================================
+# FUNCTIONS
+# ============================================================================
+
+def detect_format(source):
+    """Format of a file by its extension (csv when unknown, None for stdin and lists)"""
+    if not isinstance(source, str) or source == STDIN:
+        return None
+    return EXTENSIONS.get(os.path.splitext(source)[1].lower(), "csv")
+
+def source_exists(source):
+    """True for stdin, lists of entries and existing files"""
+    return not isinstance(source, str) or source == STDIN or os.path.exists(source)
+
+def to_cells(row):
+    """Row of a JSON or Parquet entry as CSV-like strings"""
+    return {
+        key: "" if value is None else str(value)
+        for key, value in to_csv_row(row).items()
+        if key is not None
+    }
+
+class RewoundStream:
+    """A text stream with the text already read from it put back in front"""
+
+    def __init__(self, head, stream):
+        self.head = head
+        self.stream = stream
+
+    def read(self, size=-1):
+        if not self.head:
+            return self.stream.read(size)
+        if size is None or size < 0:
+            text, self.head = self.head + self.stream.read(), ""
+        else:
+            text, self.head = self.head[:size], self.head[size:]
+        return text
+
+    def __iter__(self):
+        if self.head:
+            lines = list(io.StringIO(self.head, newline=''))
+            self.head = ""
+            if not lines[-1].endswith(("\n", "\r")):
+                lines[-1] += self.stream.readline()
+            yield from lines
+        yield from self.stream
+
+def sniff_format(stream):
+    """Guess the format of a text stream from its first non-blank characters
+
+    Only one chunk is read, so a minified JSON document is not pulled in
+    as one huge line. Returns (format, stream) with that chunk put back.
+    """
+    head = stream.read(READ_CHUNK_CHARS)
+    text = head.lstrip()
+    if text.startswith("["):
+        fmt = "json"
+    elif text.startswith("{"):
+        try:
+            first = json.loads(text.split("\n", 1)[0])
+            # A minified published document is one line too
+            is_document = isinstance(first, dict) and isinstance(first.get("list", first.get("models")), list)
+            fmt = "json" if is_document else "jsonl"
+        except ValueError:
+            fmt = "json"
+    else:
+        fmt = "csv"
+    return fmt, RewoundStream(head, stream)
+
+def iter_text(stream, size=READ_CHUNK_CHARS):
+    """Text of a stream in chunks of at most size characters
+
+    Iterables of strings (lines, for instance) are passed through as they are.
+    """
+    read = getattr(stream, "read", None)
+    if read is None:
+        yield from stream
+        return
+    while True:
+        chunk = read(size)
+        if not chunk:
+            return
+        yield chunk
+
+def iter_json_entries(stream):
+    """Decode the entries of a JSON array one at a time
+
+    stream is a text stream (read in bounded chunks) or an iterable of
+    strings. Decoded text is dropped in large steps, so the work stays
+    linear in the input size. A top-level object is taken to be a published
+    catalog document and its "list" (or "models") is used; such documents
+    are small enough to be parsed whole.
+    """
+    decoder = json.JSONDecoder()
+    chunks = iter_text(stream)
+    buffer = ""
+    # Line number of buffer[counted], advanced as the position moves on
+    line_number = 1
+    counted = 0
+
+    def fill():
+        nonlocal buffer
+        chunk = next(chunks, None)
+        if chunk is None:
+            return False
+        buffer += chunk
+        return True
+
+    def line_at(index):
+        nonlocal line_number, counted
+        line_number += buffer.count("\n", counted, index)
+        counted = index
+        return line_number
+
+    while not buffer.strip():
+        if not fill():
+            return
+    stripped = buffer.lstrip()
+    line_at(len(buffer) - len(stripped))
+    if stripped.startswith("{"):
+        data = json.loads(stripped + "".join(chunks))
+        entries = data.get("list", data.get("models"))
+        if not isinstance(entries, list):
+            raise ValueError('JSON object has no "list" of entries')
+        yield from ((i, entry) for i, entry in enumerate(entries, 1))
+        return
+    if not stripped.startswith("["):
+        raise ValueError("JSON input must be an array of entries")
+
+    position = len(buffer) - len(stripped) + 1
+    expect_entry = True
+    while True:
+        # Skip whitespace and the comma between entries
+        while position < len(buffer) and (buffer[position].isspace() or
+                                          (buffer[position] == "," and not expect_entry)):
+            if buffer[position] == ",":
+                expect_entry = True
+            position += 1
+        if position >= len(buffer):
+            if not fill():
+                raise ValueError("JSON array is not closed")
+            continue
+        if buffer[position] == "]":
+            return
+
+        try:
+            entry, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if not fill():
+                raise
+            continue
+        if not expect_entry:
+            raise ValueError(f"line {line_at(position)}: missing comma between entries")
+        yield line_at(position), entry
+        position = end
+        expect_entry = False
+
+        # Drop decoded text only once plenty has piled up (slicing is a copy)
+        if position > JSON_TRIM_CHARS:
+            line_at(position)
+            buffer = buffer[position:]
+            position = counted = 0
+
+def iter_csv_rows(reader):
+    for row in reader:
+        yield reader.line_num, {key: value for key, value in row.items() if key is not None}
+
+def iter_jsonl_rows(lines):
+    for line_number, line in enumerate(lines, 1):
+        if line.strip():
+            entry = json.loads(line)
+            if not isinstance(entry, dict):
+                raise ValueError(f"line {line_number}: expected a JSON object")
+            yield line_number, to_cells(entry)
+
+def iter_json_rows(stream):
+    for line_number, entry in iter_json_entries(stream):
+        if not isinstance(entry, dict):
+            raise ValueError(f"line {line_number}: expected a JSON object")
+        yield line_number, to_cells(entry)
+
+def iter_entry_rows(entries):
+    for position, entry in enumerate(entries, 1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"entry {position}: expected a dict")
+        yield position, to_cells(entry)
+
+def iter_parquet_rows(parquet_file):
+    row_number = 0
+    for batch in parquet_file.iter_batches(batch_size=PARQUET_BATCH_ROWS):
+        for entry in batch.to_pylist():
+            row_number += 1
+            yield row_number, to_cells(entry)
+
+def stdin_lines():
+    """Standard input as UTF-8 text"""
+    if hasattr(sys.stdin, "buffer"):
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='')
+    return sys.stdin
+
+@contextmanager
+def open_catalog(source, fmt=None):
+    """Open a catalog source for reading
+
+    fmt overrides the format detected from the extension (or sniffed from
+    stdin). Yields (columns, rows): columns is the CSV header or Parquet
+    schema, None for JSON (entries may differ in their keys), and rows is
+    a generator of (line, row).
+    """
+    if not isinstance(source, str):
+        yield None, iter_entry_rows(source)
+        return
+
+    fmt = fmt or detect_format(source)
+    if fmt == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Parquet input needs pyarrow (pip install pyarrow)")
+        # Parquet needs a seekable file, so piped input is buffered
+        handle = io.BytesIO(sys.stdin.buffer.read()) if source == STDIN else open(source, 'rb')
+        try:
+            parquet_file = pq.ParquetFile(handle)
+            yield parquet_file.schema_arrow.names, iter_parquet_rows(parquet_file)
+        finally:
+            handle.close()
+        return
+
+    file = None
+    if source == STDIN:
+        stream = stdin_lines()
+    else:
+        file = stream = open(source, 'r', encoding='utf-8', newline='')
+    try:
+        if fmt is None:
+            fmt, stream = sniff_format(stream)
+        if fmt == "csv":
+            reader = csv.DictReader(stream)
+            yield reader.fieldnames or [], iter_csv_rows(reader)
+        elif fmt == "jsonl":
+            yield None, iter_jsonl_rows(stream)
+        elif fmt == "json":
+            yield None, iter_json_rows(stream)
+        else:
+            raise ValueError(f"unknown input format {fmt!r} (use one of {', '.join(FORMATS)})")
+    finally:
+        if file is not None:
+            file.close()
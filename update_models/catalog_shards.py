@@ -0,0 +1,185 @@
+"""
+Catalog Sharding
+Splits a model catalog across a manifest document plus N shard documents
+
+Firestore caps a document at 1 MiB, so large catalogs are written as:
+
+    app_config/<document>                    manifest (sharded, shards, version, hash)
+    app_config/<document>/shards/v<N>_<i>    {"list": [...], "positions": [...], "index": i}
+
+Shards are addressed by the manifest's catalogVersion, so a client that read
+the previous manifest can still fetch the previous shards while a new
+version is being published. Shards older than the previous version are
+deleted in the same batch that writes the new ones.
+
+Requirements:
+    pip install firebase-admin (only for the functions that write)
+"""
+
+import json
+
+from run_report import count
+from document_store import MAX_DOCUMENT_BYTES, field_values
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Subcollection under each manifest document
+SHARD_COLLECTION = "shards"
+
+# Size above which "auto" starts sharding (MAX_DOCUMENT_BYTES is Firestore's hard limit)
+AUTO_SHARD_BYTES = 900 * 1024
+
+# Rows per shard for --shard-by rows (and for oversized provider groups)
+DEFAULT_SHARD_ROWS = 500
+
+# Supported --shard-by values
+SHARD_MODES = ["auto", "none", "provider", "rows"]
+
+# ============================================================================
+# FUNCTIONS
+# ============================================================================
+
+def estimate_document_size(models):
+    """Estimate the stored size of a {"list": models} document in bytes"""
+    return len(json.dumps({"list": models}, separators=(',', ':'), ensure_ascii=False).encode('utf-8'))
+
+def model_provider(model):
+    """Return the provider prefix of an apiModel ("google/gemma" → "google")"""
+    api_model = model.get('apiModel', '')
+    return api_model.split('/', 1)[0] if '/' in api_model else "default"
+
+def choose_layout(models, shard_by="auto"):
+    """Resolve a --shard-by value to "provider", "rows" or None (single document)"""
+    if shard_by == "none":
+        return None
+    if shard_by == "auto":
+        return "provider" if estimate_document_size(models) > AUTO_SHARD_BYTES else None
+    return shard_by
+
+def split_rows(models, rows):
+    """Split a list into chunks of at most rows entries"""
+    return [models[i:i + rows] for i in range(0, len(models), rows)] or [[]]
+
+def split_models(models, layout, rows=DEFAULT_SHARD_ROWS):
+    """Split models into shards of (positions, rows)
+
+    positions are the indexes of the rows in the published list, so readers
+    can restore the exact order after a provider split.
+    """
+    indexed = list(enumerate(models))
+    if layout == "rows":
+        chunks = split_rows(indexed, rows)
+    else:
+        groups = {}
+        for position, model in indexed:
+            groups.setdefault(model_provider(model), []).append((position, model))
+        chunks = []
+        for group in groups.values():
+            chunks.extend(split_rows(group, rows))
+
+    return [([position for position, _ in chunk], [model for _, model in chunk]) for chunk in chunks]
+
+def shard_id(version, index):
+    """Document id of a shard for a catalog version"""
+    return f"v{version}_{index:03d}"
+
+def shard_ref(db, collection, document, shard):
+    """Reference to a shard document"""
+    return db.collection(collection).document(document).collection(SHARD_COLLECTION).document(shard)
+
+def is_sharded(data):
+    """Return True if a document is a shard manifest"""
+    return bool(data and data.get('sharded'))
+
+def add_sharded_writes(batch, db, collection, document, models, plan, current_data, layout,
+                       rows=DEFAULT_SHARD_ROWS):
+    """Queue a manifest and its shards on a WriteBatch
+
+    Returns the number of shard documents written.
+    """
+    values = field_values(db)
+    version = plan["catalogVersion"]
+    shards = split_models(models, layout, rows)
+    ids = [shard_id(version, i) for i in range(len(shards))]
+
+    for i, (shard, (positions, rows_in_shard)) in enumerate(zip(ids, shards)):
+        size = estimate_document_size(rows_in_shard)
+        if size > MAX_DOCUMENT_BYTES:
+            raise ValueError(f"shard {shard} is {size} bytes; lower --shard-rows")
+        batch.set(shard_ref(db, collection, document, shard), {
+            "list": rows_in_shard,
+            "positions": positions,
+            "index": i,
+            "catalogVersion": version
+        })
+
+    # Keep the previous version for clients mid-read, drop anything older
+    previous = current_data.get('shards', []) if is_sharded(current_data) else []
+    for stale in (current_data or {}).get('previousShards', []):
+        if stale not in ids and stale not in previous:
+            batch.delete(shard_ref(db, collection, document, stale))
+
+    batch.set(db.collection(collection).document(document), {
+        "sharded": True,
+        "shardBy": layout,
+        "shards": ids,
+        "shardCount": len(ids),
+        "previousShards": previous,
+        "list": values.DELETE_FIELD,
+        "catalogHash": plan["catalogHash"],
+        "catalogVersion": version,
+        "lastUpdated": values.SERVER_TIMESTAMP
+    }, merge=True)
+    return len(ids)
+
+def unsharded_cleanup(db, collection, document, current_data):
+    """Fields and shard refs to clear when a sharded catalog goes back to one document"""
+    if not is_sharded(current_data):
+        return {}, []
+    delete = field_values(db).DELETE_FIELD
+
+    stale = set(current_data.get('shards', [])) | set(current_data.get('previousShards', []))
+    fields = {
+        "sharded": delete,
+        "shardBy": delete,
+        "shards": delete,
+        "shardCount": delete,
+        "previousShards": delete
+    }
+    return fields, [shard_ref(db, collection, document, shard) for shard in sorted(stale)]
+
+def resolve_shards(db, collection, data_by_document):
+    """Fill in "list" for every sharded manifest with a single get_all()
+
+    Shards of all manifests are fetched together, in parallel, and
+    reassembled in manifest order.
+    """
+    refs = []
+    for document, data in data_by_document.items():
+        if is_sharded(data):
+            refs.extend(shard_ref(db, collection, document, shard) for shard in data.get('shards', []))
+    if not refs:
+        return data_by_document
+
+    found = {}
+    count("reads", len(refs))
+    for snapshot in db.get_all(refs):
+        if snapshot.exists:
+            found[snapshot.reference.path] = snapshot.to_dict()
+
+    for document, data in data_by_document.items():
+        if not is_sharded(data):
+            continue
+        placed = []
+        for shard in data.get('shards', []):
+            path = shard_ref(db, collection, document, shard).path
+            if path not in found:
+                raise ValueError(f"missing shard {path}")
+            rows = found[path].get('list', [])
+            positions = found[path].get('positions') or range(len(placed), len(placed) + len(rows))
+            placed.extend(zip(positions, rows))
+        placed.sort(key=lambda item: item[0])
+        data['list'] = [model for _, model in placed]
+    return data_by_document
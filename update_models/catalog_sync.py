@@ -0,0 +1,629 @@
+"""
+Catalog Sync Engine
+Diff-based sync of model catalogs into Firestore app_config documents
+
+Reads the current document once, computes a per-apiModel diff against the
+desired list and only writes when something actually changed. Every write
+publishes a stable catalogHash and a monotonically increasing catalogVersion
+next to "list" so clients can do a cheap freshness check.
+
+The Firebase SDK is only imported by the functions that write, so loading,
+validating and diffing work offline.
+
+Requirements:
+    pip install firebase-admin
+"""
+
+import hashlib
+import json
+import csv
+import os
+import re
+
+from run_report import CountingBatch, count, phase, timed
+from model_record import MODEL_COLUMNS, EXTENDED_COLUMNS, extended_columns, parse_row, to_csv_row
+from catalog_readers import open_catalog, source_exists
+from document_store import field_values
+from catalog_history import add_history_write
+from catalog_views import VIEWS_FIELD, add_view_writes, build_views, views_field
+from catalog_cache import save_snapshot, load_snapshot_entry, is_fresh, describe_snapshot
+from catalog_shards import (
+    DEFAULT_SHARD_ROWS, choose_layout, is_sharded, resolve_shards, add_sharded_writes,
+    unsharded_cleanup
+)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Your Firestore collection path
+COLLECTION_PATH = "app_config"
+
+# Field names published next to "list"
+HASH_FIELD = "catalogHash"
+VERSION_FIELD = "catalogVersion"
+# Latest probe latencies; kept out of "list" so they never change the hash
+PROBE_FIELD = "probe"
+
+# Directory holding the default CSV files
+CSV_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Catalogs published to app_config, in publish order
+# kind "models" uses the displayName/apiModel schema, "exp" the modelId/modelName one
+CATALOGS = [
+    {"name": "models", "document": "models", "csv": os.path.join(CSV_DIR, "models.csv"),
+     "label": "models", "kind": "models"},
+    {"name": "gemini_models", "document": "gemini_models", "csv": os.path.join(CSV_DIR, "gemini_models.csv"),
+     "label": "Gemini models", "kind": "models"},
+    {"name": "exp_models", "document": "exp_models", "csv": os.path.join(CSV_DIR, "exp_models.csv"),
+     "label": "exception models", "kind": "exp"},
+]
+
+# Required CSV columns of the exceptions CSV (model_record has the catalog ones)
+EXP_MODEL_COLUMNS = ['modelId', 'modelName']
+
+# exp_models keeps a map keyed by exp_key() next to the "list" mirror old clients read
+EXP_MAP_FIELD = "byId"
+
+# ============================================================================
+# FUNCTIONS
+# ============================================================================
+
+@timed("csv.load")
+def load_models_from_csv(csv_file, label="models", fmt=None):
+    """Load models from a CSV file - supports any column order
+
+    Also reads JSON, JSONL and Parquet files and "-" (stdin), see
+    catalog_readers. Rows go through validate_models_csv(); if any row is
+    invalid, every problem is printed and nothing is loaded.
+    """
+    if not source_exists(csv_file):
+        print(f"❌ Error: CSV file not found: {csv_file}")
+        return None
+
+    models, errors, warnings = validate_models_csv(csv_file, label, fmt)
+    if errors:
+        print_validation(csv_file, errors, warnings)
+        print(f"❌ Fix the errors above in {csv_file}")
+        return None
+
+    print(f"✅ Loaded {len(models)} {label} from {csv_file}")
+    return models
+
+@timed("csv.validate")
+def validate_models_csv(csv_file, label="models", fmt=None):
+    """Parse and validate a catalog CSV (or any catalog_readers source) in a single pass
+
+    Nothing is skipped silently: every problem is collected with its line
+    number. Errors are duplicate apiModels, missing names, non-integer
+    orders, unrecognized booleans and malformed extended columns; duplicate
+    or gapped orders and unknown columns are warnings. Rows are streamed
+    from the reader, so only the valid entries are kept in memory. Returns
+    (models, errors, warnings) where models only holds the rows without
+    errors, as ModelRecord.to_dict() entries.
+    """
+    models, errors, warnings = [], [], []
+    if not source_exists(csv_file):
+        return None, [f"CSV file not found: {csv_file}"], warnings
+
+    known = set(MODEL_COLUMNS + EXTENDED_COLUMNS)
+    unknown = {}
+    seen_api = {}
+    seen_order = {}
+    try:
+        with open_catalog(csv_file, fmt) as (columns, rows):
+            if columns is not None:
+                missing = [col for col in MODEL_COLUMNS if col not in columns]
+                if missing:
+                    return None, [f"missing columns: {', '.join(missing)}"], warnings
+
+            for line, row in rows:
+                for column in row:
+                    if column not in known:
+                        unknown.setdefault(column, line)
+                record, row_errors = parse_row(row, line)
+
+                api_model = (row.get('apiModel') or '').strip()
+                if api_model in seen_api:
+                    row_errors.append(f"line {line}: duplicate apiModel {api_model} "
+                                      f"(first on line {seen_api[api_model]})")
+                elif api_model:
+                    seen_api[api_model] = line
+                if row_errors:
+                    errors.extend(row_errors)
+                    continue
+
+                if record.order in seen_order:
+                    warnings.append(f"line {line}: duplicate order {record.order} "
+                                    f"(also on line {seen_order[record.order]})")
+                seen_order.setdefault(record.order, line)
+                models.append(record.to_dict())
+    except Exception as e:
+        return None, [f"error reading {csv_file}: {e}"], warnings
+
+    if unknown:
+        warnings.insert(0, f"unknown columns are ignored: {', '.join(unknown)}")
+    if seen_order:
+        gaps = sorted(set(range(min(seen_order), max(seen_order) + 1)) - set(seen_order))
+        if gaps:
+            warnings.append(f"order has gaps: {', '.join(map(str, gaps))}")
+    if not models and not errors:
+        errors.append(f"no {label} found")
+    return models, errors, warnings
+
+def print_validation(csv_file, errors, warnings, limit=25):
+    """Print validation problems of a CSV file"""
+    if not errors and not warnings:
+        print(f"✅ {csv_file}: valid")
+        return
+    print(f"\n🔎 {csv_file}: {len(errors)} error(s), {len(warnings)} warning(s)")
+    for error in errors[:limit]:
+        print(f"   ❌ {error}")
+    for warning in warnings[:limit]:
+        print(f"   ⚠️ {warning}")
+    hidden = max(len(errors) - limit, 0) + max(len(warnings) - limit, 0)
+    if hidden:
+        print(f"   ... and {hidden} more")
+
+def save_models_to_csv(csv_file, models):
+    """Write models back to a CSV file, keeping the file's existing column order
+
+    Extended columns the models use but the file lacks are appended.
+    """
+    try:
+        columns = list(MODEL_COLUMNS)
+        if os.path.exists(csv_file):
+            with open(csv_file, 'r', encoding='utf-8') as file:
+                header = next(csv.reader(file), None)
+            if header and all(col in header for col in MODEL_COLUMNS):
+                columns = header
+        columns += [col for col in extended_columns(models) if col not in columns]
+
+        with open(csv_file, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.DictWriter(file, fieldnames=columns, extrasaction='ignore')
+            writer.writeheader()
+            for model in models:
+                writer.writerow(to_csv_row(model))
+
+        print(f"✅ Wrote {len(models)} models to {csv_file}")
+        return True
+    except Exception as e:
+        print(f"❌ Error writing CSV file: {e}")
+        return False
+
+@timed("csv.load")
+def load_exp_models_from_csv(csv_file, fmt=None):
+    """Load exception models (modelId,modelName) from CSV file (or any catalog_readers source)"""
+    entries, errors = validate_exp_models(csv_file, fmt)
+    if errors:
+        print(f"❌ Error: {errors[0]}")
+        return None
+
+    print(f"✅ Loaded {len(entries)} exception models from {csv_file}")
+    return entries
+
+def validate_exp_models(csv_file, fmt=None):
+    """Read exception models without printing; returns (entries, errors)
+
+    Rows without a modelId are skipped.
+    """
+    if not source_exists(csv_file):
+        return None, [f"CSV file not found: {csv_file}"]
+
+    entries = []
+    try:
+        with open_catalog(csv_file, fmt) as (columns, rows):
+            if columns is not None and not all(col in columns for col in EXP_MODEL_COLUMNS):
+                return None, [f"CSV must have columns: {', '.join(EXP_MODEL_COLUMNS)}"]
+
+            for line, row in rows:
+                model_id = (row.get('modelId') or '').strip()
+                if model_id:
+                    entries.append({"modelId": model_id, "modelName": (row.get('modelName') or '').strip()})
+    except Exception as e:
+        return None, [f"error reading {csv_file}: {e}"]
+    return entries, []
+
+def exp_key(model_id):
+    """Key of an exception model in the map: its id without ":free", lower-cased
+
+    The app matches exception models the same way, so ids differing only in
+    case or in the ":free" suffix are the same exception.
+    """
+    return re.sub(r':free', '', model_id or '', flags=re.IGNORECASE).strip().lower()
+
+def exp_entries(data):
+    """Return the {modelId, modelName} entries of an exp_models document
+
+    Entries of the "list" mirror come first (old clients only write there),
+    followed by entries that are only in the map. Duplicates by exp_key()
+    are dropped; the first id is kept, named by the first entry with a name.
+    """
+    data = data or {}
+    by_id = data.get(EXP_MAP_FIELD) or {}
+    candidates = list(data.get('list') or [])
+    candidates.extend(by_id[key] for key in sorted(by_id) if isinstance(by_id[key], dict))
+
+    entries = {}
+    for entry in candidates:
+        if not isinstance(entry, dict):
+            continue
+        key = exp_key(entry.get('modelId'))
+        if not key:
+            continue
+        name = (entry.get('modelName') or '').strip()
+        if key not in entries:
+            entries[key] = {"modelId": entry['modelId'].strip(), "modelName": name}
+        elif not entries[key]['modelName']:
+            entries[key]['modelName'] = name
+    return list(entries.values())
+
+def merge_exp_models(current, entries):
+    """Merge CSV exception models into the list devices already reported
+
+    Devices append to exp_models at runtime, so the CSV only adds or renames
+    entries and never drops one that is not listed.
+    """
+    merged = {}
+    for entry in current:
+        merged.setdefault(exp_key(entry.get('modelId')), dict(entry))
+    for entry in entries:
+        merged[exp_key(entry['modelId'])] = dict(entry)
+    return [entry for key, entry in merged.items() if key]
+
+def exp_map_updates(current_data, models, db=None):
+    """Fields that keep the exp_models map in step with a merged list
+
+    Only returns something for documents that already have the map. Only
+    new or renamed entries are written (merged into the map), so addedAt of
+    existing entries is left alone. db is the store the fields are for.
+    """
+    if not current_data or EXP_MAP_FIELD not in current_data:
+        return {}
+    by_id = current_data.get(EXP_MAP_FIELD) or {}
+    updates = {}
+    for entry in models:
+        key = exp_key(entry['modelId'])
+        existing = by_id.get(key)
+        if existing is None:
+            updates[key] = {**entry, "addedAt": field_values(db).SERVER_TIMESTAMP}
+        elif (existing.get('modelId'), existing.get('modelName')) != (entry['modelId'], entry['modelName']):
+            updates[key] = dict(entry)
+    return {EXP_MAP_FIELD: updates} if updates else {}
+
+def compute_catalog_hash(models):
+    """Compute a stable SHA-256 hash of a model list"""
+    canonical = json.dumps(models, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def diff_catalogs(current, desired, key='apiModel'):
+    """Compute a per-apiModel (or per-key) diff between the current and desired lists
+
+    Returns a dict with:
+        added     - apiModels only in desired
+        removed   - apiModels only in current
+        changed   - {apiModel: {field: (old, new)}} for fields other than order
+        reordered - {apiModel: (old_order, new_order)} when order or position moved
+    """
+    current_index = {m.get(key): (i, m) for i, m in enumerate(current)}
+    desired_index = {m.get(key): (i, m) for i, m in enumerate(desired)}
+
+    added = [api for api in desired_index if api not in current_index]
+    removed = [api for api in current_index if api not in desired_index]
+    changed = {}
+    reordered = {}
+
+    # Positions are compared among the models present on both sides only,
+    # so an insert or delete does not mark everything after it as moved
+    common_current = [api for api in current_index if api in desired_index]
+    common_desired = [api for api in desired_index if api in current_index]
+    current_rank = {api: i for i, api in enumerate(common_current)}
+    desired_rank = {api: i for i, api in enumerate(common_desired)}
+
+    for api in common_desired:
+        old = current_index[api][1]
+        new = desired_index[api][1]
+
+        fields = {}
+        for key in sorted(set(old) | set(new)):
+            if key == 'order':
+                continue
+            if old.get(key) != new.get(key):
+                fields[key] = (old.get(key), new.get(key))
+        if fields:
+            changed[api] = fields
+
+        if old.get('order') != new.get('order') or current_rank[api] != desired_rank[api]:
+            reordered[api] = (old.get('order'), new.get('order'))
+
+    return {
+        "added": added,
+        "removed": removed,
+        "changed": changed,
+        "reordered": reordered
+    }
+
+def has_changes(diff):
+    """Return True if a diff contains any change"""
+    return bool(diff["added"] or diff["removed"] or diff["changed"] or diff["reordered"])
+
+def print_catalog_diff(diff, label="models", limit=25):
+    """Print a catalog diff in a human readable form"""
+    if not has_changes(diff):
+        print(f"\n✅ No changes to {label}")
+        return
+
+    print(f"\n📝 Changes to {label}:")
+    print(f"   ➕ {len(diff['added'])} added   ➖ {len(diff['removed'])} removed   "
+          f"✏️ {len(diff['changed'])} changed   🔀 {len(diff['reordered'])} reordered")
+
+    lines = []
+    lines.extend(f"   ➕ {api}" for api in diff["added"])
+    lines.extend(f"   ➖ {api}" for api in diff["removed"])
+    for api, fields in diff["changed"].items():
+        details = ", ".join(f"{key}: {old!r} → {new!r}" for key, (old, new) in fields.items())
+        lines.append(f"   ✏️ {api} ({details})")
+    for api, (old, new) in diff["reordered"].items():
+        if old == new:
+            lines.append(f"   🔀 {api} (moved, order {new})")
+        else:
+            lines.append(f"   🔀 {api} (order {old} → {new})")
+
+    for line in lines[:limit]:
+        print(line)
+    if len(lines) > limit:
+        print(f"   ... and {len(lines) - limit} more changes")
+
+@timed("diff")
+def plan_catalog_update(current_data, models, key='apiModel', layout=None):
+    """Plan an update of a catalog document from its current data
+
+    current_data is the document dict (or None when the document does not
+    exist). layout is the desired shard layout (None for a single document).
+    The returned plan tells whether a write is needed and carries the hash
+    and version that the write would publish. Models catalogs (keyed by
+    apiModel) also get their client views (see catalog_views).
+    """
+    current_data = current_data or {}
+    current_list = current_data.get('list', [])
+    current_hash = current_data.get(HASH_FIELD)
+    current_version = current_data.get(VERSION_FIELD, 0) or 0
+    current_layout = current_data.get('shardBy') if is_sharded(current_data) else None
+
+    catalog_hash = compute_catalog_hash(models)
+    diff = diff_catalogs(current_list, models, key)
+    views = build_views(models) if key == 'apiModel' else None
+    wanted_views = views_field(views) if views is not None else None
+
+    if has_changes(diff):
+        reason = "changed"
+    elif current_hash != catalog_hash:
+        # Same list but published before hashes existed (or hand edited)
+        reason = "metadata"
+    elif current_layout != layout:
+        reason = "layout"
+    elif current_data.get(VIEWS_FIELD) != wanted_views:
+        reason = "views"
+    else:
+        reason = None
+
+    return {
+        "diff": diff,
+        "catalogHash": catalog_hash,
+        "catalogVersion": current_version + 1 if reason else current_version,
+        "needsWrite": reason is not None,
+        "reason": reason,
+        "layout": layout,
+        "views": views
+    }
+
+def catalog_payload(plan, models, db=None):
+    """Build the Firestore payload for a planned single-document write to db"""
+    # IMPORTANT: Field name must be "list" to match Android app!
+    return {
+        "list": models,
+        HASH_FIELD: plan["catalogHash"],
+        VERSION_FIELD: plan["catalogVersion"],
+        "lastUpdated": field_values(db).SERVER_TIMESTAMP
+    }
+
+def probe_fields(measurements, db=None):
+    """Build the merge payload publishing probe measurements outside the hashed list"""
+    return {PROBE_FIELD: {"models": measurements, "probedAt": field_values(db).SERVER_TIMESTAMP}}
+
+def sync_catalog(db, document, models, label="models", shard_by="auto"):
+    """Sync a model list into app_config/<document>, writing only on change
+
+    Returns the plan, or None if the sync failed.
+    """
+    try:
+        current_data = read_catalogs(db, [document], use_cache=True)[document]
+
+        layout = choose_layout(models, shard_by)
+        plan = plan_catalog_update(current_data, models, layout=layout)
+        print_catalog_diff(plan["diff"], label)
+
+        if not plan["needsWrite"]:
+            print(f"⏭️ {COLLECTION_PATH}/{document} is already up to date "
+                  f"(version {plan['catalogVersion']}) - skipping write")
+            return plan
+
+        if plan["reason"] == "metadata":
+            print(f"🏷️ List unchanged, publishing {HASH_FIELD}/{VERSION_FIELD} only")
+        elif plan["reason"] == "layout":
+            print(f"🧩 List unchanged, switching layout to {layout or 'single document'}")
+        elif plan["reason"] == "views":
+            print(f"👁️ List unchanged, publishing its client views")
+
+        publish_catalogs(db, [{"document": document, "models": models, "plan": plan, "current": current_data}])
+        print(f"📦 Published version {plan['catalogVersion']} "
+              f"({HASH_FIELD} {plan['catalogHash'][:12]})")
+        return plan
+    except Exception as e:
+        print(f"❌ Error syncing {label}: {e}")
+        return None
+
+@timed("firestore.read")
+def read_catalogs(db, documents, use_cache=False, allow_stale=False, project=None, keep_snapshots=True,
+                  report=print):
+    """Read several app_config documents with a single get_all() call
+
+    Sharded catalogs are reassembled from their shards (one more get_all()
+    for all of them), so "list" is always the full catalog. Every document
+    read is also stored as a local snapshot.
+
+    With use_cache, a document whose update_time still matches its local
+    snapshot is served from the snapshot, which skips reading its shards.
+    The document itself is still read (and billed) once, since the
+    update_time comes with it. With allow_stale, snapshots are also used
+    (with a warning) when Firestore cannot be reached. project names the
+    snapshot set when several Firebase projects are published in one run.
+    keep_snapshots=False leaves the local snapshots alone (callers that do
+    not use the cache). Progress messages go to report (print by default).
+    Returns {document: data or None}.
+    """
+    data = {document: None for document in documents}
+    entries = {document: load_snapshot_entry(document, project, report) for document in documents} if use_cache else {}
+
+    refs = [db.collection(COLLECTION_PATH).document(document) for document in documents]
+    try:
+        count("reads", len(refs))
+        snapshots = list(db.get_all(refs))
+    except Exception as e:
+        cached = [document for document in documents if entries.get(document)]
+        if not allow_stale or len(cached) < len(documents):
+            raise
+        report(f"⚠️ Could not reach Firestore ({e}) - using local snapshots")
+        for document in documents:
+            report(f"   📦 {COLLECTION_PATH}/{document}: {describe_snapshot(entries[document])}")
+            data[document] = entries[document]["data"]
+        return data
+
+    update_times = {}
+    fetched = {document: None for document in documents}
+    for snapshot in snapshots:
+        if not snapshot.exists:
+            continue
+        if is_fresh(entries.get(snapshot.id), snapshot.update_time):
+            report(f"📦 {COLLECTION_PATH}/{snapshot.id} unchanged - using local snapshot")
+            data[snapshot.id] = entries[snapshot.id]["data"]
+            del fetched[snapshot.id]
+        else:
+            fetched[snapshot.id] = snapshot.to_dict()
+            update_times[snapshot.id] = snapshot.update_time
+    fetched = resolve_shards(db, COLLECTION_PATH, fetched)
+
+    # Keep a local baseline for cached and offline runs
+    for document, document_data in fetched.items():
+        if keep_snapshots:
+            save_snapshot(document, document_data, update_times.get(document), project, report)
+        data[document] = document_data
+    return data
+
+@timed("publish")
+def publish_catalogs(db, targets, author=None, report=print):
+    """Write every changed catalog in one atomic WriteBatch
+
+    targets is a list of dicts with document, models, plan and (optionally)
+    the current document data and extra fields to merge in. Sharded catalogs write their manifest and
+    shards in the same batch. Every catalog written also gets a history
+    entry (see catalog_history) by author, with the target's "history"
+    fields added. Probe "measurements" are merged into their own field,
+    also for catalogs that need no write. Progress messages go to report.
+    Returns the number of catalogs written.
+    """
+    batch = CountingBatch(db.batch())
+    written = 0
+    measured = 0
+    for target in targets:
+        plan = target["plan"]
+        doc_ref = db.collection(COLLECTION_PATH).document(target["document"])
+        measurements = target.get("measurements")
+        if not plan["needsWrite"]:
+            if measurements is not None:
+                batch.set(doc_ref, probe_fields(measurements, db), merge=True)
+                measured += 1
+            continue
+        current_data = target.get("current")
+        extra = dict(target.get("fields", {}))
+        if measurements is not None:
+            extra.update(probe_fields(measurements, db))
+        if plan.get("views") is not None:
+            add_view_writes(batch, db, COLLECTION_PATH, target["document"], plan["views"], plan, current_data)
+            extra[VIEWS_FIELD] = views_field(plan["views"])
+
+        if plan.get("layout"):
+            shard_count = add_sharded_writes(batch, db, COLLECTION_PATH, target["document"],
+                                             target["models"], plan, current_data, plan["layout"],
+                                             target.get("shardRows", DEFAULT_SHARD_ROWS))
+            if extra:
+                batch.set(doc_ref, extra, merge=True)
+            report(f"🧩 {COLLECTION_PATH}/{target['document']}: {shard_count} shard(s) by {plan['layout']}")
+        else:
+            fields, stale = unsharded_cleanup(db, COLLECTION_PATH, target["document"], current_data)
+            batch.set(doc_ref, {**catalog_payload(plan, target["models"], db), **fields, **extra}, merge=True)
+            for ref in stale:
+                batch.delete(ref)
+        add_history_write(batch, db, COLLECTION_PATH, target["document"], target["models"], plan,
+                          (current_data or {}).get(VERSION_FIELD), author, target.get("history"), report)
+        written += 1
+
+    if written or measured:
+        with phase("firestore.write", documents=written + measured):
+            batch.commit()
+    return written
+
+@timed("verify")
+def check_catalogs(db, targets, project=None, keep_snapshots=True, report=print):
+    """Read back the catalogs a publish wrote with a single get_all()
+
+    Returns {document: {"ok", "problem", "entries", "version"}} for every
+    target that needed a write.
+    """
+    changed = [target for target in targets if target["plan"]["needsWrite"]]
+    if not changed:
+        return {}
+
+    data = read_catalogs(db, [target["document"] for target in changed], project=project,
+                         keep_snapshots=keep_snapshots, report=report)
+    results = {}
+    for target in changed:
+        current = data.get(target["document"])
+        if current is None:
+            problem = "does not exist"
+        elif (current.get(HASH_FIELD) != target["plan"]["catalogHash"]
+              or compute_catalog_hash(current.get('list', [])) != target["plan"]["catalogHash"]):
+            problem = f"{HASH_FIELD} does not match"
+        else:
+            problem = None
+        results[target["document"]] = {
+            "ok": problem is None,
+            "problem": problem,
+            "entries": len((current or {}).get('list', [])),
+            "version": (current or {}).get(VERSION_FIELD)
+        }
+    return results
+
+def print_verification(results):
+    """Print the check_catalogs() result of each catalog; returns True if all are intact"""
+    if not results:
+        return True
+
+    print(f"\n🔍 Verification:")
+    for document, result in results.items():
+        if result["ok"]:
+            print(f"   ✅ {COLLECTION_PATH}/{document}: {result['entries']} entries, "
+                  f"version {result['version']}")
+        elif result["problem"] == "does not exist":
+            print(f"   ⚠️ {COLLECTION_PATH}/{document} does not exist")
+        else:
+            print(f"   ⚠️ {COLLECTION_PATH}/{document}: {result['problem']}")
+    return all(result["ok"] for result in results.values())
+
+def verify_catalogs(db, targets, project=None):
+    """Verify published catalogs and print the result of each"""
+    try:
+        return print_verification(check_catalogs(db, targets, project))
+    except Exception as e:
+        print(f"❌ Error verifying update: {e}")
+        return False
@@ -0,0 +1,101 @@
+"""
+Catalog Views
+Precomputed, pre-sorted views of a models catalog for clients that only
+need part of it
+
+Every publish of a models catalog also writes, in the same batch:
+
+    app_config/<document>/views/available    {"list": [...]}    available models
+    app_config/<document>/views/free         {"list": [...]}    available, not isPro
+    app_config/<document>/views/byProvider   {"groups": {provider: [...]}}
+
+Entries are sorted by order and use short keys: n = displayName,
+m = apiModel, p = true for isPro models (left out otherwise). Each view
+carries the catalogVersion and catalogHash of the list it was built from.
+The manifest lists the published views in "views", so a catalog whose
+views are missing or outdated is republished even if its list is the same.
+
+The views are for server-side readers (scripts, dashboards). The app does
+not read them: its model picker needs the full list, including unavailable
+models and the provider metadata the views leave out.
+
+Requirements:
+    pip install firebase-admin (only for the functions that write)
+"""
+
+import json
+
+from catalog_shards import MAX_DOCUMENT_BYTES, model_provider
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Subcollection under each models catalog document
+VIEW_COLLECTION = "views"
+
+# Manifest field listing the published views
+VIEWS_FIELD = "views"
+
+# Bumped when the layout of the view documents changes, so they are rebuilt
+VIEW_SCHEMA = 1
+
+# ============================================================================
+# FUNCTIONS
+# ============================================================================
+
+def compact_entry(model):
+    """Short-key form of a model for the views"""
+    entry = {"n": model.get('displayName', ''), "m": model.get('apiModel', '')}
+    if model.get('isPro'):
+        entry["p"] = True
+    return entry
+
+def build_views(models):
+    """{view name: document data (without version and hash)} for a model list"""
+    ranked = sorted(enumerate(models), key=lambda item: (item[1].get('order', 0), item[0]))
+    available = [model for _, model in ranked if model.get('isAvailable', True)]
+
+    groups = {}
+    for model in available:
+        groups.setdefault(model.get('provider') or model_provider(model), []).append(compact_entry(model))
+
+    views = {
+        "available": {"list": [compact_entry(model) for model in available]},
+        "free": {"list": [compact_entry(model) for model in available if not model.get('isPro')]},
+        "byProvider": {"groups": groups}
+    }
+    # A view that would not fit in a document is left out rather than failing the publish
+    return {
+        name: data for name, data in views.items()
+        if len(json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')) < MAX_DOCUMENT_BYTES
+    }
+
+def views_field(views):
+    """Value of the manifest's "views" field for a set of built views"""
+    return {"schema": VIEW_SCHEMA, "names": sorted(views)}
+
+def add_view_writes(batch, db, collection, document, views, plan, current_data):
+    """Queue the view documents of a publish on a WriteBatch
+
+    Views the previous publish had but this one does not are deleted.
+    Returns the number of views written.
+    """
+    view_refs = db.collection(collection).document(document).collection(VIEW_COLLECTION)
+    for name, data in views.items():
+        if "list" in data:
+            count = len(data["list"])
+        else:
+            count = sum(len(group) for group in data["groups"].values())
+        batch.set(view_refs.document(name), {
+            **data,
+            "count": count,
+            "catalogVersion": plan["catalogVersion"],
+            "catalogHash": plan["catalogHash"]
+        })
+
+    previous = ((current_data or {}).get(VIEWS_FIELD) or {}).get("names") or []
+    for name in previous:
+        if name not in views:
+            batch.delete(view_refs.document(name))
+    return len(views)
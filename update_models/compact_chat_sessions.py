@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Chat Session Compactor
+Moves inline base64 images out of chat_sessions documents into a
+content-addressed blob store
+
+Every image a session stores inline:
+
+    chat_sessions/<id>  messages[i].bitmapBase64 = "<base64 JPEG>"
+
+is replaced by a reference to a blob keyed by the SHA-256 of its bytes:
+
+    chat_sessions/<id>  messages[i].bitmapRef = "<sha256>"
+    chat_blobs/<sha256> {data: "<base64 JPEG>", size, userIds: [...], createdAt}
+
+The turns prune_chat_sessions --max-messages moved to a session's archive
+subcollection (chat_sessions/<id>/archive/<first index>) are compacted the
+same way, together with their session.
+
+Identical images are stored once, and session documents shrink to their
+text, so the app loads the session list faster and long sessions stay far
+from the 1 MiB document limit. The app resolves bitmapRef when it loads a
+session and writes references itself when it saves one.
+
+Sessions are streamed in pages and written in throttled batches. Each
+session update carries its update_time as a precondition, so a session the
+app saved in the meantime is re-read and compacted again instead of being
+overwritten. New blobs are created, never set: an existing blob's data is
+never rewritten, it only gains the user in userIds. Progress is checkpointed after every page; an interrupted run
+resumes where it stopped.
+
+Usage:
+    python compact_chat_sessions.py --dry-run                   # Size report, no writes
+    python compact_chat_sessions.py                             # Compact (resumes if interrupted)
+    python compact_chat_sessions.py --restart                   # Ignore the saved cursor
+    python compact_chat_sessions.py --user <uid>                # Only one user's sessions
+    python compact_chat_sessions.py --emulator localhost:8080   # Run against the emulator
+
+Requirements:
+    pip install firebase-admin
+"""
+
+import argparse
+import base64
+import binascii
+import hashlib
+import os
+import sys
+from datetime import datetime, timezone
+
+from firebase_common import SCRIPT_DIR, initialize_firebase, use_emulator
+from catalog_shards import MAX_DOCUMENT_BYTES
+from document_store import field_values
+from export_chat_history import read_archive
+from firestore_jobs import (
+    DEFAULT_PAGE_SIZE, BatchWriter, Checkpoint, ConflictError, estimate_size, iter_pages
+)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+SESSIONS_COLLECTION = "chat_sessions"
+BLOBS_COLLECTION = "chat_blobs"
+
+# Local resume state (git-ignored)
+DEFAULT_CURSOR_FILE = os.path.join(SCRIPT_DIR, ".compact_cursor.json")
+
+DEFAULT_WRITES_PER_SECOND = 50.0
+
+# Times a page is re-read when the app saved one of its sessions mid-run
+MAX_CONFLICT_RETRIES = 3
+
+# Sessions listed in the report
+LARGEST_SESSIONS = 5
+
+# ============================================================================
+# FUNCTIONS
+# ============================================================================
+
+def image_digest(data):
+    """Return (sha256 hex, byte size) of a base64 image, or None if it is not valid base64"""
+    try:
+        raw = base64.b64decode(data, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    return hashlib.sha256(raw).hexdigest(), len(raw)
+
+def compact_messages(messages):
+    """Replace inline images with references
+
+    Returns (messages, {digest: (base64, size)}, invalid image count).
+    Images that are not valid base64 are left inline.
+    """
+    compacted = []
+    images = {}
+    invalid = 0
+    for message in messages:
+        data = message.get('bitmapBase64') if isinstance(message, dict) else None
+        if not isinstance(data, str) or not data:
+            compacted.append(message)
+            continue
+        digest = image_digest(data)
+        if digest is None:
+            invalid += 1
+            compacted.append(message)
+            continue
+
+        images[digest[0]] = (data, digest[1])
+        message = dict(message)
+        message['bitmapBase64'] = None
+        message['bitmapRef'] = digest[0]
+        compacted.append(message)
+    return compacted, images, invalid
+
+def new_report():
+    """Empty counters for a compaction run"""
+    return {
+        "sessions": 0, "sessionsWithImages": 0, "images": 0, "invalidImages": 0,
+        "bytesBefore": 0, "bytesAfter": 0, "blobsWritten": 0, "blobsReused": 0,
+        "blobBytes": 0, "conflicts": 0, "largest": []
+    }
+
+def merge_report(total, page):
+    """Add a page's counters to the running totals"""
+    for key, value in page.items():
+        if key != "largest":
+            total[key] += value
+    total["largest"] = sorted(total["largest"] + page["largest"], reverse=True)[:LARGEST_SESSIONS]
+    return total
+
+def format_bytes(size):
+    """Human readable byte count"""
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024.0
+    return f"{size:.1f} GiB"
+
+def print_report(report, dry_run=False, stats=None):
+    """Print the size report of a run"""
+    before, after = report["bytesBefore"], report["bytesAfter"]
+    saved = (1 - after / before) * 100 if before else 0.0
+    blobs = "Blobs to write" if dry_run else "Blobs written"
+
+    print(f"\n📊 Chat session compaction{' (dry run)' if dry_run else ''}:")
+    print(f"   Sessions scanned:   {report['sessions']} ({report['sessionsWithImages']} with inline images)")
+    print(f"   Inline images:      {report['images']} moved, {report['invalidImages']} invalid left inline")
+    print(f"   {blobs + ':':19s} {report['blobsWritten']} ({format_bytes(report['blobBytes'])}), "
+          f"{report['blobsReused']} deduplicated")
+    print(f"   Session documents:  {format_bytes(before)} → {format_bytes(after)} (-{saved:.1f}%)")
+    if report["conflicts"]:
+        print(f"   Pages re-read after concurrent edits: {report['conflicts']}")
+    if stats:
+        print(f"   Writes: {stats['writes']} in {stats['commits']} commits, {stats['retries']} retries")
+    if report["largest"]:
+        print("   Largest sessions before compaction:")
+        for size, session_id in report["largest"]:
+            print(f"      {session_id:40s} {format_bytes(size):>10s} "
+                  f"({size / MAX_DOCUMENT_BYTES * 100:.0f}% of the document limit)")
+
+def lookup_blobs(db, digests, known_blobs):
+    """Record which blobs already exist (and their owners) with one get_all()"""
+    missing = [digest for digest in digests if digest not in known_blobs]
+    if not missing:
+        return
+    refs = [db.collection(BLOBS_COLLECTION).document(digest) for digest in missing]
+    for snapshot in db.get_all(refs, field_paths=["userIds"]):
+        if snapshot.exists:
+            known_blobs[snapshot.id] = set((snapshot.to_dict() or {}).get('userIds', []))
+
+def compact_document(report, snapshot, data):
+    """Count one session or archive document; returns (size, its compaction or None)"""
+    messages, images, invalid = compact_messages(data.get('messages') or [])
+    size = estimate_size(data)
+    report["invalidImages"] += invalid
+    report["bytesBefore"] += size
+    if not images:
+        report["bytesAfter"] += size
+        return size, None
+
+    report["images"] += sum(1 for old, new in zip(data.get('messages') or [], messages) if old is not new)
+    report["bytesAfter"] += estimate_size(dict(data, messages=messages))
+    return size, (snapshot, data, messages, images)
+
+def compact_page(db, writer, snapshots, known_blobs, dry_run=False):
+    """Queue the writes that compact one page of sessions; returns the page report"""
+    report = new_report()
+    compacted = []
+    for snapshot in snapshots:
+        if not snapshot.exists:
+            continue
+        data = snapshot.to_dict() or {}
+        report["sessions"] += 1
+        size, session = compact_document(report, snapshot, data)
+        report["largest"].append((size, snapshot.id))
+        documents = [session]
+        # Archived turns keep their images inline until they are compacted too
+        if data.get('archivedMessages'):
+            documents.extend(compact_document(report, part, part.to_dict() or {})[1]
+                             for part in read_archive(snapshot))
+        documents = [document for document in documents if document]
+        if documents:
+            report["sessionsWithImages"] += 1
+            compacted.extend(documents)
+
+    report["largest"] = sorted(report["largest"], reverse=True)[:LARGEST_SESSIONS]
+    if not dry_run:
+        lookup_blobs(db, {digest for *_, images in compacted for digest in images}, known_blobs)
+
+    for snapshot, data, messages, images in compacted:
+        user_id = data.get('userId', '')
+        values = field_values(db)
+        operations = []
+        for digest, (encoded, size) in images.items():
+            ref = db.collection(BLOBS_COLLECTION).document(digest)
+            if digest not in known_blobs:
+                report["blobsWritten"] += 1
+                report["blobBytes"] += size
+                known_blobs[digest] = {user_id}
+                if not dry_run:
+                    # create(), not set(): a blob that appeared since the lookup fails
+                    # the batch and the page is re-read, so it is never rewritten
+                    operations.append(writer.create(ref, {
+                        "data": encoded,
+                        "size": size,
+                        "userIds": [user_id],
+                        "createdAt": values.SERVER_TIMESTAMP
+                    }))
+                continue
+
+            report["blobsReused"] += 1
+            if user_id not in known_blobs[digest]:
+                known_blobs[digest].add(user_id)
+                if not dry_run:
+                    operations.append(writer.update(ref, {"userIds": values.ArrayUnion([user_id])}))
+
+        if dry_run:
+            continue
+        # Fails the batch if the app (or the pruner) changed this document after we read it
+        option = db.write_option(last_update_time=snapshot.update_time)
+        operations.append(writer.update(snapshot.reference, {"messages": messages}, option=option))
+        writer.add(operations, tag=snapshot.id)
+    return report
+
+def compact_sessions(db, args):
+    """Walk chat_sessions page by page; returns the final report"""
+    checkpoint = Checkpoint(args.cursor_file)
+    state = {} if (args.restart or args.dry_run) else checkpoint.load()
+    if state and state.get("user") != args.user:
+        print(f"⚠️ Saved cursor was for --user {state.get('user')}; starting over")
+        state = {}
+    if state:
+        print(f"⏩ Resuming after session {state['cursor']} (started {state.get('startedAt')})")
+
+    report = state.get("report") or new_report()
+    report["largest"] = [tuple(item) for item in report["largest"]]
+    started_at = state.get("startedAt") or datetime.now(timezone.utc).isoformat(timespec="seconds")
+    filters = [("userId", "==", args.user)] if args.user else None
+    sessions = db.collection(SESSIONS_COLLECTION)
+    writer = BatchWriter(db, args.writes_per_second)
+    known_blobs = {}
+
+    for snapshots in iter_pages(sessions, args.page_size, state.get("cursor"), filters):
+        for attempt in range(MAX_CONFLICT_RETRIES + 1):
+            try:
+                page_report = compact_page(db, writer, snapshots, known_blobs, args.dry_run)
+                writer.flush()
+                break
+            except ConflictError as e:
+                if attempt == MAX_CONFLICT_RETRIES:
+                    raise
+                print(f"🔁 {len(e.tags)} session(s) or blob(s) changed while compacting - re-reading the page")
+                writer.pending, writer.tags, writer.pending_bytes = [], [], 0
+                known_blobs.clear()
+                snapshots = list(db.get_all([snapshot.reference for snapshot in snapshots]))
+                report["conflicts"] += 1
+
+        merge_report(report, page_report)
+        if not args.dry_run:
+            checkpoint.save({
+                "cursor": snapshots[-1].id,
+                "user": args.user,
+                "startedAt": started_at,
+                "report": report
+            })
+        print(f"   … {report['sessions']} sessions scanned, {report['blobsWritten']} blobs "
+              f"{'to write' if args.dry_run else 'written'}")
+        if args.limit and report["sessions"] >= args.limit:
+            print(f"⏸️ Stopped after --limit {args.limit} sessions (run again to continue)")
+            return report, writer.stats
+
+    if not args.dry_run:
+        checkpoint.clear()
+    return report, writer.stats
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Move inline chat images into a deduplicated blob store"
+    )
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Only report sizes and savings, write nothing")
+    parser.add_argument("--user", help="Only compact the sessions of this userId")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE,
+                        help=f"Sessions read per query page (default: {DEFAULT_PAGE_SIZE})")
+    parser.add_argument("--writes-per-second", type=float, default=DEFAULT_WRITES_PER_SECOND,
+                        help=f"Write budget (default: {DEFAULT_WRITES_PER_SECOND:g})")
+    parser.add_argument("--limit", type=int, help="Stop after roughly this many sessions")
+    parser.add_argument("--cursor-file", default=DEFAULT_CURSOR_FILE,
+                        help="Where the resume cursor is kept")
+    parser.add_argument("--restart", action="store_true", help="Ignore a saved cursor")
+    parser.add_argument("--emulator", metavar="HOST:PORT",
+                        help="Use the Firestore emulator instead of production")
+    parser.add_argument("--yes", "-y", action="store_true",
+                        help="Compact without asking for confirmation")
+    return parser.parse_args(argv)
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main(argv=None):
+    """Main function"""
+
+    print("\n" + "="*60)
+    print("🗜️ Chat Session Compactor for Mark VII")
+    print("="*60)
+
+    args = parse_args(argv)
+    if args.emulator:
+        use_emulator(args.emulator)
+    db = initialize_firebase()
+
+    if not args.dry_run and not args.yes:
+        scope = f"user {args.user}" if args.user else "all users"
+        print(f"\n⚠️ This will rewrite {SESSIONS_COLLECTION} documents of {scope} "
+              f"and add blobs to {BLOBS_COLLECTION}")
+        confirm = input("Continue? (y/n): ").strip().lower()
+        if confirm != 'y':
+            print("❌ Cancelled")
+            return
+
+    report, stats = compact_sessions(db, args)
+    print_report(report, args.dry_run, None if args.dry_run else stats)
+    print("\n✅ Dry run complete (nothing written)" if args.dry_run else "\n✅ Compaction complete")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n👋 Interrupted - run again to resume from the last completed page")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ Unexpected error: {e}")
+        sys.exit(1)
@@ -0,0 +1,151 @@
+"""
+CSV File Watcher
+Blocks until watched catalog CSVs change and reports which ones did
+
+On Linux, inotify is used (through ctypes, no extra packages). The parent
+directories are watched instead of the files themselves, so editors that
+save by writing a temp file and renaming it over the CSV are still seen.
+Everywhere else, or with --poll, files are polled by mtime and size.
+
+Saves usually arrive as bursts (truncate, write, rename, backup file), so
+collect_changes() waits until the files have been quiet for a debounce
+interval before returning.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+DEFAULT_DEBOUNCE = 1.0
+DEFAULT_POLL_INTERVAL = 1.0
+
+# inotify event masks (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+# struct inotify_event header: wd, mask, cookie, len
+EVENT_HEADER = struct.Struct("iIII")
+
+# ============================================================================
+# FUNCTIONS
+# ============================================================================
+
+class InotifyWatcher:
+    """Watches the parent directories of a set of files with inotify"""
+
+    def __init__(self, paths):
+        self.paths = {os.path.abspath(path) for path in paths}
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self.directories = {}
+        for directory in sorted({os.path.dirname(path) for path in self.paths}):
+            wd = libc.inotify_add_watch(self.fd, directory.encode(), WATCH_MASK)
+            if wd < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+            self.directories[wd] = directory
+
+    def wait(self, timeout=None):
+        """Return the watched paths changed within timeout seconds (None blocks)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            readable, _, _ = select.select([self.fd], [], [], remaining)
+            if not readable:
+                return set()
+            # Events on other files in the directory (temp files, backups) are ignored
+            changed = self.read_events()
+            if changed:
+                return changed
+
+    def read_events(self):
+        """Drain pending events and return the watched paths they touched"""
+        changed = set()
+        try:
+            buffer = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(buffer):
+            wd, _, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+            offset += EVENT_HEADER.size
+            name = buffer[offset:offset + length].rstrip(b"\0").decode('utf-8', 'replace')
+            offset += length
+            path = os.path.join(self.directories.get(wd, ""), name)
+            if path in self.paths:
+                changed.add(path)
+        return changed
+
+    def close(self):
+        """Release the inotify descriptor"""
+        os.close(self.fd)
+
+class PollingWatcher:
+    """Watches a set of files by polling their mtime and size"""
+
+    def __init__(self, paths, interval=DEFAULT_POLL_INTERVAL):
+        self.paths = {os.path.abspath(path) for path in paths}
+        self.interval = interval
+        self.signatures = {path: self.signature(path) for path in self.paths}
+
+    @staticmethod
+    def signature(path):
+        """(mtime_ns, size) of a file, or None if it does not exist"""
+        try:
+            stat = os.stat(path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def wait(self, timeout=None):
+        """Return the watched paths changed within timeout seconds (None blocks)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = set()
+            for path in self.paths:
+                signature = self.signature(path)
+                if signature != self.signatures[path]:
+                    self.signatures[path] = signature
+                    changed.add(path)
+            if changed:
+                return changed
+
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return changed
+            time.sleep(self.interval if remaining is None else min(self.interval, remaining))
+
+    def close(self):
+        """Nothing to release"""
+
+def make_watcher(paths, poll=False, poll_interval=DEFAULT_POLL_INTERVAL):
+    """Create an inotify watcher, falling back to polling"""
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(paths)
+        except (OSError, AttributeError) as e:
+            print(f"⚠️ inotify unavailable ({e}) - polling every {poll_interval:g}s")
+    return PollingWatcher(paths, poll_interval)
+
+def collect_changes(watcher, debounce=DEFAULT_DEBOUNCE):
+    """Block until a watched file changes, then until changes stop for debounce seconds"""
+    changed = watcher.wait()
+    while True:
+        more = watcher.wait(debounce)
+        if not more:
+            return changed
+        changed |= more
@@ -0,0 +1,488 @@
+"""
+Document Store
+The document store the catalog engine writes to, and its backends
+
+The engine (catalog_sync, catalog_shards, catalog_history, catalog_views)
+only uses this part of the Firestore client API, so anything that has it
+can stand in for Firestore:
+
+    store.collection(path) / store.document(path)
+    store.batch()                 create(ref, data), set(ref, data, merge=),
+                                  update(ref, data, option=), delete(ref, option=), commit()
+    store.get_all(refs, field_paths=None)
+    store.write_option(last_update_time=...)
+    collection.document(id), collection.where(field, op, value), order_by(field, direction=),
+    limit(n), start_after(snapshot or {field: value}), select(fields), stream()
+    reference.get(), create(), set(), update(), delete(), collection(name), .id, .path
+    snapshot.exists, .id, .reference, .update_time, to_dict(), get(field)
+
+field_values(store) returns the sentinels to write with it
+(SERVER_TIMESTAMP, DELETE_FIELD, ArrayUnion, DESCENDING): Firestore's for a client,
+the store's own for MemoryStore, so the in-memory backend never imports
+the Firebase SDK.
+
+Backends (open_store()):
+    memory      MemoryStore: a process-local, thread-safe store with atomic
+                batches, preconditions, update times and Firestore's batch
+                and document size limits, for hermetic tests and benchmarks
+    emulator    A Firestore client connected to the local emulator
+    firestore   A Firestore client for a real project (service account key)
+
+Requirements:
+    pip install firebase-admin (not for the memory backend)
+"""
+
+import copy
+import operator
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from run_report import estimate_size
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+BACKENDS = ["memory", "emulator", "firestore"]
+
+DEFAULT_EMULATOR_HOST = "localhost:8080"
+
+# Firestore's limits on one commit and on one document
+MAX_BATCH_WRITES = 500
+MAX_DOCUMENT_BYTES = 1024 * 1024
+
+WHERE_OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda value, options: value in options,
+    "not-in": lambda value, options: value not in options,
+    "array-contains": lambda value, item: isinstance(value, list) and item in value,
+}
+
+# ============================================================================
+# FUNCTIONS
+# ============================================================================
+
+class Sentinel:
+    """A special field value of MemoryStore (server timestamp, field delete)"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+class ArrayUnion:
+    """MemoryStore's firestore.ArrayUnion: appends the values a list lacks"""
+
+    def __init__(self, values):
+        self.values = list(values)
+
+    def apply(self, current):
+        result = list(current) if isinstance(current, list) else []
+        for value in self.values:
+            if value not in result:
+                result.append(copy.deepcopy(value))
+        return result
+
+# Sentinels understood by MemoryStore
+MEMORY_FIELD_VALUES = SimpleNamespace(
+    SERVER_TIMESTAMP=Sentinel("SERVER_TIMESTAMP"),
+    DELETE_FIELD=Sentinel("DELETE_FIELD"),
+    ArrayUnion=ArrayUnion,
+    ASCENDING="ASCENDING",
+    DESCENDING="DESCENDING"
+)
+
+def field_values(store=None):
+    """SERVER_TIMESTAMP, DELETE_FIELD, ArrayUnion and DESCENDING for writing to and querying a store"""
+    values = getattr(store, "field_values", None)
+    if values is not None:
+        return values
+    from firebase_admin import firestore
+
+    return SimpleNamespace(
+        SERVER_TIMESTAMP=firestore.SERVER_TIMESTAMP,
+        DELETE_FIELD=firestore.DELETE_FIELD,
+        ArrayUnion=firestore.ArrayUnion,
+        ASCENDING=firestore.Query.ASCENDING,
+        DESCENDING=firestore.Query.DESCENDING
+    )
+
+# Named like the google.api_core exceptions, which the scripts match by name
+class NotFound(Exception):
+    """update() of a document that does not exist"""
+
+class AlreadyExists(Exception):
+    """create() of a document that exists"""
+
+class FailedPrecondition(Exception):
+    """A write option did not hold (the document changed since it was read)"""
+
+class InvalidArgument(Exception):
+    """A write Firestore would reject (too many writes, document too large)"""
+
+def order_key(value):
+    """Sort key following Firestore's ordering of value types"""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, datetime):
+        return (3, value if value.tzinfo else value.replace(tzinfo=timezone.utc))
+    if isinstance(value, str):
+        return (4, value)
+    if isinstance(value, (bytes, bytearray)):
+        return (5, bytes(value))
+    return (6, repr(value))
+
+def get_field(data, field):
+    """Value of a (dotted) field path, and whether it is present"""
+    for part in field.split("."):
+        if not isinstance(data, dict) or part not in data:
+            return None, False
+        data = data[part]
+    return data, True
+
+def resolve_value(value, now, current=None):
+    """Copy of a value with SERVER_TIMESTAMP replaced by the commit time
+
+    An ArrayUnion is applied to current, the value it replaces.
+    """
+    if value is MEMORY_FIELD_VALUES.SERVER_TIMESTAMP:
+        return now
+    if isinstance(value, ArrayUnion):
+        return value.apply(current)
+    if isinstance(value, dict):
+        return {key: resolve_value(item, now) for key, item in value.items()
+                if item is not MEMORY_FIELD_VALUES.DELETE_FIELD}
+    if isinstance(value, list):
+        return [resolve_value(item, now) for item in value]
+    return copy.deepcopy(value)
+
+def merge_fields(target, data, now):
+    """Merge data into target field by field, like set(merge=True)"""
+    for key, value in data.items():
+        if value is MEMORY_FIELD_VALUES.DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, dict) and isinstance(target.get(key), dict):
+            merge_fields(target[key], value, now)
+        else:
+            target[key] = resolve_value(value, now, target.get(key))
+
+class MemorySnapshot:
+    """A document as read from a MemoryStore"""
+
+    def __init__(self, reference, data, update_time=None, field_paths=None):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self.update_time = update_time
+        if data is not None and field_paths is not None:
+            data = {key: value for key, value in data.items() if key in field_paths}
+        self._data = data
+
+    def to_dict(self):
+        return copy.deepcopy(self._data)
+
+    def get(self, field):
+        return copy.deepcopy(get_field(self._data or {}, field)[0])
+
+class MemoryDocument:
+    """Reference to a document of a MemoryStore"""
+
+    def __init__(self, store, path):
+        self.store = store
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def __eq__(self, other):
+        return isinstance(other, MemoryDocument) and other.store is self.store and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+    def collection(self, name):
+        return MemoryQuery(self.store, f"{self.path}/{name}")
+
+    def get(self, field_paths=None):
+        return self.store.read(self, field_paths)
+
+    def create(self, data):
+        self.store.commit([("create", self, data, {})])
+
+    def set(self, data, merge=False):
+        self.store.commit([("set", self, data, {"merge": merge})])
+
+    def update(self, data, option=None):
+        self.store.commit([("update", self, data, {"option": option})])
+
+    def delete(self, option=None):
+        self.store.commit([("delete", self, None, {"option": option})])
+
+class MemoryQuery:
+    """A collection of a MemoryStore, or a query on one"""
+
+    def __init__(self, store, path, filters=(), orders=(), count=None, start=None, fields=None):
+        self.store = store
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+        self.filters = tuple(filters)
+        self.orders = tuple(orders)
+        self.count = count
+        self.start = start
+        self.fields = fields
+
+    def _copy(self, **changes):
+        state = {"filters": self.filters, "orders": self.orders, "count": self.count,
+                 "start": self.start, "fields": self.fields, **changes}
+        return MemoryQuery(self.store, self.path, **state)
+
+    def document(self, document_id=None):
+        return MemoryDocument(self.store, f"{self.path}/{document_id or uuid.uuid4().hex[:20]}")
+
+    def where(self, field, op, value):
+        if op not in WHERE_OPERATORS:
+            raise InvalidArgument(f"unsupported where() operator {op!r}")
+        return self._copy(filters=self.filters + ((field, op, value),))
+
+    def order_by(self, field, direction=MEMORY_FIELD_VALUES.ASCENDING):
+        return self._copy(orders=self.orders + ((field, direction == MEMORY_FIELD_VALUES.DESCENDING),))
+
+    def limit(self, count):
+        return self._copy(count=count)
+
+    def start_after(self, value):
+        return self._copy(start=value)
+
+    def select(self, fields):
+        return self._copy(fields=list(fields))
+
+    def list_documents(self):
+        return [snapshot.reference for snapshot in self.store.children(self.path)]
+
+    def _sort_key(self, snapshot):
+        key = []
+        for field, descending in self.orders or (("__name__", False),):
+            value = snapshot.id if field == "__name__" else get_field(snapshot._data, field)[0]
+            key.append(order_key(value))
+        return key
+
+    def _start_key(self):
+        if isinstance(self.start, MemorySnapshot):
+            return self._sort_key(self.start)
+        key = []
+        for field, _ in self.orders or (("__name__", False),):
+            value = self.start.get(field)
+            if isinstance(value, MemoryDocument):
+                value = value.id
+            key.append(order_key(value))
+        return key
+
+    def stream(self):
+        snapshots = []
+        for snapshot in self.store.children(self.path):
+            data = snapshot._data
+            if all(get_field(data, field)[1] for field, _ in self.orders if field != "__name__") and all(
+                    get_field(data, field)[1] and WHERE_OPERATORS[op](get_field(data, field)[0], value)
+                    for field, op, value in self.filters):
+                snapshots.append(snapshot)
+
+        # Stable sorts from the last order_by() to the first
+        orders = self.orders or (("__name__", False),)
+        for position in reversed(range(len(orders))):
+            descending = orders[position][1]
+            snapshots.sort(key=lambda snapshot: self._sort_key(snapshot)[position], reverse=descending)
+
+        if self.start is not None:
+            start = self._start_key()
+            index = 0
+            for index, snapshot in enumerate(snapshots):
+                if self._after(self._sort_key(snapshot), start, orders):
+                    break
+            else:
+                index = len(snapshots)
+            snapshots = snapshots[index:]
+        if self.count is not None:
+            snapshots = snapshots[:self.count]
+        for snapshot in snapshots:
+            yield MemorySnapshot(snapshot.reference, snapshot._data, snapshot.update_time, self.fields)
+
+    @staticmethod
+    def _after(key, start, orders):
+        for value, bound, (_, descending) in zip(key, start, orders):
+            if value != bound:
+                return value < bound if descending else value > bound
+        return False
+
+    def get(self):
+        return list(self.stream())
+
+class MemoryBatch:
+    """A WriteBatch of a MemoryStore: all writes apply, or none"""
+
+    def __init__(self, store):
+        self.store = store
+        self.operations = []
+
+    def create(self, reference, data):
+        self.operations.append(("create", reference, data, {}))
+
+    def set(self, reference, data, merge=False):
+        self.operations.append(("set", reference, data, {"merge": merge}))
+
+    def update(self, reference, data, option=None):
+        self.operations.append(("update", reference, data, {"option": option}))
+
+    def delete(self, reference, option=None):
+        self.operations.append(("delete", reference, None, {"option": option}))
+
+    def commit(self):
+        operations, self.operations = self.operations, []
+        return self.store.commit(operations)
+
+class MemoryStore:
+    """In-memory stand-in for a Firestore client (see the module docstring)
+
+    documents seeds the store with {path: data}. Reads and commits are
+    serialized by a lock, so worker threads can share one store.
+    """
+
+    field_values = MEMORY_FIELD_VALUES
+
+    def __init__(self, documents=None):
+        self.documents = {}
+        self.update_times = {}
+        self.lock = threading.RLock()
+        self.clock = datetime.now(timezone.utc)
+        self.stats = {"reads": 0, "writes": 0, "deletes": 0, "commits": 0}
+        if documents:
+            self.commit([("set", self.document(path), data, {}) for path, data in documents.items()])
+
+    def collection(self, path):
+        return MemoryQuery(self, path)
+
+    def document(self, path):
+        return MemoryDocument(self, path)
+
+    def batch(self):
+        return MemoryBatch(self)
+
+    def write_option(self, last_update_time=None, exists=None):
+        return {"last_update_time": last_update_time, "exists": exists}
+
+    def get_all(self, references, field_paths=None):
+        for reference in references:
+            yield self.read(reference, field_paths)
+
+    def read(self, reference, field_paths=None):
+        """Snapshot of one document"""
+        with self.lock:
+            self.stats["reads"] += 1
+            data = self.documents.get(reference.path)
+            return MemorySnapshot(reference, copy.deepcopy(data), self.update_times.get(reference.path),
+                                  field_paths)
+
+    def children(self, path):
+        """Snapshots of the documents directly in a collection"""
+        prefix = path + "/"
+        with self.lock:
+            paths = [key for key in self.documents if key.startswith(prefix) and "/" not in key[len(prefix):]]
+            self.stats["reads"] += max(1, len(paths))
+            return [MemorySnapshot(self.document(key), copy.deepcopy(self.documents[key]),
+                                   self.update_times[key]) for key in paths]
+
+    def dump(self, prefix=""):
+        """{path: data} of every document under a path prefix"""
+        with self.lock:
+            return {path: copy.deepcopy(data) for path, data in sorted(self.documents.items())
+                    if path.startswith(prefix)}
+
+    def _check(self, kind, reference, options):
+        option = options.get("option") or {}
+        exists = reference.path in self.documents
+        if kind == "update" and not exists:
+            raise NotFound(f"No document to update: {reference.path}")
+        if kind == "create" and exists:
+            raise AlreadyExists(f"Document already exists: {reference.path}")
+        if option.get("exists") is not None and option["exists"] != exists:
+            raise FailedPrecondition(f"{reference.path} {'does not exist' if exists is False else 'exists'}")
+        expected = option.get("last_update_time")
+        if expected is not None and self.update_times.get(reference.path) != expected:
+            raise FailedPrecondition(f"{reference.path} changed since it was read")
+
+    def commit(self, operations):
+        """Apply a list of (kind, reference, data, options) atomically"""
+        if len(operations) > MAX_BATCH_WRITES:
+            raise InvalidArgument(f"maximum {MAX_BATCH_WRITES} writes allowed per request")
+        with self.lock:
+            for kind, reference, _, options in operations:
+                self._check(kind, reference, options)
+
+            # Every commit gets a distinct, increasing update time
+            now = max(datetime.now(timezone.utc), self.clock + timedelta(microseconds=1))
+            documents = dict(self.documents)
+            for kind, reference, data, options in operations:
+                if kind == "delete":
+                    documents.pop(reference.path, None)
+                    continue
+                if kind in ("create", "set") and not options.get("merge"):
+                    document = {}
+                else:
+                    document = copy.deepcopy(documents.get(reference.path) or {})
+                if kind == "update":
+                    for field, value in data.items():
+                        parent = document
+                        *parents, last = field.split(".")
+                        for part in parents:
+                            parent = parent.setdefault(part, {})
+                        if value is MEMORY_FIELD_VALUES.DELETE_FIELD:
+                            parent.pop(last, None)
+                        else:
+                            parent[last] = resolve_value(value, now, parent.get(last))
+                else:
+                    merge_fields(document, data, now)
+                if estimate_size(document) > MAX_DOCUMENT_BYTES:
+                    raise InvalidArgument(f"{reference.path} exceeds the maximum document size")
+                documents[reference.path] = document
+
+            written = {reference.path for _, reference, _, _ in operations}
+            for path in written:
+                if path in documents:
+                    self.update_times[path] = now
+                else:
+                    self.update_times.pop(path, None)
+            self.documents = documents
+            self.clock = now
+            self.stats["commits"] += 1
+            self.stats["writes"] += sum(1 for kind, *_ in operations if kind != "delete")
+            self.stats["deletes"] += sum(1 for kind, *_ in operations if kind == "delete")
+            return [now] * len(operations)
+
+def open_store(backend="memory", host=None, key_path=None, project_id=None, name="catalog-sync"):
+    """Open a document store backend (see BACKENDS)
+
+    emulator connects to host (FIRESTORE_EMULATOR_HOST or localhost:8080)
+    with a demo project id; firestore uses a service account key. Errors
+    are raised, never turned into an exit.
+    """
+    if backend == "memory":
+        return MemoryStore()
+
+    from firebase_common import SERVICE_ACCOUNT_KEY, EMULATOR_PROJECT_ID, initialize_project, use_emulator
+
+    if backend == "emulator":
+        use_emulator(host or os.environ.get("FIRESTORE_EMULATOR_HOST") or DEFAULT_EMULATOR_HOST)
+        return initialize_project(name, project_id=project_id or EMULATOR_PROJECT_ID)
+    if backend == "firestore":
+        return initialize_project(name, key_path or SERVICE_ACCOUNT_KEY, project_id)
+    raise ValueError(f"unknown backend {backend!r} (use one of {', '.join(BACKENDS)})")
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Chat History Exporter
+Exports chat_sessions to JSONL or Parquet files for offline analytics
+
+The updatedAt window being exported is split into time partitions that a
+pool of workers reads concurrently. Each worker pages through its partition
+and streams rows straight into its own file, so memory stays bounded by one
+query page per worker no matter how large the collection is.
+
+Rows are one per message by default (sessionId, userId, timestamps,
+isFromUser, modelUsed, promptChars, hasImage, ...), which is what per-model
+usage analysis needs; --rows sessions writes one summary row per session.
+Prompt text is only exported with --include-text, and images never are.
+
+Runs are incremental: the end of the exported window is saved as a
+watermark, and the next run only exports sessions updated since then. A
+session edited after it was exported shows up again in a later run, so
+readers should keep the row with the latest updatedAt per session.
+
+Turns that prune_chat_sessions --max-messages moved to a session's
+archive subcollection are read back and exported in front of its
+messages, so messageIndex counts from the first turn of the session.
+
+updatedAt is set by the client, so a session can land behind the
+watermark (a late commit or a skewed clock). Each run therefore re-reads
+the last --overlap-minutes before the watermark and skips the sessions the
+previous run already exported with the same updatedAt.
+
+Output layout:
+    <output>/<run id>/part-<n>.jsonl|parquet
+    <output>/<run id>/manifest.json
+
+Usage:
+    python export_chat_history.py                         # Incremental JSONL export
+    python export_chat_history.py --format parquet        # Parquet (needs pyarrow)
+    python export_chat_history.py --full                  # Ignore the watermark
+    python export_chat_history.py --since 2025-01-01      # Explicit window start
+    python export_chat_history.py --emulator localhost:8080
+
+Requirements:
+    pip install firebase-admin
+    pip install pyarrow (only for --format parquet)
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+
+from firebase_common import SCRIPT_DIR, initialize_firebase, use_emulator
+from firestore_jobs import DEFAULT_PAGE_SIZE, Checkpoint, iter_pages, with_retry
+from run_report import count_query
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+SESSIONS_COLLECTION = "chat_sessions"
+
+# Subcollection under each session holding the turns prune_chat_sessions moved out
+ARCHIVE_COLLECTION = "archive"
+
+DEFAULT_OUTPUT_DIR = os.path.join(SCRIPT_DIR, "exports")
+DEFAULT_CHECKPOINT_FILE = os.path.join(SCRIPT_DIR, ".export_checkpoint.json")
+
+DEFAULT_WORKERS = 4
+# Partitions per worker, so a busy time range does not hold up the whole run
+PARTITIONS_PER_WORKER = 4
+
+# Re-read before the watermark, for sessions committed late or with a skewed clock
+DEFAULT_OVERLAP_MINUTES = 15
+
+# Rows buffered per Parquet row group
+PARQUET_ROW_GROUP = 5000
+
+FORMATS = ["jsonl", "parquet"]
+ROW_KINDS = ["messages", "sessions"]
+
+# Column order of each row kind (also the Parquet schema order)
+MESSAGE_COLUMNS = [
+    "sessionId", "userId", "sessionCreatedAt", "sessionUpdatedAt", "messageIndex",
+    "messageId", "isFromUser", "modelUsed", "promptChars", "hasImage", "prompt"
+]
+SESSION_COLUMNS = [
+    "sessionId", "userId", "title", "createdAt", "updatedAt", "messageCount",
+    "userMessages", "modelMessages", "imageCount", "models"
+]
+
+# ============================================================================
+# FUNCTIONS
+# ============================================================================
+
+def to_datetime(value):
+    """Firestore timestamp (or ISO string) as an aware UTC datetime"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def has_image(message):
+    """True if a message carries an image inline or by reference"""
+    return bool(message.get('bitmapBase64') or message.get('bitmapRef'))
+
+def read_archive(snapshot):
+    """Archive documents of a session, oldest first"""
+    archive = snapshot.reference.collection(ARCHIVE_COLLECTION).order_by("__name__")
+    return count_query(with_retry(lambda: list(archive.stream()), label="archive read"))
+
+def with_archive(snapshot, data):
+    """Session data with its archived turns put back in front of its messages
+
+    Only sessions whose archivedMessages says they were split cost the
+    extra query; the others are returned as they are.
+    """
+    if not data.get('archivedMessages'):
+        return data
+    history = [message for part in read_archive(snapshot) for message in (part.to_dict() or {}).get('messages') or []]
+    return dict(data, messages=history + (data.get('messages') or []))
+
+def session_rows(data, kind="messages", include_text=False):
+    """Turn one session document into export rows"""
+    messages = [message for message in data.get('messages') or [] if isinstance(message, dict)]
+    created_at = to_datetime(data.get('createdAt'))
+    updated_at = to_datetime(data.get('updatedAt'))
+
+    if kind == "sessions":
+        models = sorted({m.get('modelUsed') for m in messages if not m.get('isFromUser') and m.get('modelUsed')})
+        return [{
+            "sessionId": data.get('id'),
+            "userId": data.get('userId'),
+            "title": data.get('title') if include_text else None,
+            "createdAt": created_at,
+            "updatedAt": updated_at,
+            "messageCount": len(messages),
+            "userMessages": sum(1 for m in messages if m.get('isFromUser')),
+            "modelMessages": sum(1 for m in messages if not m.get('isFromUser')),
+            "imageCount": sum(1 for m in messages if has_image(m)),
+            "models": models
+        }]
+
+    return [{
+        "sessionId": data.get('id'),
+        "userId": data.get('userId'),
+        "sessionCreatedAt": created_at,
+        "sessionUpdatedAt": updated_at,
+        "messageIndex": index,
+        "messageId": message.get('id'),
+        "isFromUser": bool(message.get('isFromUser')),
+        "modelUsed": message.get('modelUsed') or None,
+        "promptChars": len(message.get('prompt') or ""),
+        "hasImage": has_image(message),
+        "prompt": message.get('prompt') if include_text else None
+    } for index, message in enumerate(messages)]
+
+class JsonlWriter:
+    """Streams rows to a JSON Lines file"""
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def write(self, rows):
+        """Append rows"""
+        for row in rows:
+            record = {column: row.get(column) for column in self.columns}
+            self.file.write(json.dumps(record, ensure_ascii=False, default=lambda value: value.isoformat()))
+            self.file.write("\n")
+
+    def close(self):
+        """Flush and close the file"""
+        self.file.close()
+
+class ParquetWriter:
+    """Streams rows to a Parquet file in fixed-size row groups"""
+
+    def __init__(self, path, columns):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        types = {
+            "messageIndex": pa.int32(), "promptChars": pa.int32(), "messageCount": pa.int32(),
+            "userMessages": pa.int32(), "modelMessages": pa.int32(), "imageCount": pa.int32(),
+            "isFromUser": pa.bool_(), "hasImage": pa.bool_(), "models": pa.list_(pa.string()),
+            "sessionCreatedAt": pa.timestamp("us", tz="UTC"), "sessionUpdatedAt": pa.timestamp("us", tz="UTC"),
+            "createdAt": pa.timestamp("us", tz="UTC"), "updatedAt": pa.timestamp("us", tz="UTC")
+        }
+        self.pa = pa
+        self.path = path
+        self.columns = columns
+        self.schema = pa.schema([(column, types.get(column, pa.string())) for column in columns])
+        self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+        self.buffer = []
+
+    def write(self, rows):
+        """Append rows, writing a row group whenever enough are buffered"""
+        self.buffer.extend(rows)
+        if len(self.buffer) >= PARQUET_ROW_GROUP:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows as one row group"""
+        if self.buffer:
+            columns = {column: [row.get(column) for row in self.buffer] for column in self.columns}
+            self.writer.write_table(self.pa.table(columns, schema=self.schema))
+            self.buffer = []
+
+    def close(self):
+        """Write the last row group and close the file"""
+        self.flush()
+        self.writer.close()
+
+def make_writer(path, file_format, columns):
+    """Open a row writer for a partition file"""
+    if file_format == "parquet":
+        return ParquetWriter(path, columns)
+    return JsonlWriter(path, columns)
+
+def find_window_start(db, since=None):
+    """Start of the export window: the watermark, or the oldest updatedAt"""
+    if since is not None:
+        return since
+    query = db.collection(SESSIONS_COLLECTION).order_by("updatedAt").limit(1)
+    oldest = with_retry(lambda: list(query.stream()), label="window start")
+    return to_datetime(oldest[0].to_dict().get('updatedAt')) if oldest else None
+
+def split_window(start, end, count):
+    """Split [start, end) into count equal time ranges"""
+    step = (end - start) / count
+    bounds = [start + step * i for i in range(count)] + [end]
+    return [(bounds[i], bounds[i + 1]) for i in range(count) if bounds[i] < bounds[i + 1]]
+
+def export_partition(db, index, start, end, args, run_dir, seen=None, recent_from=None):
+    """Export the sessions with start <= updatedAt < end into one file
+
+    Sessions in seen ({id: updatedAt ISO}, exported by the previous run) are
+    skipped. Returns {"file", "sessions", "rows", "models", "skipped",
+    "recent"}, where recent lists the sessions read with updatedAt at or
+    after recent_from; empty partitions leave no file.
+    """
+    columns = SESSION_COLUMNS if args.rows == "sessions" else MESSAGE_COLUMNS
+    path = os.path.join(run_dir, f"part-{index:04d}.{args.format}")
+    filters = [("updatedAt", ">=", start), ("updatedAt", "<", end)]
+    writer = None
+    result = {"file": os.path.basename(path), "start": start.isoformat(), "end": end.isoformat(),
+              "sessions": 0, "rows": 0, "skipped": 0, "models": Counter(), "recent": {}}
+    try:
+        pages = iter_pages(db.collection(SESSIONS_COLLECTION), args.page_size, filters=filters,
+                           order_by="updatedAt")
+        for snapshots in pages:
+            for snapshot in snapshots:
+                data = snapshot.to_dict() or {}
+                data.setdefault('id', snapshot.id)
+                updated = to_datetime(data.get('updatedAt'))
+                if recent_from is not None and updated is not None and updated >= recent_from:
+                    result["recent"][snapshot.id] = updated.isoformat()
+                if updated is not None and (seen or {}).get(snapshot.id) == updated.isoformat():
+                    result["skipped"] += 1
+                    continue
+                data = with_archive(snapshot, data)
+                rows = session_rows(data, args.rows, args.include_text)
+                if writer is None:
+                    writer = make_writer(path, args.format, columns)
+                writer.write(rows)
+                result["sessions"] += 1
+                result["rows"] += len(rows)
+                result["models"].update(
+                    message.get('modelUsed') for message in data.get('messages') or []
+                    if isinstance(message, dict) and not message.get('isFromUser') and message.get('modelUsed')
+                )
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        result["file"] = None
+    return result
+
+def export_sessions(db, args):
+    """Export the selected window with a worker pool; returns the run manifest or None"""
+    checkpoint = Checkpoint(args.checkpoint_file)
+    state = {} if args.full else checkpoint.load()
+    overlap = timedelta(minutes=args.overlap_minutes)
+    seen = {}
+    if args.since:
+        since = to_datetime(args.since)
+    elif state.get("watermark"):
+        # Re-read the overlap; what the last run exported there is skipped
+        since = to_datetime(state["watermark"]) - overlap
+        seen = state.get("recent", {})
+    else:
+        since = None
+    # Sessions updated while the export runs belong to the next run
+    until = datetime.now(timezone.utc)
+    recent_from = until - overlap
+
+    start = find_window_start(db, since)
+    if start is None or start >= until:
+        print("✅ No sessions updated since the last export - nothing to do")
+        return None
+
+    partitions = split_window(start, until, args.workers * PARTITIONS_PER_WORKER)
+    run_id = until.strftime("%Y%m%dT%H%M%SZ")
+    suffix = 1
+    while os.path.exists(os.path.join(args.output, run_id)):
+        suffix += 1
+        run_id = f"{until:%Y%m%dT%H%M%SZ}-{suffix}"
+    run_dir = os.path.join(args.output, run_id)
+    os.makedirs(run_dir)
+
+    print(f"\n📤 Exporting sessions updated {start.isoformat(timespec='seconds')} → "
+          f"{until.isoformat(timespec='seconds')}")
+    print(f"   {len(partitions)} partitions, {args.workers} workers, {args.rows} rows as {args.format}")
+
+    started = time.perf_counter()
+    results = []
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = [
+            pool.submit(export_partition, db, index, partition_start, partition_end, args, run_dir,
+                        seen, recent_from)
+            for index, (partition_start, partition_end) in enumerate(partitions)
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if result["sessions"]:
+                print(f"   ✅ {result['file']}: {result['sessions']} sessions, {result['rows']} rows")
+
+    models = Counter()
+    recent = {}
+    for result in results:
+        models.update(result.pop("models"))
+        recent.update(result.pop("recent"))
+    skipped = sum(result.pop("skipped") for result in results)
+    if skipped:
+        print(f"   ⏭️ {skipped} sessions in the overlap were already exported")
+    results.sort(key=lambda result: result["start"])
+    if not any(result["file"] for result in results):
+        os.rmdir(run_dir)
+        checkpoint.save({"watermark": until.isoformat(), "recent": recent, "lastRun": state.get("lastRun")})
+        print("✅ No sessions updated in this window - nothing exported")
+        return None
+    manifest = {
+        "runId": run_id,
+        "format": args.format,
+        "rows": args.rows,
+        "includeText": args.include_text,
+        "since": start.isoformat(),
+        "until": until.isoformat(),
+        "sessions": sum(result["sessions"] for result in results),
+        "rowCount": sum(result["rows"] for result in results),
+        "files": [result for result in results if result["file"]],
+        "seconds": round(time.perf_counter() - started, 2)
+    }
+    with open(os.path.join(run_dir, "manifest.json"), 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+
+    # Only a complete run moves the watermark
+    checkpoint.save({"watermark": until.isoformat(), "recent": recent, "lastRun": run_id})
+    print_summary(manifest, models, run_dir)
+    return manifest
+
+def print_summary(manifest, models, run_dir, limit=10):
+    """Print what a run exported and the most used models"""
+    print(f"\n📊 Exported {manifest['sessions']} sessions ({manifest['rowCount']} rows) "
+          f"in {manifest['seconds']:.1f}s to {run_dir}")
+    if models:
+        print("   Model replies in this window:")
+        for model, count in models.most_common(limit):
+            print(f"      {count:8d}  {model}")
+        if len(models) > limit:
+            print(f"      ... and {len(models) - limit} more models")
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Export chat_sessions to JSONL or Parquet for analytics"
+    )
+    parser.add_argument("--format", choices=FORMATS, default="jsonl", help="Output format (default: jsonl)")
+    parser.add_argument("--rows", choices=ROW_KINDS, default="messages",
+                        help="One row per message (default) or per session")
+    parser.add_argument("--include-text", action="store_true",
+                        help="Also export prompt text and session titles")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_DIR, help="Directory for export runs")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Partitions read concurrently (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE,
+                        help=f"Sessions read per query page (default: {DEFAULT_PAGE_SIZE})")
+    parser.add_argument("--since", help="Export sessions updated at or after this ISO date/time")
+    parser.add_argument("--full", action="store_true", help="Ignore the saved watermark")
+    parser.add_argument("--overlap-minutes", type=float, default=DEFAULT_OVERLAP_MINUTES,
+                        help=f"Re-read this long before the watermark for late sessions "
+                             f"(default: {DEFAULT_OVERLAP_MINUTES})")
+    parser.add_argument("--checkpoint-file", default=DEFAULT_CHECKPOINT_FILE,
+                        help="Where the incremental watermark is kept")
+    parser.add_argument("--emulator", metavar="HOST:PORT",
+                        help="Use the Firestore emulator instead of production")
+    return parser.parse_args(argv)
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main(argv=None):
+    """Main function"""
+
+    print("\n" + "="*60)
+    print("📦 Chat History Exporter for Mark VII")
+    print("="*60)
+
+    args = parse_args(argv)
+    if args.format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("❌ Error: --format parquet needs pyarrow (pip install pyarrow)")
+            sys.exit(1)
+
+    if args.emulator:
+        use_emulator(args.emulator)
+    db = initialize_firebase()
+    export_sessions(db, args)
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n👋 Interrupted - the watermark was not moved, the next run exports this window again")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ Unexpected error: {e}")
+        sys.exit(1)
@@ -0,0 +1,124 @@
+"""
+Shared Firebase helpers for the Mark VII model update scripts
+
+Every script goes through initialize_firebase() so that the Admin SDK is
+initialized once per process, no matter how many catalogs a run touches.
+The SDK itself is only imported there, so --help, --plan and other offline
+modes never pay for the firebase_admin import or need the key file.
+
+When FIRESTORE_EMULATOR_HOST is set (or use_emulator() was called), the
+scripts talk to the local Firestore emulator instead, without a key file.
+
+Requirements:
+    pip install firebase-admin
+"""
+
+import sys
+import os
+
+from run_report import phase, timed
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Directory holding the scripts, CSV files and the service account key
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Path to your Firebase service account key (download from Firebase Console)
+# Override with the FIREBASE_SERVICE_ACCOUNT_KEY environment variable
+SERVICE_ACCOUNT_KEY = os.environ.get(
+    "FIREBASE_SERVICE_ACCOUNT_KEY",
+    os.path.join(SCRIPT_DIR, "mark-vii-firebase-service-account-key.json")
+)
+
+# Project id used with the Firestore emulator ("demo-" ids never reach production)
+EMULATOR_PROJECT_ID = os.environ.get("FIREBASE_PROJECT_ID", "demo-mark-vii")
+
+# ============================================================================
+# FUNCTIONS
+# ============================================================================
+
+def use_emulator(host):
+    """Point every later initialize_firebase() call at a Firestore emulator (host:port)"""
+    os.environ["FIRESTORE_EMULATOR_HOST"] = host
+
+def emulator_credential():
+    """Credential for the Firestore emulator, which accepts unauthenticated admin requests"""
+    from firebase_admin import credentials
+    from google.auth.credentials import AnonymousCredentials
+
+    class EmulatorCredential(credentials.Base):
+        def get_credential(self):
+            return AnonymousCredentials()
+
+    return EmulatorCredential()
+
+@timed("firebase.init")
+def initialize_firebase():
+    """Initialize Firebase Admin SDK (safe to call more than once)"""
+    try:
+        # Imported here so offline modes never load the SDK
+        with phase("firebase.import"):
+            import firebase_admin
+            from firebase_admin import credentials, firestore
+
+        # Check if already initialized
+        try:
+            firebase_admin.get_app()
+            return firestore.client()
+        except ValueError:
+            pass
+
+        emulator_host = os.environ.get("FIRESTORE_EMULATOR_HOST")
+        if emulator_host:
+            firebase_admin.initialize_app(emulator_credential(), {"projectId": EMULATOR_PROJECT_ID})
+            print(f"✅ Firebase initialized against the emulator at {emulator_host}")
+            return firestore.client()
+
+        if not os.path.exists(SERVICE_ACCOUNT_KEY):
+            print(f"❌ Error: Service account key not found!")
+            print(f"📥 Download it from:")
+            print(f"   Firebase Console → Project Settings → Service Accounts")
+            print(f"   → Generate New Private Key")
+            print(f"📁 Save it as: {SERVICE_ACCOUNT_KEY}")
+            sys.exit(1)
+
+        with phase("firebase.credentials"):
+            cred = credentials.Certificate(SERVICE_ACCOUNT_KEY)
+        firebase_admin.initialize_app(cred)
+        print("✅ Firebase initialized successfully")
+        return firestore.client()
+    except Exception as e:
+        print(f"❌ Error initializing Firebase: {e}")
+        sys.exit(1)
+
+@timed("firebase.init")
+def initialize_project(name, key_path=None, project_id=None):
+    """Initialize (or reuse) a named Firebase app and return its Firestore client
+
+    Used to talk to several Firebase projects in one process. Unlike
+    initialize_firebase() this raises instead of exiting, so one bad project
+    does not end the run. Against the emulator every project gets its own
+    project id (project_id or "demo-<name>").
+    """
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
+    try:
+        return firestore.client(firebase_admin.get_app(name))
+    except ValueError:
+        pass
+
+    if os.environ.get("FIRESTORE_EMULATOR_HOST"):
+        app = firebase_admin.initialize_app(emulator_credential(), {"projectId": project_id or f"demo-{name}"},
+                                            name=name)
+        return firestore.client(app)
+
+    if not key_path or not os.path.exists(key_path):
+        raise FileNotFoundError(f"Service account key not found: {key_path}")
+    options = {"projectId": project_id} if project_id else None
+    with phase("firebase.credentials"):
+        cred = credentials.Certificate(key_path)
+    app = firebase_admin.initialize_app(cred, options, name=name)
+    return firestore.client(app)
@@ -0,0 +1,215 @@
+"""
+Firestore Maintenance Job Helpers
+Pagination, checkpoints and throttled batch writes for jobs that walk a
+whole collection (such as chat_sessions)
+
+    iter_pages()    streams a collection in document id (or field) order, one
+                    page at a time, starting after a saved cursor
+    with_retry()    retries a read or commit on transient errors with backoff
+    Checkpoint      stores the cursor (and running totals) in a local JSON
+                    file after every committed page, so a job can resume
+    BatchWriter     groups writes into batches bounded by operation count and
+                    request size, spaces commits out to a writes/second
+                    budget and retries transient errors with backoff
+
+Requirements:
+    pip install firebase-admin
+"""
+
+import json
+import os
+import random
+import time
+
+from run_report import CountingBatch, count_query, estimate_size
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+DEFAULT_PAGE_SIZE = 100
+
+# Firestore allows 500 writes and 10 MiB per commit; stay below both
+MAX_BATCH_OPS = 450
+MAX_BATCH_BYTES = 9 * 1024 * 1024
+
+MAX_RETRIES = 5
+BASE_BACKOFF = 0.5
+
+# google.api_core exceptions worth retrying (matched by name, so the SDK is not imported)
+TRANSIENT_ERRORS = {
+    "Aborted", "DeadlineExceeded", "InternalServerError", "ResourceExhausted",
+    "ServiceUnavailable", "TooManyRequests", "Unknown"
+}
+# A precondition failed, or a create() found the document already there
+CONFLICT_ERRORS = {"FailedPrecondition", "AlreadyExists"}
+
+# ============================================================================
+# FUNCTIONS
+# ============================================================================
+
+class ConflictError(Exception):
+    """A batch was rejected because a document changed (or appeared) since it was read"""
+
+    def __init__(self, tags, error):
+        super().__init__(str(error))
+        self.tags = tags
+
+def with_retry(operation, retries=MAX_RETRIES, label="request", on_retry=None):
+    """Call operation(), retrying transient errors with exponential backoff and jitter"""
+    for attempt in range(retries + 1):
+        try:
+            return operation()
+        except Exception as e:
+            name = type(e).__name__
+            if name not in TRANSIENT_ERRORS or attempt == retries:
+                raise
+            backoff = BASE_BACKOFF * (2 ** attempt) * (1 + random.random())
+            print(f"⏳ {name} - retrying {label} in {backoff:.1f}s ({attempt + 1}/{retries})")
+            if on_retry:
+                on_retry()
+            time.sleep(backoff)
+
+def iter_pages(collection, page_size=DEFAULT_PAGE_SIZE, start_after=None, filters=None,
+               order_by="__name__"):
+    """Yield lists of document snapshots, one query page at a time
+
+    Pages are ordered by document id unless order_by names a field.
+    start_after is the id of the last document already handled (document id
+    order only). filters is a list of (field, op, value) applied first.
+    """
+    query = collection
+    for field, op, value in filters or []:
+        query = query.where(field, op, value)
+    query = query.order_by(order_by)
+
+    last = None
+    while True:
+        page = query.limit(page_size)
+        if last is not None:
+            page = page.start_after(last)
+        elif start_after:
+            page = page.start_after({"__name__": collection.document(start_after)})
+        snapshots = count_query(with_retry(lambda: list(page.stream()), label="page read"))
+        if not snapshots:
+            return
+        yield snapshots
+        if len(snapshots) < page_size:
+            return
+        last = snapshots[-1]
+
+class Checkpoint:
+    """Resume state of a job, kept in a local JSON file"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """Return the saved state, or {} when there is none"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"⚠️ Warning: Ignoring unreadable checkpoint {self.path}: {e}")
+            return {}
+
+    def save(self, state):
+        """Atomically replace the saved state"""
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(state, file, indent=2, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+    def clear(self):
+        """Remove the saved state (the job finished)"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+class BatchWriter:
+    """Commits queued writes in bounded, throttled and retried batches
+
+    Writes are queued in groups (for example a session and the blobs it
+    references) so a group is never split across two commits. A rejected
+    precondition raises ConflictError with the tags of the groups in the
+    failed batch, so the caller can re-read and redo them.
+    """
+
+    def __init__(self, db, writes_per_second=None, max_ops=MAX_BATCH_OPS,
+                 max_bytes=MAX_BATCH_BYTES, retries=MAX_RETRIES):
+        self.db = db
+        self.interval = 1.0 / writes_per_second if writes_per_second else 0.0
+        self.max_ops = max_ops
+        self.max_bytes = max_bytes
+        self.retries = retries
+        self.pending = []
+        self.tags = []
+        self.pending_bytes = 0
+        self.next_commit = 0.0
+        self.stats = {"writes": 0, "bytes": 0, "commits": 0, "retries": 0}
+
+    def create(self, ref, data):
+        """A create() operation for add(): fails the batch if the document exists"""
+        return ("create", ref, data, {})
+
+    def set(self, ref, data, merge=False):
+        """A set() operation for add()"""
+        return ("set", ref, data, {"merge": merge})
+
+    def update(self, ref, data, option=None):
+        """An update() operation for add(), optionally with a precondition"""
+        return ("update", ref, data, {"option": option} if option else {})
+
+    def delete(self, ref, option=None):
+        """A delete() operation for add(), optionally with a precondition"""
+        return ("delete", ref, None, {"option": option} if option else {})
+
+    def add(self, operations, tag=None):
+        """Queue a group of operations, committing first if it would not fit"""
+        size = sum(estimate_size(data) for _, _, data, _ in operations if data is not None)
+        if self.pending and (len(self.pending) + len(operations) > self.max_ops
+                             or self.pending_bytes + size > self.max_bytes):
+            self.flush()
+        self.pending.extend(operations)
+        self.pending_bytes += size
+        if tag is not None:
+            self.tags.append(tag)
+
+    def flush(self):
+        """Commit everything queued; returns the number of writes committed"""
+        if not self.pending:
+            return 0
+        operations, tags, size = self.pending, self.tags, self.pending_bytes
+        self.pending, self.tags, self.pending_bytes = [], [], 0
+
+        # Spread commits evenly over the writes/second budget
+        delay = self.next_commit - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+        def commit():
+            # A WriteBatch can only be committed once, so every attempt builds a new one
+            batch = CountingBatch(self.db.batch())
+            for kind, ref, data, options in operations:
+                if kind == "delete":
+                    batch.delete(ref, **options)
+                else:
+                    getattr(batch, kind)(ref, data, **options)
+            try:
+                batch.commit()
+            except Exception as e:
+                if type(e).__name__ in CONFLICT_ERRORS:
+                    raise ConflictError(tags, e)
+                raise
+
+        def count_retry():
+            self.stats["retries"] += 1
+
+        with_retry(commit, self.retries, "batch", count_retry)
+
+        self.next_commit = time.monotonic() + self.interval * len(operations)
+        self.stats["writes"] += len(operations)
+        self.stats["bytes"] += size
+        self.stats["commits"] += 1
+        return len(operations)
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Provider Catalog Importer
+Reconciles a catalog CSV with a provider's model listing (OpenRouter, Groq
+or Gemini)
+
+The listing is fetched live or loaded from a saved JSON file (--from), so
+imports can be replayed and tested offline. Listed models are normalized
+into the catalog schema and matched to the CSV by apiModel:
+
+    listed, in the CSV      order, displayName, isPro and isAvailable are
+                            kept; provider, contextLength, prices and
+                            capabilities are refreshed from the listing
+    listed, not in the CSV  added at the end, available, not Pro
+    in the CSV, not listed  marked unavailable (or dropped with --drop-missing)
+
+OpenRouter lists every free model twice (with and without ":free"); both
+map to the plain id the catalog uses. Only free models are added from
+OpenRouter unless --include-paid is given; paid models already in the CSV
+are still refreshed, and only count as missing when they are not listed.
+
+Usage:
+    python import_provider_models.py openrouter --dry-run
+    python import_provider_models.py openrouter --save-listing listing.json
+    python import_provider_models.py openrouter --from listing.json --summary changes.json
+    python import_provider_models.py gemini
+    python import_provider_models.py groq --csv groq_models.csv
+
+Requirements:
+    OPENROUTER_API_KEY / GROQ_API_KEY / GEMINI_API_KEY for live listings
+    (OpenRouter's listing is public)
+"""
+
+import argparse
+import http.client
+import json
+import os
+import re
+import sys
+from urllib.parse import urlsplit
+
+from model_probe import CATALOG_PROVIDERS, PROVIDERS, load_api_keys, provider_config
+from catalog_sync import (
+    CATALOGS, diff_catalogs, has_changes, print_catalog_diff, save_models_to_csv, validate_models_csv,
+    print_validation
+)
+from catalog_shards import model_provider
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Default CSV per provider (Groq has no catalog of its own, so it needs --csv)
+DEFAULT_CSVS = {
+    provider: next(catalog["csv"] for catalog in CATALOGS if catalog["name"] == name)
+    for name, provider in CATALOG_PROVIDERS.items()
+}
+
+# Providers whose listing can be fetched without an API key
+PUBLIC_LISTINGS = {"openrouter"}
+
+# Gemini listings are paged
+GEMINI_PAGE_SIZE = 1000
+
+DEFAULT_TIMEOUT = 30.0
+
+# ============================================================================
+# FUNCTIONS
+# ============================================================================
+
+def http_get_json(url, headers, timeout=DEFAULT_TIMEOUT):
+    """GET a JSON document"""
+    parts = urlsplit(url)
+    connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    connection = connection_class(parts.netloc, timeout=timeout)
+    try:
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        connection.request("GET", path, headers={"Accept": "application/json", **headers})
+        response = connection.getresponse()
+        body = response.read()
+        if response.status != 200:
+            raise RuntimeError(f"HTTP {response.status}: {body[:200].decode('utf-8', 'replace')}")
+        return json.loads(body)
+    finally:
+        connection.close()
+
+def fetch_listing(provider, api_key, base_urls=None):
+    """Fetch the model listing of a provider (all pages for Gemini)"""
+    config = provider_config(provider, base_urls)
+    if config["style"] == "gemini":
+        models, token = [], None
+        while True:
+            page = f"&pageToken={token}" if token else ""
+            data = http_get_json(f"{config['base_url']}/models?pageSize={GEMINI_PAGE_SIZE}{page}",
+                                 {"x-goog-api-key": api_key})
+            models.extend(data.get("models") or [])
+            token = data.get("nextPageToken")
+            if not token:
+                return {"models": models}
+    headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+    return http_get_json(f"{config['base_url']}/models", headers)
+
+def plain_id(model_id):
+    """Catalog id of a listed model: without the ":free" variant suffix"""
+    return re.sub(r':free$', '', model_id or '', flags=re.IGNORECASE)
+
+def price(value):
+    """Per-token price from a listing (None when unknown or variable)"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value >= 0 else None
+
+def display_name(name, model_id):
+    """Listing name without the "Provider: " prefix and " (free)" suffix"""
+    name = re.sub(r'\s*\(free\)\s*$', '', name or '', flags=re.IGNORECASE)
+    name = name.split(": ", 1)[1] if ": " in name else name
+    if not name.strip():
+        name = model_id.rsplit('/', 1)[-1].replace('-', ' ').title()
+    return name.strip()
+
+def normalize_openrouter(entry):
+    """An OpenRouter /models entry in the catalog schema"""
+    pricing = entry.get("pricing") or {}
+    prompt, completion = price(pricing.get("prompt")), price(pricing.get("completion"))
+    parameters = set(entry.get("supported_parameters") or [])
+    modalities = set((entry.get("architecture") or {}).get("input_modalities") or [])
+    capabilities = [tag for tag, present in (("vision", "image" in modalities),
+                                             ("tools", "tools" in parameters),
+                                             ("reasoning", "reasoning" in parameters)) if present]
+    api_model = plain_id(entry.get("id"))
+    return {
+        "displayName": display_name(entry.get("name"), api_model),
+        "apiModel": api_model,
+        "provider": api_model.split('/', 1)[0] if '/' in api_model else None,
+        "contextLength": entry.get("context_length") or None,
+        "promptPrice": prompt,
+        "completionPrice": completion,
+        "capabilities": capabilities,
+        "free": entry.get("id", "").lower().endswith(":free") or (prompt == 0 and completion == 0)
+    }
+
+def normalize_groq(entry):
+    """A Groq /models entry in the catalog schema"""
+    return {
+        "displayName": display_name(None, entry.get("id", "")),
+        "apiModel": entry.get("id", ""),
+        "provider": (entry.get("owned_by") or "").strip().lower() or None,
+        "contextLength": entry.get("context_window") or None,
+        "listed": entry.get("active", True),
+        "free": True
+    }
+
+def normalize_gemini(entry):
+    """A Gemini models.list entry in the catalog schema (None if it cannot chat)"""
+    if "generateContent" not in (entry.get("supportedGenerationMethods") or []):
+        return None
+    api_model = (entry.get("name") or "").removeprefix("models/")
+    return {
+        "displayName": display_name(entry.get("displayName"), api_model),
+        "apiModel": api_model,
+        "provider": "google",
+        "contextLength": entry.get("inputTokenLimit") or None,
+        "free": True
+    }
+
+NORMALIZERS = {
+    "openrouter": normalize_openrouter,
+    "groq": normalize_groq,
+    "gemini": normalize_gemini,
+}
+
+def normalize_listing(provider, listing):
+    """{apiModel: entry} of every model of a listing
+
+    Entries carry the catalog fields known from the listing plus "free";
+    empty metadata is left out so it never overwrites what the CSV has.
+    """
+    raw = listing.get("models") if provider == "gemini" else listing.get("data")
+    if not isinstance(raw, list):
+        raise ValueError(f"not a {provider} model listing")
+
+    imported = {}
+    for entry in raw:
+        model = NORMALIZERS[provider](entry) if isinstance(entry, dict) else None
+        if not model or not model["apiModel"] or not model.pop("listed", True):
+            continue
+        model = {key: value for key, value in model.items() if value not in (None, [], "")}
+        # The ":free" and plain entries of a model share an id; keep the first, fill gaps from the second
+        previous = imported.get(model["apiModel"], {})
+        imported[model["apiModel"]] = {**model, **previous,
+                                       "free": bool(model["free"] or previous.get("free"))}
+    return imported
+
+def reconcile(existing, imported, drop_missing=False, include_paid=False):
+    """Merge listed models into the CSV models
+
+    imported is the whole listing: a CSV row is only missing when the
+    provider does not list it at all, while paid models are only added
+    with include_paid. Returns (models, notes): the new list in CSV order
+    with new models at the end, and {"added", "missing"} apiModel lists.
+    """
+    models = []
+    notes = {"added": [], "missing": []}
+    for model in existing:
+        listed = imported.get(model['apiModel'])
+        if listed is None:
+            notes["missing"].append(model['apiModel'])
+            if not drop_missing:
+                models.append({**model, "isAvailable": False})
+            continue
+        # Manual columns win; metadata comes from the provider
+        metadata = {key: value for key, value in listed.items() if key not in ("displayName", "apiModel", "free")}
+        models.append({**model, **metadata})
+
+    known = {model['apiModel'] for model in existing}
+    next_order = max((model['order'] for model in existing), default=0) + 1
+    for api_model, listed in imported.items():
+        if api_model in known or not (listed["free"] or include_paid):
+            continue
+        models.append({
+            "displayName": listed["displayName"],
+            "apiModel": api_model,
+            "isAvailable": True,
+            "order": next_order,
+            "isPro": False,
+            **{key: value for key, value in listed.items() if key not in ("displayName", "apiModel", "free")}
+        })
+        next_order += 1
+        notes["added"].append(api_model)
+    return models, notes
+
+def change_summary(provider, csv_file, existing, models, notes, diff):
+    """JSON-ready summary of an import"""
+    return {
+        "provider": provider,
+        "csv": csv_file,
+        "before": len(existing),
+        "after": len(models),
+        "added": notes["added"],
+        "missing": notes["missing"],
+        "updated": {api: {key: list(change) for key, change in fields.items()}
+                    for api, fields in diff["changed"].items()},
+        "providers": sorted({model.get('provider') or model_provider(model) for model in models})
+    }
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Reconcile a catalog CSV with an OpenRouter, Groq or Gemini model listing"
+    )
+    parser.add_argument("provider", choices=sorted(PROVIDERS), help="Provider whose listing is imported")
+    parser.add_argument("--from", dest="listing", metavar="FILE",
+                        help="Use a saved listing JSON instead of fetching it")
+    parser.add_argument("--save-listing", metavar="FILE", help="Save the fetched listing for offline runs")
+    parser.add_argument("--csv", help="Catalog CSV to reconcile (default: the provider's catalog CSV)")
+    parser.add_argument("--output", help="Where to write the updated CSV (default: overwrite --csv)")
+    parser.add_argument("--summary", metavar="FILE", help="Write the change summary as JSON")
+    parser.add_argument("--include-paid", action="store_true",
+                        help="Also import paid models (OpenRouter lists both)")
+    parser.add_argument("--drop-missing", action="store_true",
+                        help="Remove CSV rows the provider no longer lists instead of marking them unavailable")
+    parser.add_argument("--base-url", action="append", metavar="PROVIDER=URL",
+                        help="Override a provider endpoint, e.g. a local stub server (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="Show the changes without writing the CSV")
+    return parser.parse_args(argv)
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main(argv=None):
+    """Main function"""
+
+    print("\n" + "="*60)
+    print("📥 Provider Catalog Importer for Mark VII")
+    print("="*60)
+
+    args = parse_args(argv)
+    csv_file = args.csv or DEFAULT_CSVS.get(args.provider)
+    if not csv_file:
+        print(f"❌ {args.provider} has no catalog CSV of its own - pass --csv")
+        sys.exit(1)
+
+    if args.listing:
+        with open(args.listing, 'r', encoding='utf-8') as file:
+            listing = json.load(file)
+        print(f"📂 Loaded listing from {args.listing}")
+    else:
+        key = load_api_keys()[args.provider]
+        if not key and args.provider not in PUBLIC_LISTINGS:
+            print(f"❌ Set {PROVIDERS[args.provider]['key_env']} or use --from with a saved listing")
+            sys.exit(1)
+        base_urls = dict(item.split("=", 1) for item in args.base_url or [])
+        listing = fetch_listing(args.provider, key, base_urls)
+        print(f"🌐 Fetched the {args.provider} listing")
+        if args.save_listing:
+            with open(args.save_listing, 'w', encoding='utf-8') as file:
+                json.dump(listing, file, ensure_ascii=False)
+            print(f"💾 Saved listing to {args.save_listing}")
+
+    imported = normalize_listing(args.provider, listing)
+    free = sum(1 for model in imported.values() if model["free"])
+    print(f"✅ {len(imported)} models listed ({free} free)")
+
+    if os.path.exists(csv_file):
+        existing, errors, warnings = validate_models_csv(csv_file)
+        if errors:
+            print_validation(csv_file, errors, warnings)
+            sys.exit(1)
+    else:
+        print(f"📄 {csv_file} does not exist yet - starting a new catalog")
+        existing = []
+
+    models, notes = reconcile(existing, imported, args.drop_missing, args.include_paid)
+    diff = diff_catalogs(existing, models)
+    print_catalog_diff(diff, os.path.basename(csv_file))
+    if notes["missing"]:
+        action = "dropped" if args.drop_missing else "marked unavailable"
+        print(f"\n⚠️ {len(notes['missing'])} models are no longer listed and were {action}")
+
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as file:
+            json.dump(change_summary(args.provider, csv_file, existing, models, notes, diff), file,
+                      indent=2, ensure_ascii=False)
+        print(f"🧾 Change summary written to {args.summary}")
+
+    if not has_changes(diff):
+        return
+    if args.dry_run:
+        print("\n✅ Dry run complete (CSV not written)")
+        return
+    if not save_models_to_csv(args.output or csv_file, models):
+        sys.exit(1)
+    print("   Review the CSV, then publish it with update_firebase_catalogs.py")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n👋 Interrupted by user. Goodbye!")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ Unexpected error: {e}")
+        sys.exit(1)
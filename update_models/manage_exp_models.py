@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Exception Models Manager
+Maintains app_config/exp_models, the models that need the ":free" suffix
+
+Devices add exception models at runtime, so the document only grows and
+older app versions leave duplicates behind. This script owns its layout:
+
+    status      Show entries, duplicates, stray fields and the layout
+    compact     Drop duplicates (by id without ":free", case-insensitive),
+                empty ids and stray test fields
+    migrate     Add the "byId" map keyed by that id, with an addedAt per
+                entry. "list" stays as a lean mirror for old clients
+    expire      Drop entries added more than --days ago (needs the map)
+    reconcile   Drop entries whose plain model id a probe reached after the
+                entry was added (the exception was fixed upstream). The
+                evidence is the probe published by the last --probe sync, or
+                a fresh probe of the plain ids with --probe; without either,
+                reconcile refuses to run
+
+Every write rewrites "list" and "byId" together with a new catalogHash and
+catalogVersion, and only succeeds if the document did not change since it
+was read; on a conflict it is read and planned again. Entries listed in
+exp_models.csv are never expired or reconciled away, since the next
+catalog sync would add them back.
+
+Usage:
+    python manage_exp_models.py status
+    python manage_exp_models.py compact --dry-run
+    python manage_exp_models.py migrate --yes
+    python manage_exp_models.py expire --days 90
+    python manage_exp_models.py reconcile            # Run after a --probe sync
+    python manage_exp_models.py reconcile --probe    # Probe the plain ids now
+    python manage_exp_models.py compact --emulator localhost:8080
+
+Requirements:
+    pip install firebase-admin
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+from firebase_common import initialize_firebase, use_emulator
+from firestore_jobs import CONFLICT_ERRORS, with_retry
+from document_store import field_values
+from model_probe import CATALOG_PROVIDERS, DEFAULT_TIMEOUT, load_api_keys, print_probe_results, probe_catalog
+from catalog_sync import (
+    CATALOGS, COLLECTION_PATH, EXP_MAP_FIELD, HASH_FIELD, PROBE_FIELD, VERSION_FIELD, compute_catalog_hash,
+    exp_entries, exp_key, load_exp_models_from_csv, read_catalogs
+)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+EXP_CATALOG = next(catalog for catalog in CATALOGS if catalog["kind"] == "exp")
+EXP_DOCUMENT = EXP_CATALOG["document"]
+
+# Catalog whose apiModels are OpenRouter ids, used by reconcile
+RECONCILE_DOCUMENT = "models"
+
+# A published probe older than this is not evidence for reconcile
+DEFAULT_PROBE_MAX_AGE_HOURS = 24
+
+# Fields left behind by FirebaseConfigManager.testFirebaseWrite()
+STRAY_FIELDS = ["test", "timestamp"]
+
+COMMANDS = ["status", "compact", "migrate", "expire", "reconcile"]
+
+# Re-reads after a conflicting write before giving up
+MAX_CONFLICT_RETRIES = 3
+
+# ============================================================================
+# FUNCTIONS
+# ============================================================================
+
+def as_utc(value):
+    """A Firestore timestamp as an aware UTC datetime (None for anything else)
+
+    Local snapshots store timestamps as strings, so those are parsed too.
+    """
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def added_times(data):
+    """{exp_key: addedAt in UTC} of the dated entries in the map (empty before migrate)"""
+    by_id = (data or {}).get(EXP_MAP_FIELD) or {}
+    times = {}
+    for key, entry in by_id.items():
+        added = as_utc(entry.get('addedAt') if isinstance(entry, dict) else None)
+        if added is not None:
+            times[key] = added
+    return times
+
+def pinned_keys(csv_file):
+    """exp_key of every entry listed in the exceptions CSV (empty if there is none)"""
+    if not os.path.exists(csv_file):
+        return set()
+    entries = load_exp_models_from_csv(csv_file)
+    if entries is None:
+        raise ValueError(f"Could not read {csv_file}")
+    return {exp_key(entry['modelId']) for entry in entries}
+
+def fixed_keys(db, max_age_hours=DEFAULT_PROBE_MAX_AGE_HOURS):
+    """{exp_key: probe time} of the plain ids the last published probe reached
+
+    isAvailable is no evidence: it is set by hand, and the app adds an
+    exception exactly when a listed plain id fails. Only a successful probe
+    of the plain id is. Raises ValueError when the catalog has no probe
+    (sync with --probe first) or it is older than max_age_hours.
+    """
+    catalog = read_catalogs(db, [RECONCILE_DOCUMENT], use_cache=True)[RECONCILE_DOCUMENT] or {}
+    probe = catalog.get(PROBE_FIELD) or {}
+    probed_at = as_utc(probe.get('probedAt'))
+    if probed_at is None:
+        raise ValueError(f"{COLLECTION_PATH}/{RECONCILE_DOCUMENT} has no probe results - "
+                         f"sync with --probe first, or run reconcile --probe")
+    age = datetime.now(timezone.utc) - probed_at
+    if age > timedelta(hours=max_age_hours):
+        raise ValueError(f"the last probe of {RECONCILE_DOCUMENT} is {age.total_seconds() / 3600:.0f}h old "
+                         f"(limit {max_age_hours}h) - probe again first")
+    return {
+        exp_key(entry.get('apiModel')): probed_at for entry in probe.get('models') or []
+        if entry.get('apiModel') and not entry['apiModel'].lower().endswith(':free')
+    }
+
+def plain_id(model_id):
+    """The id an exception stands in for: modelId without its ":free" suffix"""
+    return model_id[:-len(":free")] if model_id.lower().endswith(":free") else model_id
+
+def probe_fixed_keys(db, entries, args):
+    """{exp_key: now} of the exceptions whose plain id answers a fresh probe
+
+    Raises ValueError when there is no API key to probe with.
+    """
+    provider = CATALOG_PROVIDERS[RECONCILE_DOCUMENT]
+    keys = load_api_keys(db)
+    if not keys.get(provider):
+        raise ValueError(f"no {provider} API key to probe with")
+    models = [{"apiModel": plain_id(entry['modelId'])} for entry in entries]
+    started = datetime.now(timezone.utc)
+    results = probe_catalog(models, provider, keys, timeout=args.probe_timeout)
+    print_probe_results(results, f"plain ids of {EXP_DOCUMENT}")
+    return {exp_key(api): started for api, result in results.items() if result["ok"]}
+
+def plan_cleanup(data, command, days=None, pinned=frozenset(), fixed=None):
+    """Work out the new contents of the document for one command
+
+    fixed maps exp_keys to the time a probe reached their plain id; an
+    entry only counts as fixed when it was added before that probe.
+    Returns a plan with the kept entries, the removed ones with a reason,
+    whether the map is written and whether anything changes at all.
+    """
+    data = data or {}
+    current_list = data.get('list') or []
+    entries = exp_entries(data)
+    times = added_times(data)
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days) if days is not None else None
+    fixed = fixed or {}
+
+    kept = []
+    removed = []
+    for entry in entries:
+        key = exp_key(entry['modelId'])
+        added = times.get(key)
+        if key in pinned:
+            kept.append(entry)
+        elif command == "expire" and added is not None and added < cutoff:
+            removed.append((entry, f"added {added.date().isoformat()}"))
+        elif command == "reconcile" and key in fixed and (added is None or added < fixed[key]):
+            removed.append((entry, f"plain id answered a probe at {fixed[key].isoformat(timespec='minutes')}"))
+        else:
+            kept.append(entry)
+
+    migrate = command == "migrate" or EXP_MAP_FIELD in data
+    by_id = data.get(EXP_MAP_FIELD) or {}
+    wanted = {exp_key(entry['modelId']): entry for entry in kept}
+    map_changed = migrate and (set(by_id) != set(wanted) or any(
+        not isinstance(by_id[key], dict)
+        or {"modelId": by_id[key].get('modelId'), "modelName": by_id[key].get('modelName')} != entry
+        for key, entry in wanted.items()
+    ))
+    stray = [field for field in STRAY_FIELDS if field in data]
+    redundant = len(current_list) - len({exp_key(entry.get('modelId')) for entry in current_list
+                                         if isinstance(entry, dict)} - {''})
+
+    return {
+        "entries": kept,
+        "removed": removed,
+        "times": times,
+        "migrate": migrate,
+        "stray": stray,
+        "redundant": redundant,
+        "needsWrite": bool(kept != current_list or map_changed or stray)
+    }
+
+def build_payload(plan, data, db=None):
+    """Fields written by update() for a plan: list, map, hash and version"""
+    values = field_values(db)
+
+    fields = {
+        "list": plan["entries"],
+        HASH_FIELD: compute_catalog_hash(plan["entries"]),
+        VERSION_FIELD: (data.get(VERSION_FIELD) or 0) + 1,
+        "lastUpdated": values.SERVER_TIMESTAMP
+    }
+    if plan["migrate"]:
+        # Entries without a known addedAt (new, or only in the list) start their age now
+        fields[EXP_MAP_FIELD] = {
+            exp_key(entry['modelId']): {
+                **entry,
+                "addedAt": plan["times"].get(exp_key(entry['modelId'])) or values.SERVER_TIMESTAMP
+            }
+            for entry in plan["entries"]
+        }
+    for field in plan["stray"]:
+        fields[field] = values.DELETE_FIELD
+    return fields
+
+def print_status(data):
+    """Print the layout and health of the document"""
+    data = data or {}
+    entries = exp_entries(data)
+    times = added_times(data)
+    by_id = data.get(EXP_MAP_FIELD)
+    print(f"\n📋 {COLLECTION_PATH}/{EXP_DOCUMENT} (version {data.get(VERSION_FIELD, 'N/A')}):")
+    print(f"   {len(entries)} exception models, {len(data.get('list') or [])} entries in list")
+    if by_id is None:
+        print("   Layout: list only - run 'migrate' to add the map")
+    else:
+        missing = [entry for entry in entries if exp_key(entry['modelId']) not in by_id]
+        print(f"   Layout: list + {EXP_MAP_FIELD} ({len(by_id)} keys, {len(missing)} only in list)")
+        dated = sorted(times.values())
+        if dated:
+            print(f"   Added between {dated[0].date().isoformat()} and {dated[-1].date().isoformat()}")
+
+def print_plan(plan, data, command, limit=25):
+    """Print what a command would change"""
+    before = len(data.get('list') or [])
+    print(f"\n📝 {command}: {before} list entries → {len(plan['entries'])}")
+    if plan["redundant"]:
+        print(f"   🧹 {plan['redundant']} duplicate or empty entries")
+    for entry, reason in plan["removed"][:limit]:
+        print(f"   ➖ {entry['modelId']} ({reason})")
+    if len(plan["removed"]) > limit:
+        print(f"   ... and {len(plan['removed']) - limit} more")
+    if plan["migrate"] and EXP_MAP_FIELD not in data:
+        print(f"   🗂️ Adding {EXP_MAP_FIELD} with {len(plan['entries'])} keys")
+    if plan["stray"]:
+        print(f"   🗑️ Removing stray fields: {', '.join(plan['stray'])}")
+
+def run_command(db, command, args):
+    """Read, plan and (unless dry-run) rewrite exp_models; returns False on failure"""
+    doc_ref = db.collection(COLLECTION_PATH).document(EXP_DOCUMENT)
+    pinned = pinned_keys(args.csv) if command in ("expire", "reconcile") else frozenset()
+    fixed = {}
+    if command == "reconcile":
+        try:
+            if args.probe:
+                snapshot = with_retry(doc_ref.get, label="exp_models read")
+                fixed = probe_fixed_keys(db, exp_entries(snapshot.to_dict() if snapshot.exists else None), args)
+            else:
+                fixed = fixed_keys(db, args.probe_max_age)
+        except ValueError as e:
+            print(f"❌ Not reconciling: {e}")
+            return False
+    if pinned:
+        print(f"📌 {len(pinned)} entries in {os.path.basename(args.csv)} are kept")
+
+    for attempt in range(MAX_CONFLICT_RETRIES + 1):
+        snapshot = with_retry(doc_ref.get, label="exp_models read")
+        if not snapshot.exists:
+            print(f"📭 {COLLECTION_PATH}/{EXP_DOCUMENT} does not exist - nothing to do")
+            return True
+        data = snapshot.to_dict() or {}
+
+        if command == "status":
+            print_status(data)
+            return True
+        if command == "expire" and EXP_MAP_FIELD not in data:
+            print("❌ Entries have no addedAt yet - run 'migrate' first")
+            return False
+
+        plan = plan_cleanup(data, command, getattr(args, "days", None), pinned, fixed)
+        print_plan(plan, data, command)
+        if not plan["needsWrite"]:
+            print(f"\n✅ {COLLECTION_PATH}/{EXP_DOCUMENT} is already clean - nothing to write")
+            return True
+        if args.dry_run:
+            print("\n✅ Dry run complete (nothing written)")
+            return True
+        if not args.yes and attempt == 0:
+            confirm = input("Continue? (y/n): ").strip().lower()
+            if confirm != 'y':
+                print("❌ Cancelled")
+                return True
+
+        # Only write if nobody added an exception since the read
+        option = db.write_option(last_update_time=snapshot.update_time)
+        try:
+            with_retry(lambda: doc_ref.update(build_payload(plan, data, db), option=option),
+                       label="exp_models write")
+        except Exception as e:
+            if type(e).__name__ not in CONFLICT_ERRORS:
+                raise
+            print(f"🔁 {EXP_DOCUMENT} changed while planning - reading it again")
+            continue
+
+        print(f"\n✅ Wrote {len(plan['entries'])} exception models "
+              f"(version {(data.get(VERSION_FIELD) or 0) + 1})")
+        return True
+
+    print(f"❌ {EXP_DOCUMENT} kept changing - giving up after {MAX_CONFLICT_RETRIES} retries")
+    return False
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Compact, migrate, expire and reconcile app_config/exp_models"
+    )
+    parser.add_argument("command", nargs="?", choices=COMMANDS, default="status",
+                        help="What to do (default: status)")
+    parser.add_argument("--days", type=int, default=90,
+                        help="expire: drop entries added more than this many days ago (default: 90)")
+    parser.add_argument("--csv", default=EXP_CATALOG["csv"],
+                        help="Exceptions CSV whose entries are never removed")
+    parser.add_argument("--probe", action="store_true",
+                        help="reconcile: probe the plain ids now instead of using the published probe")
+    parser.add_argument("--probe-timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help=f"With --probe, per-request timeout in seconds (default: {DEFAULT_TIMEOUT:.0f})")
+    parser.add_argument("--probe-max-age", type=float, default=DEFAULT_PROBE_MAX_AGE_HOURS,
+                        help=f"reconcile: max age in hours of the published probe "
+                             f"(default: {DEFAULT_PROBE_MAX_AGE_HOURS})")
+    parser.add_argument("--dry-run", action="store_true", help="Show the changes without writing")
+    parser.add_argument("--yes", "-y", action="store_true", help="Write without asking for confirmation")
+    parser.add_argument("--emulator", metavar="HOST:PORT",
+                        help="Use the Firestore emulator instead of production")
+    return parser.parse_args(argv)
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main(argv=None):
+    """Main function"""
+
+    print("\n" + "="*60)
+    print("🧾 Exception Models Manager for Mark VII")
+    print("="*60)
+
+    args = parse_args(argv)
+    if args.emulator:
+        use_emulator(args.emulator)
+    db = initialize_firebase()
+
+    if not run_command(db, args.command, args):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n👋 Interrupted by user. Goodbye!")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ Unexpected error: {e}")
+        sys.exit(1)
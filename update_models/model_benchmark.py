@@ -0,0 +1,166 @@
+"""
+Model Latency Benchmark
+Runs a fixed prompt set against every catalog entry and ranks models by
+measured speed
+
+Each model gets len(BENCHMARK_PROMPTS) x repetitions streaming requests
+(through the same endpoints, limits and timeouts as --probe). Results are
+summarized as p50/p95 time to first token and tokens per second, saved to
+a local JSON results file and can be used to rewrite the "order" column so
+the fastest available models come first within each isPro tier.
+"""
+
+import asyncio
+import json
+import os
+from datetime import datetime, timezone
+
+from model_probe import (
+    DEFAULT_CONCURRENCY, DEFAULT_TIMEOUT, make_limiters, model_endpoint, probe_model
+)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Fixed prompt set, so runs are comparable over time
+BENCHMARK_PROMPTS = [
+    "Reply with the single word: ready.",
+    "List three primary colors, comma separated.",
+    "Explain in two sentences what an API rate limit is.",
+]
+
+DEFAULT_REPETITIONS = 3
+DEFAULT_MAX_TOKENS = 64
+
+# Local results file (one entry per catalog, replaced on every run)
+DEFAULT_RESULTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_results.json")
+
+# ============================================================================
+# FUNCTIONS
+# ============================================================================
+
+def percentile(values, pct):
+    """Linear-interpolated percentile of a list (None when empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+async def benchmark_catalog_async(models, provider, keys, repetitions=DEFAULT_REPETITIONS,
+                                  concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT,
+                                  rates=None, base_urls=None, max_tokens=DEFAULT_MAX_TOKENS):
+    """Run every prompt repetitions times against every model
+
+    Returns {apiModel: [result, ...]} with one probe result per request.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    limiters = make_limiters(rates)
+    tasks = [
+        probe_model(model, model_endpoint(model, provider), keys, limiters, semaphore, timeout,
+                    base_urls, prompt=prompt, max_tokens=max_tokens)
+        for _ in range(repetitions)
+        for prompt in BENCHMARK_PROMPTS
+        for model in models
+    ]
+
+    samples = {model['apiModel']: [] for model in models}
+    for api_model, result in await asyncio.gather(*tasks):
+        samples[api_model].append(result)
+    return samples
+
+def benchmark_catalog(models, provider, keys, **options):
+    """Benchmark a catalog and return {apiModel: [result, ...]}"""
+    return asyncio.run(benchmark_catalog_async(models, provider, keys, **options))
+
+def summarize_samples(samples):
+    """Reduce raw samples to p50/p95 TTFT and tokens per second per model"""
+    summary = {}
+    for api_model, results in samples.items():
+        ok = [result for result in results if result["ok"]]
+        ttfts = [result["ttftMs"] for result in ok if result["ttftMs"] is not None]
+        rates = []
+        for result in ok:
+            generation = (result["latencyMs"] - (result["ttftMs"] or 0)) / 1000.0
+            if result["tokens"] and generation > 0:
+                rates.append(result["tokens"] / generation)
+
+        summary[api_model] = {
+            "runs": len(results),
+            "failures": sum(1 for result in results if result["ok"] is False),
+            "skipped": sum(1 for result in results if result["ok"] is None),
+            "ttftP50Ms": round(percentile(ttfts, 50)) if ttfts else None,
+            "ttftP95Ms": round(percentile(ttfts, 95)) if ttfts else None,
+            "tokensPerSecP50": round(percentile(rates, 50), 1) if rates else None,
+            "tokensPerSecP95": round(percentile(rates, 95), 1) if rates else None
+        }
+    return summary
+
+def print_benchmark_summary(summary, label="models"):
+    """Print a benchmark summary, fastest first"""
+    measured = [api for api, stats in summary.items() if stats["ttftP50Ms"] is not None]
+    unmeasured = [api for api in summary if api not in measured]
+
+    print(f"\n⏱️ Benchmark of {label} ({len(measured)} measured, {len(unmeasured)} without data):")
+    print(f"   {'model':50s} {'ttft p50':>9s} {'ttft p95':>9s} {'tok/s p50':>10s} {'fail':>5s}")
+    for api in sorted(measured, key=lambda api: summary[api]["ttftP50Ms"]):
+        stats = summary[api]
+        tps = f"{stats['tokensPerSecP50']:.1f}" if stats["tokensPerSecP50"] is not None else "-"
+        print(f"   {api:50s} {stats['ttftP50Ms']:7d}ms {stats['ttftP95Ms']:7d}ms {tps:>10s} "
+              f"{stats['failures']:5d}")
+    for api in unmeasured:
+        stats = summary[api]
+        reason = "skipped" if stats["skipped"] == stats["runs"] else f"{stats['failures']} failures"
+        print(f"   {api:50s} {'-':>9s} {'-':>9s} {'-':>10s} ({reason})")
+
+def save_benchmark_results(results_file, catalog, summary, repetitions, max_tokens):
+    """Store a catalog's summary in the local results file"""
+    try:
+        data = {}
+        if os.path.exists(results_file):
+            with open(results_file, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+
+        data[catalog] = {
+            "createdAt": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "prompts": BENCHMARK_PROMPTS,
+            "repetitions": repetitions,
+            "maxTokens": max_tokens,
+            "models": summary
+        }
+        with open(results_file, 'w', encoding='utf-8') as file:
+            json.dump(data, file, indent=2, sort_keys=True)
+        print(f"💾 Saved benchmark results to {results_file}")
+        return True
+    except Exception as e:
+        print(f"❌ Error saving benchmark results: {e}")
+        return False
+
+def rank_order(models, summary):
+    """Return models with "order" rewritten by measured speed
+
+    Each isPro tier keeps the order values it already had, so free and pro
+    models stay interleaved as before. Inside a tier, available models with
+    measurements come first (lowest p50 TTFT, then highest tokens/sec), then
+    everything else in its previous order.
+    """
+    ranked = [dict(model) for model in models]
+    for tier in (False, True):
+        members = [model for model in ranked if bool(model.get('isPro')) == tier]
+        slots = sorted(model['order'] for model in members)
+
+        def speed_key(model):
+            stats = summary.get(model['apiModel']) or {}
+            measured = model.get('isAvailable') and stats.get("ttftP50Ms") is not None
+            if not measured:
+                return (1, 0, 0, model['order'])
+            return (0, stats["ttftP50Ms"], -(stats.get("tokensPerSecP50") or 0), model['order'])
+
+        for slot, model in zip(slots, sorted(members, key=speed_key)):
+            model['order'] = slot
+
+    ranked.sort(key=lambda model: model['order'])
+    return ranked
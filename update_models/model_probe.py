@@ -0,0 +1,338 @@
+"""
+Model Availability Prober
+Sends a minimal streaming request to every apiModel concurrently and
+records time to first token and total latency
+
+Dead model IDs are flipped to isAvailable FALSE before the catalog is
+synced, so users stop landing on models that only return errors. The
+latencies are published separately (see probe_measurements).
+
+Providers speak either the OpenAI-compatible chat completions API
+(OpenRouter, Groq) or the Gemini streamGenerateContent API. Base URLs can be
+overridden (--probe-base-url provider=url) to point at a local stub server.
+
+Only the standard library is used: each request runs http.client in a worker
+thread, scheduled by asyncio with a global concurrency limit, a per-provider
+rate limit and a per-request timeout.
+"""
+
+import asyncio
+import http.client
+import json
+import os
+import time
+from urllib.parse import urlsplit
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Provider endpoints; key_field is the matching field in app_config/api_keys
+PROVIDERS = {
+    "openrouter": {
+        "base_url": "https://openrouter.ai/api/v1",
+        "style": "openai",
+        "key_env": "OPENROUTER_API_KEY",
+        "key_field": "openrouterApiKey",
+        "rate": 5.0
+    },
+    "groq": {
+        "base_url": "https://api.groq.com/openai/v1",
+        "style": "openai",
+        "key_env": "GROQ_API_KEY",
+        "key_field": "groqApiKey",
+        "rate": 2.0
+    },
+    "gemini": {
+        "base_url": "https://generativelanguage.googleapis.com/v1beta",
+        "style": "gemini",
+        "key_env": "GEMINI_API_KEY",
+        "key_field": "geminiApiKey",
+        "rate": 2.0
+    },
+}
+
+# Endpoint of each catalog document; a row is routed elsewhere only when its
+# "provider" column names one of PROVIDERS (it usually holds the model vendor)
+CATALOG_PROVIDERS = {
+    "models": "openrouter",
+    "gemini_models": "gemini",
+}
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_TIMEOUT = 20.0
+PROBE_PROMPT = "Hi"
+
+# ============================================================================
+# FUNCTIONS
+# ============================================================================
+
+class RateLimiter:
+    """Spaces out request starts to at most rate per second"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        """Sleep until the next free slot"""
+        if not self.interval:
+            return
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+def make_limiters(rates=None):
+    """Create one RateLimiter per provider, applying rate overrides"""
+    return {
+        name: RateLimiter((rates or {}).get(name, config["rate"]))
+        for name, config in PROVIDERS.items()
+    }
+
+def provider_config(provider, base_urls=None):
+    """Return the endpoint config of a provider, applying base URL overrides"""
+    config = dict(PROVIDERS[provider])
+    if base_urls and provider in base_urls:
+        config["base_url"] = base_urls[provider]
+    return config
+
+def model_endpoint(model, provider):
+    """Provider endpoint that serves a catalog row
+
+    The row's "provider" is used when it is a PROVIDERS key; vendors like
+    "deepseek" (set by import_provider_models) fall back to provider.
+    """
+    row_provider = model.get('provider')
+    return row_provider if row_provider in PROVIDERS else provider
+
+def load_api_keys(db=None):
+    """Resolve API keys from the environment, falling back to app_config/api_keys"""
+    keys = {provider: os.environ.get(config["key_env"], "") for provider, config in PROVIDERS.items()}
+    if db is not None and not all(keys.values()):
+        try:
+            doc = db.collection("app_config").document("api_keys").get()
+            data = doc.to_dict() if doc.exists else {}
+            for provider, config in PROVIDERS.items():
+                keys[provider] = keys[provider] or data.get(config["key_field"], "")
+        except Exception as e:
+            print(f"⚠️ Warning: Could not read app_config/api_keys: {e}")
+    return keys
+
+def build_request(config, api_model, api_key, prompt=PROBE_PROMPT, max_tokens=1):
+    """Build (path, headers, body) for a minimal streaming request"""
+    base = urlsplit(config["base_url"])
+    if config["style"] == "gemini":
+        path = f"{base.path}/models/{api_model}:streamGenerateContent?alt=sse"
+        headers = {"Content-Type": "application/json", "x-goog-api-key": api_key}
+        body = {
+            "contents": [{"parts": [{"text": prompt}]}],
+            "generationConfig": {"maxOutputTokens": max_tokens}
+        }
+    else:
+        path = f"{base.path}/chat/completions"
+        headers = {"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"}
+        body = {
+            "model": api_model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": max_tokens,
+            "stream": True
+        }
+    return path, headers, json.dumps(body).encode('utf-8')
+
+def chunk_tokens(chunk):
+    """Return (reported completion tokens or None, 1 if the chunk carried text)"""
+    if not isinstance(chunk, dict):
+        return None, 0
+    usage = chunk.get("usage") or {}
+    metadata = chunk.get("usageMetadata") or {}
+    reported = usage.get("completion_tokens") or metadata.get("candidatesTokenCount")
+
+    has_text = False
+    for choice in chunk.get("choices") or []:
+        has_text = has_text or bool((choice.get("delta") or {}).get("content"))
+    for candidate in chunk.get("candidates") or []:
+        for part in (candidate.get("content") or {}).get("parts") or []:
+            has_text = has_text or bool(part.get("text"))
+    return reported, int(has_text)
+
+def set_deadline(sock, deadline):
+    """Let the next socket read wait only until deadline (perf_counter time)
+
+    Raises TimeoutError once the deadline has passed.
+    """
+    remaining = deadline - time.perf_counter()
+    if remaining <= 0:
+        raise TimeoutError("deadline exceeded")
+    sock.settimeout(remaining)
+
+def probe_once(config, api_model, api_key, timeout, prompt=PROBE_PROMPT, max_tokens=1):
+    """Run one blocking probe and return its result dict
+
+    timeout bounds the whole request, not each read: a stream that keeps
+    trickling chunks is cut off (TimeoutError) once it is used up, so the
+    worker thread never outlives it. ttftMs is the time to the first chunk
+    that carries text or reported tokens; role-only or empty deltas do not
+    count. tokens is the completion token count reported by the provider,
+    or the number of streamed text chunks when the provider does not report
+    usage.
+    """
+    base = urlsplit(config["base_url"])
+    connection_class = http.client.HTTPSConnection if base.scheme == "https" else http.client.HTTPConnection
+    path, headers, body = build_request(config, api_model, api_key, prompt, max_tokens)
+
+    started = time.perf_counter()
+    deadline = started + timeout
+    connection = connection_class(base.netloc, timeout=timeout)
+    response = None
+    try:
+        connection.request("POST", path, body=body, headers=headers)
+        # The response keeps reading from this socket after the connection lets go of it
+        sock = connection.sock
+        set_deadline(sock, deadline)
+        response = connection.getresponse()
+        if response.status != 200:
+            detail = response.read(300).decode('utf-8', 'replace').strip()
+            return {"ok": False, "status": response.status, "error": detail or response.reason,
+                    "ttftMs": None, "latencyMs": round((time.perf_counter() - started) * 1000),
+                    "tokens": 0}
+
+        ttft = None
+        error = None
+        reported = None
+        chunks = 0
+        while True:
+            set_deadline(sock, deadline)
+            raw = response.readline()
+            if not raw:
+                break
+            line = raw.decode('utf-8', 'replace').strip()
+            if not line.startswith("data:"):
+                continue
+            payload = line[5:].strip()
+            if payload == "[DONE]":
+                break
+            try:
+                chunk = json.loads(payload)
+            except ValueError:
+                chunk = {}
+            if isinstance(chunk, dict) and chunk.get("error"):
+                error = str(chunk["error"])
+            tokens, has_text = chunk_tokens(chunk)
+            if ttft is None and (has_text or tokens):
+                ttft = time.perf_counter() - started
+            reported = tokens or reported
+            chunks += has_text
+
+        latency = time.perf_counter() - started
+        if ttft is None:
+            error = error or "stream ended without any tokens"
+        return {"ok": error is None, "status": response.status, "error": error,
+                "ttftMs": round(ttft * 1000) if ttft is not None else None,
+                "latencyMs": round(latency * 1000),
+                "tokens": reported or chunks}
+    finally:
+        if response is not None:
+            response.close()
+        connection.close()
+
+async def probe_model(model, provider, keys, limiters, semaphore, timeout, base_urls,
+                      prompt=PROBE_PROMPT, max_tokens=1):
+    """Probe one model under the global and per-provider limits"""
+    api_model = model['apiModel']
+    config = provider_config(provider, base_urls)
+    if not keys.get(provider):
+        return api_model, {"ok": None, "status": None, "error": f"no {provider} API key",
+                           "ttftMs": None, "latencyMs": None, "tokens": 0}
+
+    async with semaphore:
+        await limiters[provider].wait()
+        try:
+            result = await asyncio.wait_for(
+                asyncio.to_thread(probe_once, config, api_model, keys[provider], timeout,
+                                  prompt, max_tokens),
+                timeout + 1
+            )
+        except (asyncio.TimeoutError, TimeoutError):
+            # probe_once enforces the deadline itself; wait_for is only a backstop
+            result = {"ok": False, "status": None, "error": f"timed out after {timeout:.0f}s",
+                      "ttftMs": None, "latencyMs": None, "tokens": 0}
+        except Exception as e:
+            result = {"ok": False, "status": None, "error": str(e), "ttftMs": None, "latencyMs": None,
+                      "tokens": 0}
+    return api_model, result
+
+async def probe_catalog_async(models, provider, keys, concurrency=DEFAULT_CONCURRENCY,
+                              timeout=DEFAULT_TIMEOUT, rates=None, base_urls=None):
+    """Probe every model of a catalog concurrently"""
+    semaphore = asyncio.Semaphore(concurrency)
+    limiters = make_limiters(rates)
+    tasks = [
+        probe_model(model, model_endpoint(model, provider), keys, limiters, semaphore, timeout, base_urls)
+        for model in models
+    ]
+    return dict(await asyncio.gather(*tasks))
+
+def probe_catalog(models, provider, keys, **options):
+    """Probe a catalog and return {apiModel: result}"""
+    return asyncio.run(probe_catalog_async(models, provider, keys, **options))
+
+def apply_probe_results(models, results):
+    """Return a copy of models with isAvailable updated from a probe
+
+    Models that failed are flipped to unavailable. Models that were skipped
+    (no API key) are left untouched. Models are never re-enabled here, since
+    an operator may have disabled them on purpose. Latencies are not copied
+    into the models: they change on every probe and would change the
+    catalog hash (see probe_measurements).
+    """
+    updated = []
+    for model in models:
+        model = dict(model)
+        result = results.get(model['apiModel'])
+        if result and result["ok"] is False:
+            model['isAvailable'] = False
+        updated.append(model)
+    return updated
+
+def probe_measurements(results):
+    """Return the latencies of the successful probes, sorted by apiModel
+
+    These are published in their own field next to the catalog, outside
+    the hashed list, so a probe alone never bumps catalogVersion.
+    """
+    return [
+        {"apiModel": api, "ttftMs": result["ttftMs"], "latencyMs": result["latencyMs"]}
+        for api, result in sorted(results.items())
+        if result["ok"]
+    ]
+
+def print_probe_results(results, label="models"):
+    """Print a probe summary"""
+    ok = [api for api, result in results.items() if result["ok"]]
+    failed = [api for api, result in results.items() if result["ok"] is False]
+    skipped = [api for api, result in results.items() if result["ok"] is None]
+
+    print(f"\n🩺 Probe of {label}: ✅ {len(ok)} ok   ❌ {len(failed)} failed   ⏭️ {len(skipped)} skipped")
+    for api in sorted(ok, key=lambda api: results[api]["ttftMs"]):
+        result = results[api]
+        print(f"   ✅ {api:50s} ttft {result['ttftMs']:6d} ms   total {result['latencyMs']:6d} ms")
+    for api in failed:
+        result = results[api]
+        status = f"HTTP {result['status']}" if result["status"] else "error"
+        print(f"   ❌ {api:50s} {status}: {str(result['error'])[:80]}")
+    if skipped:
+        print(f"   ⏭️ {len(skipped)} skipped: {results[skipped[0]]['error']}")
+
+def parse_provider_values(values, cast=str):
+    """Parse repeated provider=value options into a dict"""
+    parsed = {}
+    for value in values or []:
+        provider, _, raw = value.partition("=")
+        if provider not in PROVIDERS or not raw:
+            raise ValueError(f"expected provider=value with provider in {', '.join(PROVIDERS)}: {value}")
+        parsed[provider] = cast(raw)
+    return parsed
@@ -0,0 +1,190 @@
+"""
+Model Records
+Typed schema of one catalog entry (a row of models.csv or gemini_models.csv)
+
+Every row has the five core columns. The extended columns are optional and
+may be left out of the CSV or left empty per row:
+
+    provider         Who serves the model, e.g. "deepseek"
+    contextLength    Context window in tokens
+    promptPrice      USD per prompt (input) token
+    completionPrice  USD per completion (output) token
+    capabilities     Tags separated by ";", e.g. "vision;tools"
+
+Extended values are only published for rows that have them, so catalogs
+that do not use the columns keep the documents (and hashes) they had.
+"""
+
+import re
+from dataclasses import dataclass
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Required CSV columns
+MODEL_COLUMNS = ['displayName', 'apiModel', 'isAvailable', 'order', 'isPro']
+
+# Optional CSV columns, published only when set
+EXTENDED_COLUMNS = ['provider', 'contextLength', 'promptPrice', 'completionPrice', 'capabilities']
+
+# Values accepted in boolean columns
+TRUE_VALUES = ['true', 'yes', '1', 'y']
+FALSE_VALUES = ['false', 'no', '0', 'n']
+
+# Capabilities are lower-case tags separated by ";" (or "|")
+CAPABILITY_SEPARATOR = re.compile(r"[;|]")
+CAPABILITY_TAG = re.compile(r"^[a-z0-9][a-z0-9_.-]*$")
+
+# ============================================================================
+# FUNCTIONS
+# ============================================================================
+
+@dataclass(slots=True, frozen=True)
+class ModelRecord:
+    """One catalog entry with a fixed set of fields"""
+
+    display_name: str
+    api_model: str
+    is_available: bool = True
+    order: int = 0
+    is_pro: bool = False
+    provider: str | None = None
+    context_length: int | None = None
+    prompt_price: float | None = None
+    completion_price: float | None = None
+    capabilities: tuple = ()
+
+    def to_dict(self):
+        """Entry as published in "list": the core fields plus the extended ones that are set"""
+        data = {
+            "displayName": self.display_name,
+            "apiModel": self.api_model,
+            "isAvailable": self.is_available,
+            "order": self.order,
+            "isPro": self.is_pro
+        }
+        if self.provider:
+            data["provider"] = self.provider
+        if self.context_length is not None:
+            data["contextLength"] = self.context_length
+        if self.prompt_price is not None:
+            data["promptPrice"] = self.prompt_price
+        if self.completion_price is not None:
+            data["completionPrice"] = self.completion_price
+        if self.capabilities:
+            data["capabilities"] = list(self.capabilities)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """Record of a published entry (unknown fields are dropped)"""
+        return cls(
+            display_name=data.get('displayName') or '',
+            api_model=data.get('apiModel') or '',
+            is_available=data.get('isAvailable', True),
+            order=data.get('order') or 0,
+            is_pro=data.get('isPro', False),
+            provider=data.get('provider'),
+            context_length=data.get('contextLength'),
+            prompt_price=data.get('promptPrice'),
+            completion_price=data.get('completionPrice'),
+            capabilities=tuple(data.get('capabilities') or ())
+        )
+
+def parse_bool(value):
+    """True or False for a boolean cell, None if it is neither"""
+    value = (value or '').strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    return None
+
+def parse_row(row, line):
+    """Parse one csv.DictReader row into a ModelRecord
+
+    Every problem of the row is collected rather than stopping at the first.
+    Returns (record, errors); record is None when there are errors.
+    """
+    errors = []
+    cell = lambda column: (row.get(column) or '').strip()
+
+    api_model = cell('apiModel')
+    display_name = cell('displayName')
+    if not api_model:
+        errors.append(f"line {line}: empty apiModel")
+    if not display_name:
+        errors.append(f"line {line}: empty displayName")
+
+    flags = {}
+    for column in ('isAvailable', 'isPro'):
+        flags[column] = parse_bool(row.get(column))
+        if flags[column] is None:
+            errors.append(f"line {line}: {column} must be TRUE or FALSE, got {row.get(column)!r}")
+
+    try:
+        order = int(cell('order'))
+    except ValueError:
+        order = None
+        errors.append(f"line {line}: order must be an integer, got {row.get('order')!r}")
+
+    context_length = None
+    if cell('contextLength'):
+        try:
+            context_length = int(cell('contextLength'))
+            if context_length <= 0:
+                raise ValueError
+        except ValueError:
+            errors.append(f"line {line}: contextLength must be a positive integer, "
+                          f"got {row.get('contextLength')!r}")
+
+    prices = {}
+    for column in ('promptPrice', 'completionPrice'):
+        prices[column] = None
+        if cell(column):
+            try:
+                prices[column] = float(cell(column))
+                if not prices[column] >= 0:
+                    raise ValueError
+            except ValueError:
+                errors.append(f"line {line}: {column} must be a non-negative number (USD per token), "
+                              f"got {row.get(column)!r}")
+
+    capabilities = []
+    for tag in CAPABILITY_SEPARATOR.split(cell('capabilities').lower()):
+        tag = tag.strip()
+        if not tag or tag in capabilities:
+            continue
+        if not CAPABILITY_TAG.match(tag):
+            errors.append(f"line {line}: invalid capability {tag!r}")
+        capabilities.append(tag)
+
+    if errors:
+        return None, errors
+    return ModelRecord(
+        display_name=display_name,
+        api_model=api_model,
+        is_available=flags['isAvailable'],
+        order=order,
+        is_pro=flags['isPro'],
+        provider=cell('provider') or None,
+        context_length=context_length,
+        prompt_price=prices['promptPrice'],
+        completion_price=prices['completionPrice'],
+        capabilities=tuple(capabilities)
+    ), errors
+
+def extended_columns(models):
+    """Extended columns that at least one of the model dicts uses"""
+    return [column for column in EXTENDED_COLUMNS if any(column in model for model in models)]
+
+def to_csv_row(model):
+    """CSV cells of a model dict: booleans as TRUE/FALSE, capabilities joined by ";\""""
+    row = dict(model)
+    for key, value in row.items():
+        if isinstance(value, bool):
+            row[key] = "TRUE" if value else "FALSE"
+        elif isinstance(value, (list, tuple)):
+            row[key] = ";".join(value)
+    return row
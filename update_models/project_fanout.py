@@ -0,0 +1,163 @@
+"""
+Multi-Project Fan-Out
+Runs the same catalog publish against several Firebase projects (staging,
+production, regional copies) concurrently
+
+Projects are listed in a JSON manifest:
+
+    {
+      "projects": [
+        {"name": "staging", "credentials": "keys/staging.json", "canary": true},
+        {"name": "prod", "credentials": "keys/prod.json"},
+        {"name": "prod-eu", "credentials": "$EU_KEY_FILE", "projectId": "mark-vii-eu",
+         "catalogs": ["models", "exp_models"]}
+      ]
+    }
+
+Credential paths are relative to the manifest and may use environment
+variables. "catalogs" limits a project to some of the selected catalogs.
+Every project gets its own named firebase_admin app and its own snapshot
+directory, so projects can be planned and published from parallel
+threads. Lines printed by a worker thread are prefixed with its project.
+
+Requirements:
+    pip install firebase-admin
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from run_report import current_span_id, phase
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Project names double as firebase_admin app names and snapshot directories
+PROJECT_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]*$")
+
+# ============================================================================
+# FUNCTIONS
+# ============================================================================
+
+def load_manifest(path, catalog_names):
+    """Load and check a project manifest
+
+    Returns a list of {name, credentials, projectId, canary, catalogs} in
+    manifest order. Raises ValueError describing the first problem found.
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        manifest = json.load(file)
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    projects = []
+    seen = set()
+    for i, entry in enumerate(manifest.get("projects") or [], 1):
+        name = entry.get("name") or ""
+        if not PROJECT_NAME.match(name):
+            raise ValueError(f"project {i}: invalid name {name!r}")
+        if name in seen:
+            raise ValueError(f"project {i}: duplicate name {name!r}")
+        seen.add(name)
+
+        unknown = [catalog for catalog in entry.get("catalogs") or [] if catalog not in catalog_names]
+        if unknown:
+            raise ValueError(f"{name}: unknown catalogs {', '.join(unknown)}")
+
+        credentials = entry.get("credentials")
+        if credentials:
+            credentials = os.path.join(base_dir, os.path.expanduser(os.path.expandvars(credentials)))
+        projects.append({
+            "name": name,
+            "credentials": credentials,
+            "projectId": entry.get("projectId"),
+            "canary": bool(entry.get("canary")),
+            "catalogs": entry.get("catalogs") or None
+        })
+
+    if not projects:
+        raise ValueError("no projects listed")
+    return projects
+
+class ProjectOutput:
+    """sys.stdout stand-in that prefixes whole lines with the printing thread's project"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def set_project(self, name):
+        """Prefix lines printed by the current thread with [name]"""
+        self.local.prefix = f"[{name}] " if name else ""
+        self.local.buffer = ""
+
+    def write(self, text):
+        prefix = getattr(self.local, "prefix", "")
+        if not prefix:
+            with self.lock:
+                return self.stream.write(text)
+        # Buffer until a line is complete so lines of different threads never mix
+        self.local.buffer += text
+        *lines, self.local.buffer = self.local.buffer.split("\n")
+        if lines:
+            with self.lock:
+                self.stream.write("".join(f"{prefix}{line}\n" if line else f"{prefix.rstrip()}\n"
+                                          for line in lines))
+        return len(text)
+
+    def flush(self):
+        buffer = getattr(self.local, "buffer", "")
+        if buffer:
+            self.local.buffer = ""
+            self.write(buffer + "\n")
+        with self.lock:
+            self.stream.flush()
+
+def run_parallel(projects, job, workers=None):
+    """Run job(project) for every project in a thread pool
+
+    Returns {name: {"ok", "result" or "error", "seconds"}}. Exceptions are
+    caught per project.
+    """
+    output = ProjectOutput(sys.stdout)
+    parent = current_span_id()
+
+    def run(project):
+        output.set_project(project["name"])
+        started = time.perf_counter()
+        try:
+            with phase(f"project.{job.__name__}", parent=parent, project=project["name"]):
+                outcome = {"ok": True, "result": job(project)}
+        except Exception as e:
+            print(f"❌ {e}")
+            outcome = {"ok": False, "error": str(e)}
+        finally:
+            output.flush()
+            output.set_project(None)
+        outcome["seconds"] = time.perf_counter() - started
+        return project["name"], outcome
+
+    if not projects:
+        return {}
+    stdout = sys.stdout
+    sys.stdout = output
+    try:
+        with ThreadPoolExecutor(max_workers=workers or len(projects)) as pool:
+            return dict(pool.map(run, projects))
+    finally:
+        sys.stdout = stdout
+
+def print_fanout_report(projects, results):
+    """Print one line per project with its outcome and timings"""
+    print("\n📊 Fan-out results:")
+    for project in projects:
+        result = results.get(project["name"], {})
+        timings = "  ".join(f"{phase} {result[phase]:.2f}s" for phase in ("plan", "publish") if phase in result)
+        canary = " (canary)" if project["canary"] else ""
+        print(f"   {result.get('status', '⏸️ not run'):32s} {project['name']}{canary}  {timings}")
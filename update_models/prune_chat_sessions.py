@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+"""
+Chat Session Pruner
+Retention job that keeps chat_sessions from growing without bound
+
+The app loads every session of a user when it opens the history screen, so
+heavy users get slower over time. Each run applies the policies it is
+given, one user at a time:
+
+    --archive-days N     Sessions not updated in N days are appended to a
+                         local JSONL file and deleted from Firestore
+    --max-messages M     Sessions with more than M messages keep the newest
+                         M; older turns move to archive documents:
+                             chat_sessions/<id>/archive/<first index>
+                             {sessionId, userId, firstIndex, messageCount, messages, archivedAt}
+                         and the session's archivedMessages counts them. The
+                         app shows them above the session and deletes them
+                         with it (see the rules in FIREBASE_SETUP.md);
+                         compact_chat_sessions, export_chat_history and
+                         aggregate_model_usage read them with their session
+    --empty-days D       Untitled ("New Chat") sessions without messages that
+                         were not updated in D days are deleted
+
+Archived sessions are written with their archive documents folded back in,
+one JSON object per line, to <archive dir>/sessions-<run id>.jsonl. A line
+is written before the delete is committed, so a session is never deleted
+without a local copy. A session that changed mid-run is kept, so the file
+can hold copies of sessions that still exist; Firestore stays authoritative.
+
+Users are found with one read each (the next userId after the last one) and
+handled in batches by a pool of workers sharing the write budget. Every
+update and delete carries the update_time the session was read with, so a
+session the app saved in the meantime is re-read instead of overwritten.
+Sessions are only split once they have been idle for SPLIT_MIN_IDLE, so an
+open chat does not write its full history back. Progress is checkpointed
+after every batch of users; an interrupted run resumes where it stopped.
+
+Usage:
+    python prune_chat_sessions.py --archive-days 180 --dry-run        # Report only
+    python prune_chat_sessions.py --archive-days 180 --max-messages 200 --empty-days 7
+    python prune_chat_sessions.py --empty-days 7 --user <uid>         # One user
+    python prune_chat_sessions.py --empty-days 7 --restart            # Ignore the saved cursor
+    python prune_chat_sessions.py --empty-days 7 --emulator localhost:8080 --yes
+
+Requirements:
+    pip install firebase-admin
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from firebase_common import SCRIPT_DIR, initialize_firebase, use_emulator
+from catalog_shards import MAX_DOCUMENT_BYTES
+from document_store import field_values
+from export_chat_history import ARCHIVE_COLLECTION, read_archive, to_datetime
+from firestore_jobs import (
+    DEFAULT_PAGE_SIZE, BatchWriter, Checkpoint, ConflictError, estimate_size, iter_pages, with_retry
+)
+from run_report import count_query
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+SESSIONS_COLLECTION = "chat_sessions"
+
+# Title the app gives a session until its first message
+NEW_CHAT_TITLE = "New Chat"
+
+# Local archive and resume state (both git-ignored)
+DEFAULT_ARCHIVE_DIR = os.path.join(SCRIPT_DIR, "archives")
+DEFAULT_CURSOR_FILE = os.path.join(SCRIPT_DIR, ".prune_cursor.json")
+
+DEFAULT_WORKERS = 4
+DEFAULT_WRITES_PER_SECOND = 50.0
+
+# Users handed to the workers between two checkpoints
+USERS_PER_WORKER = 8
+
+# Sessions updated more recently than this are never split
+SPLIT_MIN_IDLE = timedelta(days=1)
+
+# Room left in each archive document for its other fields
+ARCHIVE_DOCUMENT_BYTES = MAX_DOCUMENT_BYTES - 16 * 1024
+
+# Times a page is re-read when the app saved one of its sessions mid-run
+MAX_CONFLICT_RETRIES = 3
+
+# ============================================================================
+# FUNCTIONS
+# ============================================================================
+
+def split_messages(messages, keep):
+    """Return (archived, kept): everything but the newest keep messages, and the rest
+
+    The cut moves forward to a user message, so a reply is never separated
+    from its prompt. Nothing is archived when no such cut exists.
+    """
+    if len(messages) <= keep:
+        return [], messages
+    cut = len(messages) - keep
+    while cut < len(messages) and not (isinstance(messages[cut], dict) and messages[cut].get('isFromUser')):
+        cut += 1
+    if cut == len(messages):
+        return [], messages
+    return messages[:cut], messages[cut:]
+
+def archive_documents(session_id, user_id, messages, first_index):
+    """Chunk archived messages into documents that fit the document limit"""
+    documents = []
+    chunk, size = [], 0
+    for message in messages:
+        message_size = estimate_size(message)
+        if chunk and size + message_size > ARCHIVE_DOCUMENT_BYTES:
+            documents.append(chunk)
+            chunk, size = [], 0
+        chunk.append(message)
+        size += message_size
+    if chunk:
+        documents.append(chunk)
+
+    result = []
+    for chunk in documents:
+        result.append((f"{first_index:08d}", {
+            "sessionId": session_id,
+            "userId": user_id,
+            "firstIndex": first_index,
+            "messageCount": len(chunk),
+            "messages": chunk
+        }))
+        first_index += len(chunk)
+    return result
+
+class SessionArchive:
+    """Appends archived sessions to a local JSONL file shared by the workers"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.lock = threading.Lock()
+
+    def write(self, record):
+        """Append one session and flush it to the OS before its delete is queued"""
+        line = json.dumps(record, ensure_ascii=False,
+                          default=lambda value: value.isoformat() if hasattr(value, "isoformat") else str(value))
+        with self.lock:
+            if self.file is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self.file = open(self.path, 'a', encoding='utf-8')
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def sync(self):
+        """Make everything written so far durable"""
+        with self.lock:
+            if self.file is not None:
+                os.fsync(self.file.fileno())
+
+    def close(self):
+        """Flush and close the file"""
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+def policy_of(args):
+    """The policies of a run, as saved with its checkpoint"""
+    return {"archiveDays": args.archive_days, "maxMessages": args.max_messages, "emptyDays": args.empty_days}
+
+def cutoffs_of(args, now):
+    """updatedAt before which each policy applies"""
+    return {
+        "archive": now - timedelta(days=args.archive_days) if args.archive_days else None,
+        "empty": now - timedelta(days=args.empty_days) if args.empty_days else None,
+        "split": now - SPLIT_MIN_IDLE
+    }
+
+def new_report():
+    """Empty counters for a pruning run"""
+    return {
+        "users": 0, "sessions": 0, "emptyDeleted": 0, "archivedSessions": 0,
+        "archivedMessages": 0, "archivedBytes": 0, "splitSessions": 0,
+        "movedMessages": 0, "archiveDocuments": 0, "conflicts": 0
+    }
+
+def merge_report(total, part):
+    """Add a user's counters to the running totals"""
+    for key, value in part.items():
+        total[key] += value
+    return total
+
+def print_report(report, dry_run=False, stats=None, archive_path=None):
+    """Print what a run pruned"""
+    print(f"\n📊 Chat session pruning{' (dry run)' if dry_run else ''}:")
+    print(f"   Users:              {report['users']}")
+    print(f"   Sessions scanned:   {report['sessions']}")
+    print(f"   Empty deleted:      {report['emptyDeleted']}")
+    print(f"   Archived:           {report['archivedSessions']} sessions, "
+          f"{report['archivedMessages']} messages ({report['archivedBytes'] / 1024:.1f} KiB)")
+    print(f"   Split:              {report['splitSessions']} sessions, {report['movedMessages']} messages "
+          f"{'to move' if dry_run else 'moved'} into {report['archiveDocuments']} archive documents")
+    if report["conflicts"]:
+        print(f"   Pages re-read after concurrent edits: {report['conflicts']}")
+    if stats:
+        print(f"   Writes: {stats['writes']} in {stats['commits']} commits, {stats['retries']} retries")
+    if archive_path and report["archivedSessions"] and not dry_run:
+        print(f"   Archive file: {archive_path}")
+
+def prune_page(db, writer, snapshots, args, cutoffs, archive, now):
+    """Apply the policies to one page of a user's sessions; returns the page report"""
+    report = new_report()
+    for snapshot in snapshots:
+        if not snapshot.exists:
+            continue
+        data = snapshot.to_dict() or {}
+        messages = data.get('messages') or []
+        updated_at = to_datetime(data.get('updatedAt') or data.get('createdAt'))
+        report["sessions"] += 1
+        if updated_at is None:
+            continue
+
+        # Fails the batch if the app saved this session after we read it
+        option = db.write_option(last_update_time=snapshot.update_time)
+        operations = []
+        if (cutoffs["empty"] and not messages and updated_at < cutoffs["empty"]
+                and (data.get('title') or NEW_CHAT_TITLE) == NEW_CHAT_TITLE):
+            report["emptyDeleted"] += 1
+            operations.append(writer.delete(snapshot.reference, option=option))
+
+        elif cutoffs["archive"] and updated_at < cutoffs["archive"]:
+            parts = read_archive(snapshot)
+            history = [message for part in parts for message in (part.to_dict() or {}).get('messages') or []]
+            record = dict(data, id=snapshot.id, messages=history + messages,
+                          archivedAt=now.isoformat(timespec="seconds"))
+            record.pop('archivedMessages', None)
+            report["archivedSessions"] += 1
+            report["archivedMessages"] += len(record["messages"])
+            report["archivedBytes"] += estimate_size(record)
+            if not args.dry_run:
+                archive.write(record)
+                operations.extend(writer.delete(part.reference) for part in parts)
+                operations.append(writer.delete(snapshot.reference, option=option))
+
+        elif args.max_messages and len(messages) > args.max_messages and updated_at < cutoffs["split"]:
+            archived, kept = split_messages(messages, args.max_messages)
+            if not archived:
+                continue
+            first_index = sum((part.to_dict() or {}).get('messageCount', 0) for part in read_archive(snapshot))
+            documents = archive_documents(snapshot.id, data.get('userId', ''), archived, first_index)
+            report["splitSessions"] += 1
+            report["movedMessages"] += len(archived)
+            report["archiveDocuments"] += len(documents)
+            if not args.dry_run:
+                archive_refs = snapshot.reference.collection(ARCHIVE_COLLECTION)
+                operations.extend(
+                    writer.set(archive_refs.document(document_id),
+                               dict(document, archivedAt=field_values(db).SERVER_TIMESTAMP))
+                    for document_id, document in documents
+                )
+                operations.append(writer.update(snapshot.reference, {
+                    "messages": kept,
+                    "archivedMessages": first_index + len(archived)
+                }, option=option))
+
+        if operations and not args.dry_run:
+            writer.add(operations, tag=snapshot.id)
+    return report
+
+def prune_user(db, user_id, args, cutoffs, archive, now, writer):
+    """Apply the policies to every session of one user; returns the user's report"""
+    report = new_report()
+    report["users"] = 1
+    sessions = db.collection(SESSIONS_COLLECTION)
+    for snapshots in iter_pages(sessions, args.page_size, filters=[("userId", "==", user_id)]):
+        for attempt in range(MAX_CONFLICT_RETRIES + 1):
+            try:
+                page_report = prune_page(db, writer, snapshots, args, cutoffs, archive, now)
+                archive.sync()
+                writer.flush()
+                break
+            except ConflictError as e:
+                if attempt == MAX_CONFLICT_RETRIES:
+                    raise
+                print(f"🔁 {user_id}: {len(e.tags)} session(s) changed while pruning - re-reading the page")
+                writer.pending, writer.tags, writer.pending_bytes = [], [], 0
+                snapshots = list(db.get_all([snapshot.reference for snapshot in snapshots]))
+                report["conflicts"] += 1
+        merge_report(report, page_report)
+    return report
+
+def next_user_ids(db, after, count):
+    """Up to count userIds after after, in order, with one single-document read each"""
+    query = db.collection(SESSIONS_COLLECTION).order_by("userId").limit(1).select(["userId"])
+    user_ids = []
+    while len(user_ids) < count:
+        page = query.where("userId", ">", after) if after is not None else query
+        snapshots = count_query(with_retry(lambda: list(page.stream()), label="user scan"))
+        if not snapshots:
+            break
+        after = snapshots[0].get('userId')
+        user_ids.append(after)
+    return user_ids
+
+def prune_sessions(db, args):
+    """Prune every user's sessions in checkpointed batches; returns (report, write stats, archive path)"""
+    checkpoint = Checkpoint(args.cursor_file)
+    state = {} if (args.restart or args.dry_run) else checkpoint.load()
+    if state and (state.get("user") != args.user or state.get("policy") != policy_of(args)):
+        print("⚠️ Saved cursor was for other policies or another --user; starting over")
+        state = {}
+    if state:
+        print(f"⏩ Resuming after user {state['cursor']} (started {state.get('startedAt')})")
+
+    # A resumed run keeps its cutoffs and archive file
+    now = to_datetime(state.get("startedAt")) or datetime.now(timezone.utc).replace(microsecond=0)
+    run_id = state.get("runId") or now.strftime("%Y%m%dT%H%M%SZ")
+    report = state.get("report") or new_report()
+    cutoffs = cutoffs_of(args, now)
+    archive = SessionArchive(os.path.join(args.archive_dir, f"sessions-{run_id}.jsonl"))
+
+    # One writer per worker thread, each with its share of the write budget
+    writers = []
+    local = threading.local()
+    lock = threading.Lock()
+
+    def run_user(user_id):
+        if not hasattr(local, "writer"):
+            local.writer = BatchWriter(db, args.writes_per_second / args.workers)
+            with lock:
+                writers.append(local.writer)
+        return prune_user(db, user_id, args, cutoffs, archive, now, local.writer)
+
+    cursor = state.get("cursor")
+    batch_size = 1 if args.user else min(args.workers * USERS_PER_WORKER, args.limit or sys.maxsize)
+    stopped = False
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            while True:
+                if args.user:
+                    user_ids = [args.user] if cursor is None else []
+                else:
+                    user_ids = next_user_ids(db, cursor, batch_size)
+                if not user_ids:
+                    break
+                for user_report in pool.map(run_user, user_ids):
+                    merge_report(report, user_report)
+                cursor = user_ids[-1]
+
+                if not args.dry_run:
+                    checkpoint.save({
+                        "cursor": cursor,
+                        "user": args.user,
+                        "policy": policy_of(args),
+                        "runId": run_id,
+                        "startedAt": now.isoformat(),
+                        "report": report
+                    })
+                print(f"   … {report['users']} users, {report['sessions']} sessions scanned")
+                if args.limit and report["users"] >= args.limit:
+                    print(f"⏸️ Stopped after --limit {args.limit} users (run again to continue)")
+                    stopped = True
+                    break
+    finally:
+        archive.close()
+
+    if not args.dry_run and not stopped:
+        checkpoint.clear()
+    stats = {key: sum(writer.stats[key] for writer in writers) for key in ("writes", "commits", "retries")}
+    return report, stats, archive.path
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Archive stale chat sessions, cap long ones and delete empty ones"
+    )
+    parser.add_argument("--archive-days", type=int, metavar="N",
+                        help="Archive locally and delete sessions not updated in N days")
+    parser.add_argument("--max-messages", type=int, metavar="M",
+                        help="Move all but the newest M messages into archive documents")
+    parser.add_argument("--empty-days", type=int, metavar="D",
+                        help=f'Delete empty "{NEW_CHAT_TITLE}" sessions not updated in D days')
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would change, write nothing")
+    parser.add_argument("--user", help="Only prune the sessions of this userId")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Users processed in parallel (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE,
+                        help=f"Sessions read per query page (default: {DEFAULT_PAGE_SIZE})")
+    parser.add_argument("--writes-per-second", type=float, default=DEFAULT_WRITES_PER_SECOND,
+                        help=f"Write budget shared by all workers (default: {DEFAULT_WRITES_PER_SECOND:g})")
+    parser.add_argument("--limit", type=int, help="Stop after roughly this many users")
+    parser.add_argument("--archive-dir", default=DEFAULT_ARCHIVE_DIR,
+                        help="Where archived sessions are written")
+    parser.add_argument("--cursor-file", default=DEFAULT_CURSOR_FILE,
+                        help="Where the resume cursor is kept")
+    parser.add_argument("--restart", action="store_true", help="Ignore a saved cursor")
+    parser.add_argument("--emulator", metavar="HOST:PORT",
+                        help="Use the Firestore emulator instead of production")
+    parser.add_argument("--yes", "-y", action="store_true",
+                        help="Prune without asking for confirmation")
+    args = parser.parse_args(argv)
+
+    if not (args.archive_days or args.max_messages or args.empty_days):
+        parser.error("give at least one policy: --archive-days, --max-messages or --empty-days")
+    for name in ("archive_days", "max_messages", "empty_days", "workers", "page_size"):
+        value = getattr(args, name)
+        if value is not None and value < 1:
+            parser.error(f"--{name.replace('_', '-')} must be at least 1")
+    if args.writes_per_second <= 0:
+        parser.error("--writes-per-second must be positive")
+    return args
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main(argv=None):
+    """Main function"""
+
+    print("\n" + "="*60)
+    print("🧹 Chat Session Pruner for Mark VII")
+    print("="*60)
+
+    args = parse_args(argv)
+    if args.emulator:
+        use_emulator(args.emulator)
+    db = initialize_firebase()
+
+    if not args.dry_run and not args.yes:
+        scope = f"user {args.user}" if args.user else "all users"
+        policies = []
+        if args.archive_days:
+            policies.append(f"archive and delete sessions idle for {args.archive_days}+ days")
+        if args.max_messages:
+            policies.append(f"move all but the newest {args.max_messages} messages into archive documents")
+        if args.empty_days:
+            policies.append(f'delete empty "{NEW_CHAT_TITLE}" sessions idle for {args.empty_days}+ days')
+        print(f"\n⚠️ This will rewrite {SESSIONS_COLLECTION} documents of {scope}:")
+        for policy in policies:
+            print(f"   - {policy}")
+        confirm = input("Continue? (y/n): ").strip().lower()
+        if confirm != 'y':
+            print("❌ Cancelled")
+            return
+
+    report, stats, archive_path = prune_sessions(db, args)
+    print_report(report, args.dry_run, None if args.dry_run else stats, archive_path)
+    print("\n✅ Dry run complete (nothing written)" if args.dry_run else "\n✅ Pruning complete")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n👋 Interrupted - run again to resume from the last completed batch")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ Unexpected error: {e}")
+        sys.exit(1)
@@ -0,0 +1,232 @@
+"""
+Run Reports
+Per-phase timings and Firestore operation counts for the update scripts
+
+    phase()         times a named phase of a run (context manager); phases
+                    nest, per thread, into a tree of spans
+    timed()         the same as a function decorator
+    count()         adds to a run counter (reads, writes, deletes, bytesSent,
+                    commits) and to the counters of the current phase
+    CountingBatch   wraps a WriteBatch and counts its writes and bytes once
+                    it is committed
+    reporting()     wraps a whole run and, on the way out, writes the JSON run
+                    report (--report) and the spans as OpenTelemetry-style
+                    JSON lines (--spans)
+
+Reads are counted the way Firestore bills them: one per document asked for
+by get()/get_all() (found or not) and one per document a query returns, at
+least one per query. Bytes are the JSON size of the data sent, an estimate
+of the request size. Recording is always on; it only costs a clock read
+and a dict update per phase, and nothing is written unless asked for.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+COUNTERS = ["reads", "writes", "deletes", "bytesSent", "commits"]
+
+# ============================================================================
+# FUNCTIONS
+# ============================================================================
+
+_lock = threading.Lock()
+_local = threading.local()
+_spans = []
+_counters = dict.fromkeys(COUNTERS, 0)
+_trace_id = uuid.uuid4().hex
+
+def estimate_size(data):
+    """Approximate stored size of a document or value in bytes"""
+    return len(json.dumps(data, separators=(',', ':'), ensure_ascii=False, default=str).encode('utf-8'))
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+def current_span_id():
+    """Id of the innermost open phase of this thread (None outside any)"""
+    stack = _stack()
+    return stack[-1]["spanId"] if stack else None
+
+@contextmanager
+def phase(name, parent=None, **attributes):
+    """Time a phase of the run; yields the span so attributes can be added
+
+    parent overrides the enclosing phase, for work handed to another thread.
+    """
+    stack = _stack()
+    span = {
+        "name": name,
+        "spanId": uuid.uuid4().hex[:16],
+        "parentSpanId": parent or (stack[-1]["spanId"] if stack else None),
+        "start": time.time(),
+        "attributes": dict(attributes),
+        "counters": {},
+        "status": "ok"
+    }
+    stack.append(span)
+    started = time.perf_counter()
+    try:
+        yield span
+    except BaseException as e:
+        if not (isinstance(e, SystemExit) and e.code in (None, 0)):
+            span["status"] = "error"
+            span["attributes"]["error"] = str(e) or type(e).__name__
+        raise
+    finally:
+        span["durationMs"] = (time.perf_counter() - started) * 1000
+        stack.pop()
+        with _lock:
+            _spans.append(span)
+
+def timed(name):
+    """Decorator: run the function inside phase(name)"""
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def count(counter, amount=1):
+    """Add to a run counter and to the counters of every open phase of this thread"""
+    with _lock:
+        _counters[counter] = _counters.get(counter, 0) + amount
+    for span in _stack():
+        span["counters"][counter] = span["counters"].get(counter, 0) + amount
+
+def count_query(snapshots):
+    """Count the reads of a query result; returns it unchanged"""
+    count("reads", max(1, len(snapshots)))
+    return snapshots
+
+class CountingBatch:
+    """A WriteBatch that counts writes, deletes and bytes once committed"""
+
+    def __init__(self, batch):
+        self.batch = batch
+        self.operations = {"writes": 0, "deletes": 0, "bytesSent": 0}
+
+    def create(self, ref, data):
+        self.operations["writes"] += 1
+        self.operations["bytesSent"] += estimate_size(data)
+        return self.batch.create(ref, data)
+
+    def set(self, ref, data, merge=False):
+        self.operations["writes"] += 1
+        self.operations["bytesSent"] += estimate_size(data)
+        return self.batch.set(ref, data, merge=merge)
+
+    def update(self, ref, data, option=None):
+        self.operations["writes"] += 1
+        self.operations["bytesSent"] += estimate_size(data)
+        if option is None:
+            return self.batch.update(ref, data)
+        return self.batch.update(ref, data, option=option)
+
+    def delete(self, ref, option=None):
+        self.operations["deletes"] += 1
+        if option is None:
+            return self.batch.delete(ref)
+        return self.batch.delete(ref, option=option)
+
+    def commit(self):
+        result = self.batch.commit()
+        for counter, amount in self.operations.items():
+            count(counter, amount)
+        count("commits")
+        return result
+
+def counters():
+    """Copy of the run counters"""
+    with _lock:
+        return dict(_counters)
+
+def phase_totals():
+    """Total milliseconds per phase name, over all its spans"""
+    totals = {}
+    with _lock:
+        for span in _spans:
+            totals[span["name"]] = totals.get(span["name"], 0.0) + span["durationMs"]
+    return {name: round(ms, 3) for name, ms in sorted(totals.items())}
+
+def to_otel(span):
+    """A span in the OpenTelemetry JSON shape (one line of --spans)"""
+    return {
+        "traceId": _trace_id,
+        "spanId": span["spanId"],
+        "parentSpanId": span["parentSpanId"] or "",
+        "name": span["name"],
+        "startTimeUnixNano": int(span["start"] * 1e9),
+        "endTimeUnixNano": int((span["start"] + span["durationMs"] / 1000) * 1e9),
+        "attributes": {**span["attributes"], **{f"firestore.{key}": value for key, value in span["counters"].items()}},
+        "status": {"code": "ERROR" if span["status"] == "error" else "OK"}
+    }
+
+def write_json(path, data, lines=False):
+    """Atomically write a JSON document (or JSON lines)"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        if lines:
+            for item in data:
+                file.write(json.dumps(item, ensure_ascii=False, default=str) + "\n")
+        else:
+            json.dump(data, file, indent=2, ensure_ascii=False, default=str)
+    os.replace(temp_path, path)
+
+@contextmanager
+def reporting(report_path=None, spans_path=None, script=None):
+    """Run the body as the root phase and write the report and spans when it ends
+
+    The files are also written when the run fails or calls sys.exit(), with
+    the outcome recorded in "status".
+    """
+    started_at = datetime.now(timezone.utc)
+    status = "ok"
+    root = {}
+    try:
+        with phase(script or "run", argv=" ".join(sys.argv[1:])) as span:
+            root = span
+            yield
+    except SystemExit as e:
+        status = "ok" if e.code in (None, 0) else "failed"
+        raise
+    except KeyboardInterrupt:
+        status = "interrupted"
+        raise
+    except BaseException:
+        status = "failed"
+        raise
+    finally:
+        with _lock:
+            spans = sorted(_spans, key=lambda span: span["start"])
+        if report_path:
+            write_json(report_path, {
+                "script": script,
+                "argv": sys.argv[1:],
+                "startedAt": started_at.isoformat(),
+                "durationMs": round(root["durationMs"], 3) if "durationMs" in root else None,
+                "status": status,
+                "counters": counters(),
+                "phases": phase_totals(),
+                "spans": len(spans)
+            })
+            print(f"🧾 Run report written to {report_path}")
+        if spans_path:
+            write_json(spans_path, [to_otel(span) for span in spans], lines=True)
+            print(f"🧾 {len(spans)} spans written to {spans_path}")
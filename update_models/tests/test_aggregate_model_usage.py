@@ -0,0 +1,47 @@
+"""Incremental usage tallies against the in-memory document store"""
+
+from datetime import datetime, timedelta, timezone
+
+from aggregate_model_usage import parse_args, update_usage
+from document_store import MemoryStore
+
+def add_session(db, session_id, updated, *models):
+    db.collection("chat_sessions").document(session_id).set({
+        "userId": "u1", "updatedAt": updated,
+        "messages": [{"prompt": "hi", "isFromUser": False, "modelUsed": model} for model in models]
+    })
+
+def messages(usage):
+    return {entry["model"]: entry["messages"] for entry in usage}
+
+def test_overlap_and_clock_skew(tmp_path):
+    db = MemoryStore()
+    now = datetime.now(timezone.utc)
+    args = parse_args(["--state-file", str(tmp_path / "state.json")])
+    add_session(db, "a", now - timedelta(hours=1), "m/a")
+    # A device whose clock runs a day ahead
+    add_session(db, "ahead", now + timedelta(days=1), "m/b")
+    assert messages(update_usage(db, args)) == {"m/a": 1, "m/b": 1}
+
+    # Stamped before the cursor by a slow clock, and an edit of "a": both
+    # are picked up, and re-reading "a" replaces its tally
+    add_session(db, "late", now - timedelta(minutes=5), "m/c")
+    add_session(db, "a", datetime.now(timezone.utc), "m/a", "m/a")
+    assert messages(update_usage(db, args)) == {"m/a": 2, "m/b": 1, "m/c": 1}
+
+    # Nothing new: same totals, cursor does not move back
+    assert messages(update_usage(db, args)) == {"m/a": 2, "m/b": 1, "m/c": 1}
+
+def test_archived_replies_are_counted(tmp_path):
+    db = MemoryStore()
+    args = parse_args(["--state-file", str(tmp_path / "state.json")])
+    add_session(db, "long", datetime.now(timezone.utc), "m/b")
+    db.document("chat_sessions/long").update({"archivedMessages": 3})
+    # Moved out by prune_chat_sessions --max-messages
+    db.document("chat_sessions/long/archive/00000000").set({
+        "userId": "u1", "firstIndex": 0, "messageCount": 3,
+        "messages": [{"prompt": "hi", "isFromUser": False, "modelUsed": model} for model in ("m/a", "m/a", "m/b")]
+    })
+    usage = update_usage(db, args)
+    assert messages(usage) == {"m/a": 2, "m/b": 2}
+    assert {entry["model"]: entry["sessions"] for entry in usage} == {"m/a": 1, "m/b": 1}
@@ -0,0 +1,154 @@
+"""CatalogSync tests on the in-memory document store (no Firebase)"""
+
+import json
+
+import pytest
+
+import catalog_cache
+import update_firebase_catalogs
+from catalog_api import CatalogError, CatalogSync
+from catalog_history import load_version, read_history
+from catalog_sync import compute_catalog_hash, read_catalogs
+from document_store import MemoryStore
+
+def rows(count, start=0):
+    return [
+        {"displayName": f"Model {i}", "apiModel": f"vendor{i % 3}/model-{i}", "isAvailable": True,
+         "order": i + 1, "isPro": False, "provider": f"vendor{i % 3}"}
+        for i in range(start, start + count)
+    ]
+
+def test_load_plan_apply_verify():
+    store = MemoryStore()
+    sync = CatalogSync(store, author="tests")
+    targets = sync.load({"models": rows(5), "gemini_models": rows(3),
+                         "exp_models": [{"modelId": "vendor0/model-0:free", "modelName": "Model 0"}]})
+    assert [target["document"] for target in targets] == ["models", "gemini_models", "exp_models"]
+
+    plans = sync.plan()
+    assert {document: plan["catalogVersion"] for document, plan in plans.items()} == {
+        "models": 1, "gemini_models": 1, "exp_models": 1}
+    assert store.dump("app_config") == {}
+
+    assert sync.apply() == 3
+    results = sync.verify()
+    assert all(result["ok"] for result in results.values())
+    assert results["models"] == {"ok": True, "problem": None, "entries": 5, "version": 1}
+
+    # The same input again plans nothing and writes nothing
+    sync.load({"models": rows(5)})
+    assert not sync.plan()["models"]["needsWrite"]
+    assert sync.changed == []
+    assert sync.apply() == 0
+    assert sync.verify() == {}
+
+def test_apply_needs_a_fresh_plan():
+    sync = CatalogSync(MemoryStore())
+    sync.load({"models": rows(2)})
+    with pytest.raises(RuntimeError):
+        sync.apply()
+    sync.plan()
+    sync.apply()
+    with pytest.raises(RuntimeError):
+        sync.apply()
+
+def test_invalid_input_raises():
+    sync = CatalogSync(MemoryStore())
+    with pytest.raises(CatalogError) as error:
+        sync.load({"models": [{"displayName": "", "apiModel": "x", "order": "first"}]})
+    assert error.value.name == "models"
+    assert len(error.value.errors) > 1
+    with pytest.raises(ValueError):
+        sync.load({"nope": []})
+
+def test_sharded_publish_is_silent_by_default(capsys):
+    store = MemoryStore()
+    result = CatalogSync(store, shard_by="rows", shard_rows=50).sync({"models": rows(120)})
+    assert result["written"] == 1 and result["verified"]
+    assert capsys.readouterr().out == ""
+
+    manifest = store.dump()["app_config/models"]
+    assert manifest["sharded"] and manifest["shardCount"] == 3
+    assert len(store.dump("app_config/models/shards")) == 3
+    data = read_catalogs(store, ["models"], keep_snapshots=False, report=lambda message: None)["models"]
+    assert data["list"] == rows(120)
+
+    # Back to one document: the shards are deleted in the same batch
+    messages = []
+    result = CatalogSync(store, report=messages.append).sync({"models": rows(4)})
+    assert result["written"] == 1 and result["verified"]
+    assert "sharded" not in store.dump()["app_config/models"]
+    assert store.dump("app_config/models/shards") == {}
+
+def test_report_receives_progress():
+    messages = []
+    CatalogSync(MemoryStore(), shard_by="rows", shard_rows=50, report=messages.append).sync({"models": rows(120)})
+    assert any("3 shard(s) by rows" in message for message in messages)
+
+def test_cached_read_costs_one_read_per_document(monkeypatch, tmp_path):
+    monkeypatch.setattr(catalog_cache, "CACHE_DIR", str(tmp_path))
+    store = MemoryStore()
+    CatalogSync(store, shard_by="rows", shard_rows=50).sync({"models": rows(120)})
+
+    def cached_read():
+        before = store.stats["reads"]
+        data = read_catalogs(store, ["models"], use_cache=True, report=lambda message: None)["models"]
+        return data, store.stats["reads"] - before
+
+    # Miss: the manifest and its 3 shards; hit: the manifest only, never twice
+    data, reads = cached_read()
+    assert data["list"] == rows(120) and reads == 4
+    data, reads = cached_read()
+    assert data["list"] == rows(120) and reads == 1
+
+    CatalogSync(store, shard_by="rows", shard_rows=50).sync({"models": rows(130)})
+    data, reads = cached_read()
+    assert data["list"] == rows(130) and reads == 4
+
+def test_history_keeps_every_version():
+    store = MemoryStore()
+    first = CatalogSync(store, author="alice").sync({"models": rows(3)})
+    CatalogSync(store, author="bob").sync({"models": rows(4)})
+
+    history = read_history(store, "app_config", "models")
+    assert [(entry["version"], entry["author"], entry["entries"]) for entry in history] == [
+        (2, "bob", 4), (1, "alice", 3)]
+    assert "snapshot" not in history[0]
+
+    models, catalog_hash = load_version(store, "app_config", "models", 1)
+    assert models == rows(3)
+    assert catalog_hash == first["plans"]["models"]["catalogHash"] == compute_catalog_hash(models)
+    with pytest.raises(ValueError):
+        load_version(store, "app_config", "models", 7)
+
+@pytest.fixture
+def cli_store(monkeypatch):
+    store = MemoryStore()
+    monkeypatch.setattr(update_firebase_catalogs, "open_db", lambda args: store)
+    return store
+
+def test_cli_sync_and_rollback(cli_store, tmp_path):
+    source = tmp_path / "models.json"
+    for count in (3, 5):
+        source.write_text(json.dumps(rows(count)))
+        update_firebase_catalogs.main(["--backend", "memory", "--only", "models", "--models-csv", str(source),
+                                       "--author", "cli", "--yes"])
+    assert cli_store.dump()["app_config/models"]["catalogVersion"] == 2
+
+    update_firebase_catalogs.main(["--backend", "memory", "--only", "models", "--rollback", "1",
+                                   "--author", "cli", "--yes"])
+    current = cli_store.dump()["app_config/models"]
+    assert current["catalogVersion"] == 3
+    assert current["list"] == rows(3)
+
+    newest = read_history(cli_store, "app_config", "models")[0]
+    assert newest["version"] == 3 and newest["rollbackOf"] == 1 and newest["previousVersion"] == 2
+
+    # Rolling back to the version that is already live writes nothing
+    update_firebase_catalogs.main(["--backend", "memory", "--only", "models", "--rollback", "3", "--yes"])
+    assert cli_store.dump()["app_config/models"]["catalogVersion"] == 3
+
+def test_cli_rollback_of_a_missing_version_fails(cli_store):
+    with pytest.raises(SystemExit) as exit_info:
+        update_firebase_catalogs.main(["--backend", "memory", "--only", "models", "--rollback", "1", "--yes"])
+    assert exit_info.value.code == 1
@@ -0,0 +1,71 @@
+"""Streaming catalog readers: JSON chunking, line numbers and format sniffing"""
+
+import io
+import json
+import time
+
+import catalog_readers
+from catalog_readers import iter_json_entries, open_catalog, sniff_format
+
+def entries(count):
+    return [{"apiModel": f"p/m{i}", "displayName": f"Model {i}", "order": i} for i in range(count)]
+
+def pieces(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def test_pretty_printed_line_numbers_across_chunks(monkeypatch):
+    monkeypatch.setattr(catalog_readers, "JSON_TRIM_CHARS", 50)
+    text = "\n\n" + json.dumps(entries(30), indent=2)
+    decoded = list(iter_json_entries(pieces(text, 7)))
+
+    assert [entry for _, entry in decoded] == entries(30)
+    lines = text.split("\n")
+    for line_number, entry in decoded:
+        assert lines[line_number - 1].strip() == "{"
+        assert f'"p/m{entry["order"]}"' in lines[line_number]
+
+def test_minified_single_line():
+    text = json.dumps(entries(500), separators=(",", ":"))
+    decoded = list(iter_json_entries(io.StringIO(text)))
+    assert len(decoded) == 500
+    assert {line for line, _ in decoded} == {1}
+
+def test_large_minified_catalog_is_linear():
+    text = json.dumps(entries(40000), separators=(",", ":"))
+    started = time.perf_counter()
+    assert sum(1 for _ in iter_json_entries(io.StringIO(text))) == 40000
+    # Quadratic buffering took ~9s here; linear decoding takes a fraction of a second
+    assert time.perf_counter() - started < 3
+
+def test_published_document_and_errors():
+    document = json.dumps({"list": entries(3), "catalogVersion": 4})
+    assert [entry for _, entry in iter_json_entries(io.StringIO(document))] == entries(3)
+    for text, message in (('[{"a": 1} {"b": 2}]', "missing comma"), ('[{"a": 1},', "not closed"),
+                          ('{"other": 1}', 'no "list"')):
+        try:
+            list(iter_json_entries(io.StringIO(text)))
+        except ValueError as e:
+            assert message in str(e)
+        else:
+            raise AssertionError(f"{text!r} was accepted")
+
+def test_sniff_puts_the_chunk_back():
+    csv_text = "apiModel,displayName\n" + "".join(f"p/m{i},Model {i}\n" for i in range(20000))
+    fmt, stream = sniff_format(io.StringIO(csv_text))
+    assert fmt == "csv"
+    assert "".join(stream) == csv_text
+
+    jsonl_text = "".join(json.dumps(entry) + "\n" for entry in entries(3))
+    fmt, stream = sniff_format(io.StringIO(jsonl_text))
+    assert (fmt, stream.read()) == ("jsonl", jsonl_text)
+
+    fmt, _ = sniff_format(io.StringIO(" " + json.dumps({"list": entries(2)})))
+    assert fmt == "json"
+
+def test_open_catalog_json_file(tmp_path):
+    path = tmp_path / "models.json"
+    path.write_text(json.dumps(entries(3), indent=2), encoding="utf-8")
+    with open_catalog(str(path)) as (columns, rows):
+        rows = list(rows)
+    assert columns is None
+    assert [row["apiModel"] for _, row in rows] == ["p/m0", "p/m1", "p/m2"]
@@ -0,0 +1,126 @@
+"""Blob dedup, conflicts and the never-rewrite rule against the in-memory document store"""
+
+import base64
+import hashlib
+
+import pytest
+
+import compact_chat_sessions
+from compact_chat_sessions import compact_sessions, parse_args
+from document_store import MemoryStore
+
+def picture(name):
+    return name.encode() * 200
+
+def image(name):
+    return base64.b64encode(picture(name)).decode()
+
+def digest(name):
+    return hashlib.sha256(picture(name)).hexdigest()
+
+def message(i, name=None):
+    return {"id": f"m{i}", "prompt": str(i), "isFromUser": True, "bitmapBase64": image(name) if name else None}
+
+@pytest.fixture
+def db():
+    db = MemoryStore()
+    db.document("chat_sessions/u1-a").set({"userId": "u1", "messages": [message(0, "cat"), message(1, "dog")]})
+    db.document("chat_sessions/u1-b").set({"userId": "u1", "messages": [message(0, "cat"), message(1)]})
+    db.document("chat_sessions/u2-a").set({"userId": "u2", "messages": [message(0, "cat"), dict(message(1), bitmapBase64="!!")]})
+    db.document("chat_sessions/u2-b").set({"userId": "u2", "messages": [message(0)]})
+    return db
+
+def run(db, tmp_path, *extra):
+    args = parse_args(["--cursor-file", str(tmp_path / "cursor.json"), "--writes-per-second", "100000",
+                       "--page-size", "2", "--yes", *extra])
+    return compact_sessions(db, args)
+
+def test_images_move_to_shared_blobs(db, tmp_path):
+    report, _ = run(db, tmp_path)
+
+    assert report["sessions"] == 4 and report["sessionsWithImages"] == 3
+    assert report["images"] == 4 and report["invalidImages"] == 1
+    assert report["blobsWritten"] == 2 and report["blobsReused"] == 2
+    assert report["bytesAfter"] < report["bytesBefore"]
+
+    blobs = db.dump("chat_blobs")
+    assert set(blobs) == {f"chat_blobs/{digest('cat')}", f"chat_blobs/{digest('dog')}"}
+    cat = blobs[f"chat_blobs/{digest('cat')}"]
+    assert cat["data"] == image("cat") and cat["size"] == 600 and cat["userIds"] == ["u1", "u2"]
+    assert blobs[f"chat_blobs/{digest('dog')}"]["userIds"] == ["u1"]
+
+    first = db.dump("chat_sessions/u1-a")["chat_sessions/u1-a"]["messages"][0]
+    assert first["bitmapBase64"] is None and first["bitmapRef"] == digest("cat")
+    # Invalid base64 stays inline
+    assert db.dump("chat_sessions/u2-a")["chat_sessions/u2-a"]["messages"][1]["bitmapBase64"] == "!!"
+    assert not (tmp_path / "cursor.json").exists()
+
+def test_existing_blob_is_never_rewritten(db, tmp_path):
+    existing = {"data": "stored-by-the-app", "size": 3, "userIds": ["u9"], "createdAt": "2024-01-01"}
+    db.document(f"chat_blobs/{digest('cat')}").set(existing)
+    report, _ = run(db, tmp_path)
+
+    cat = db.dump()[f"chat_blobs/{digest('cat')}"]
+    assert cat == dict(existing, userIds=["u9", "u1", "u2"])
+    assert report["blobsWritten"] == 1
+
+def test_blob_created_mid_run_is_not_overwritten(db, tmp_path, monkeypatch):
+    original = compact_chat_sessions.lookup_blobs
+    calls = []
+
+    def lookup_blobs(db_, digests, known_blobs):
+        original(db_, digests, known_blobs)
+        if not calls:
+            # The app stores the same image after the lookup
+            db.document(f"chat_blobs/{digest('cat')}").create({"data": "from-the-app", "userIds": ["u9"]})
+        calls.append(len(digests))
+
+    monkeypatch.setattr(compact_chat_sessions, "lookup_blobs", lookup_blobs)
+    report, _ = run(db, tmp_path)
+
+    assert report["conflicts"] == 1
+    cat = db.dump()[f"chat_blobs/{digest('cat')}"]
+    assert cat["data"] == "from-the-app" and cat["userIds"] == ["u9", "u1", "u2"]
+    assert db.dump("chat_sessions/u1-a")["chat_sessions/u1-a"]["messages"][0]["bitmapRef"] == digest("cat")
+
+def test_session_saved_mid_run_is_reread(db, tmp_path, monkeypatch):
+    original = compact_chat_sessions.compact_page
+    calls = []
+
+    def compact_page(db_, writer, snapshots, known_blobs, dry_run=False):
+        report = original(db_, writer, snapshots, known_blobs, dry_run)
+        if not calls:
+            # The app saves a new message with a picture after the page was read
+            db.document("chat_sessions/u1-a").update(
+                {"messages": [message(0, "cat"), message(1, "dog"), message(2, "owl")]})
+        calls.append(len(snapshots))
+        return report
+
+    monkeypatch.setattr(compact_chat_sessions, "compact_page", compact_page)
+    report, _ = run(db, tmp_path)
+
+    assert report["conflicts"] == 1
+    messages = db.dump("chat_sessions/u1-a")["chat_sessions/u1-a"]["messages"]
+    assert [message["bitmapRef"] for message in messages] == [digest("cat"), digest("dog"), digest("owl")]
+    assert f"chat_blobs/{digest('owl')}" in db.dump("chat_blobs")
+
+def test_dry_run_writes_nothing(db, tmp_path):
+    before = db.dump()
+    report, _ = run(db, tmp_path, "--dry-run")
+    assert report["blobsWritten"] == 2 and report["images"] == 4
+    assert db.dump() == before
+
+def test_archived_turns_are_compacted(db, tmp_path):
+    db.document("chat_sessions/u1-b").update({"archivedMessages": 2})
+    db.document("chat_sessions/u1-b/archive/00000000").set({
+        "sessionId": "u1-b", "userId": "u1", "firstIndex": 0, "messageCount": 2,
+        "messages": [message(0, "owl"), message(1, "cat")]
+    })
+    report, _ = run(db, tmp_path)
+
+    assert report["sessions"] == 4 and report["sessionsWithImages"] == 3 and report["images"] == 6
+    assert report["blobsWritten"] == 3 and report["blobsReused"] == 3
+    part = db.dump()["chat_sessions/u1-b/archive/00000000"]
+    assert [item["bitmapRef"] for item in part["messages"]] == [digest("owl"), digest("cat")]
+    assert all(item["bitmapBase64"] is None for item in part["messages"])
+    assert db.dump()[f"chat_blobs/{digest('owl')}"]["userIds"] == ["u1"]
@@ -0,0 +1,63 @@
+"""Incremental export against the in-memory document store"""
+
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+from document_store import MemoryStore
+from export_chat_history import export_sessions, parse_args
+from prune_chat_sessions import parse_args as prune_args, prune_sessions
+
+def add_session(db, session_id, updated):
+    db.collection("chat_sessions").document(session_id).set({
+        "userId": "u1", "title": "t", "createdAt": updated, "updatedAt": updated,
+        "messages": [{"prompt": "hi", "isFromUser": True, "id": "a"},
+                     {"prompt": "hello", "isFromUser": False, "modelUsed": "m/a", "id": "b"}]
+    })
+
+def exported_ids(manifest, output):
+    ids = []
+    for entry in manifest["files"]:
+        with open(os.path.join(output, manifest["runId"], entry["file"]), encoding="utf-8") as file:
+            ids.extend(json.loads(line)["sessionId"] for line in file)
+    return sorted(ids)
+
+def test_overlap_catches_late_sessions_once(tmp_path):
+    db = MemoryStore()
+    now = datetime.now(timezone.utc)
+    add_session(db, "old", now - timedelta(hours=2))
+    add_session(db, "recent", now - timedelta(minutes=1))
+    args = parse_args(["--output", str(tmp_path / "out"), "--checkpoint-file", str(tmp_path / "ck.json"),
+                       "--rows", "sessions", "--workers", "1"])
+
+    first = export_sessions(db, args)
+    assert exported_ids(first, args.output) == ["old", "recent"]
+
+    # Committed after the first run, but stamped before its watermark
+    watermark = datetime.fromisoformat(first["until"])
+    add_session(db, "late", watermark - timedelta(minutes=5))
+    second = export_sessions(db, args)
+    assert exported_ids(second, args.output) == ["late"]
+
+    # A session edited again inside the overlap is exported again
+    add_session(db, "recent", datetime.fromisoformat(second["until"]) - timedelta(seconds=1))
+    third = export_sessions(db, args)
+    assert exported_ids(third, args.output) == ["recent"]
+
+def test_archived_turns_are_exported_in_front(tmp_path):
+    db = MemoryStore()
+    updated = datetime.now(timezone.utc) - timedelta(days=30)
+    db.document("chat_sessions/long").set({
+        "userId": "u1", "createdAt": updated, "updatedAt": updated,
+        "messages": [{"prompt": str(i), "isFromUser": i % 2 == 0, "id": f"m{i}"} for i in range(30)]
+    })
+    prune_sessions(db, prune_args(["--max-messages", "10", "--archive-dir", str(tmp_path / "archives"),
+                                   "--cursor-file", str(tmp_path / "cursor.json")]))
+    assert len(db.dump()["chat_sessions/long"]["messages"]) == 10
+
+    args = parse_args(["--output", str(tmp_path / "out"), "--checkpoint-file", str(tmp_path / "ck.json"),
+                       "--workers", "1"])
+    manifest = export_sessions(db, args)
+    with open(os.path.join(args.output, manifest["runId"], manifest["files"][0]["file"]), encoding="utf-8") as file:
+        rows = [json.loads(line) for line in file]
+    assert [(row["messageIndex"], row["messageId"]) for row in rows] == [(i, f"m{i}") for i in range(30)]
@@ -0,0 +1,39 @@
+"""Reconciling a catalog with a provider listing"""
+
+from import_provider_models import normalize_listing, reconcile
+
+def openrouter_entry(model_id, prompt="0", completion="0"):
+    return {"id": model_id, "name": f"Vendor: {model_id}", "context_length": 8192,
+            "pricing": {"prompt": prompt, "completion": completion}}
+
+LISTING = {"data": [
+    openrouter_entry("deepseek/deepseek-chat:free"),
+    openrouter_entry("deepseek/deepseek-chat", "0.000001", "0.000002"),
+    openrouter_entry("openai/gpt-4o", "0.000005", "0.000015"),
+    openrouter_entry("qwen/qwen-3:free"),
+    openrouter_entry("mistral/new-paid", "0.000001", "0.000001"),
+]}
+
+def row(api_model, order):
+    return {"displayName": api_model, "apiModel": api_model, "isAvailable": True, "order": order, "isPro": False}
+
+def test_paid_rows_still_listed_stay_available():
+    imported = normalize_listing("openrouter", LISTING)
+    assert imported["deepseek/deepseek-chat"]["free"] is True
+    assert imported["openai/gpt-4o"]["free"] is False
+
+    existing = [row("openai/gpt-4o", 1), row("deepseek/deepseek-chat", 2), row("gone/model", 3)]
+    models, notes = reconcile(existing, imported)
+    by_id = {model["apiModel"]: model for model in models}
+
+    assert notes["missing"] == ["gone/model"]
+    assert by_id["openai/gpt-4o"]["isAvailable"] is True
+    assert by_id["openai/gpt-4o"]["contextLength"] == 8192
+    assert by_id["gone/model"]["isAvailable"] is False
+    # Only free models are added, and "free" never reaches the CSV
+    assert notes["added"] == ["qwen/qwen-3"]
+    assert all("free" not in model for model in models)
+
+def test_include_paid_adds_paid_models():
+    _, notes = reconcile([], normalize_listing("openrouter", LISTING), include_paid=True)
+    assert sorted(notes["added"]) == ["deepseek/deepseek-chat", "mistral/new-paid", "openai/gpt-4o", "qwen/qwen-3"]
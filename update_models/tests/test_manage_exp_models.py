@@ -0,0 +1,144 @@
+"""exp_models compact, migrate, expire and reconcile against the in-memory document store"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import catalog_cache
+import manage_exp_models
+from catalog_sync import HASH_FIELD, PROBE_FIELD, VERSION_FIELD, compute_catalog_hash
+from document_store import MemoryStore
+from manage_exp_models import parse_args, run_command
+
+NOW = datetime.now(timezone.utc)
+EXP_PATH = "app_config/exp_models"
+
+def entry(model_id, name="Model"):
+    return {"modelId": model_id, "modelName": name}
+
+def dated(*pairs):
+    """A migrated document: {exp_key: addedAt} from (modelId, days ago) pairs"""
+    entries = [entry(model_id) for model_id, _ in pairs]
+    return {
+        "list": entries,
+        "byId": {model_id.replace(":free", ""): dict(entry(model_id), addedAt=NOW - timedelta(days=days))
+                 for model_id, days in pairs},
+        VERSION_FIELD: 4
+    }
+
+@pytest.fixture
+def db(monkeypatch, tmp_path):
+    monkeypatch.setattr(catalog_cache, "CACHE_DIR", str(tmp_path / "cache"))
+    return MemoryStore()
+
+def run(db, tmp_path, command, *extra):
+    args = parse_args([command, "--csv", str(tmp_path / "exp_models.csv"), "--yes", *extra])
+    return run_command(db, command, args)
+
+def publish_probe(db, reached, probed_at):
+    db.document("app_config/models").set({
+        "list": [{"apiModel": api, "isAvailable": True} for api in ("vendor/fixed", "vendor/broken", "vendor/new")],
+        PROBE_FIELD: {"models": [{"apiModel": api, "ttftMs": 100, "latencyMs": 200} for api in reached],
+                      "probedAt": probed_at}
+    })
+
+def test_compact_drops_duplicates_and_stray_fields(db, tmp_path):
+    db.document(EXP_PATH).set({
+        "list": [entry("vendor/a:free"), entry("Vendor/A"), entry(""), entry("vendor/b:free")],
+        "test": True, "timestamp": "2024-01-01", VERSION_FIELD: 2
+    })
+    assert run(db, tmp_path, "compact")
+
+    data = db.dump()[EXP_PATH]
+    assert data["list"] == [entry("vendor/a:free"), entry("vendor/b:free")]
+    assert "test" not in data and "timestamp" not in data
+    assert data[VERSION_FIELD] == 3 and data[HASH_FIELD] == compute_catalog_hash(data["list"])
+    assert "byId" not in data
+
+    # Nothing left to do: no write, no version bump
+    assert run(db, tmp_path, "compact")
+    assert db.dump()[EXP_PATH][VERSION_FIELD] == 3
+
+def test_migrate_adds_the_keyed_map(db, tmp_path):
+    db.document(EXP_PATH).set({"list": [entry("vendor/a:free"), entry("vendor/b:free")]})
+    assert run(db, tmp_path, "migrate")
+
+    data = db.dump()[EXP_PATH]
+    assert data["list"] == [entry("vendor/a:free"), entry("vendor/b:free")]
+    assert set(data["byId"]) == {"vendor/a", "vendor/b"}
+    assert isinstance(data["byId"]["vendor/a"]["addedAt"], datetime)
+
+def test_expire_keeps_pinned_and_recent_entries(db, tmp_path):
+    db.document(EXP_PATH).set(dated(("vendor/old:free", 200), ("vendor/pinned:free", 200), ("vendor/new:free", 5)))
+    (tmp_path / "exp_models.csv").write_text("modelId,modelName\nvendor/pinned:free,Pinned\n")
+    assert run(db, tmp_path, "expire", "--days", "90")
+
+    data = db.dump()[EXP_PATH]
+    assert [item["modelId"] for item in data["list"]] == ["vendor/pinned:free", "vendor/new:free"]
+    assert set(data["byId"]) == {"vendor/pinned", "vendor/new"}
+
+def test_expire_needs_migrate(db, tmp_path):
+    db.document(EXP_PATH).set({"list": [entry("vendor/a:free")]})
+    assert not run(db, tmp_path, "expire")
+
+def test_reconcile_refuses_without_a_probe(db, tmp_path):
+    db.document(EXP_PATH).set(dated(("vendor/fixed:free", 10)))
+    # isAvailable alone is no evidence that the plain id works
+    db.document("app_config/models").set({"list": [{"apiModel": "vendor/fixed", "isAvailable": True}]})
+    before = db.dump()[EXP_PATH]
+
+    assert not run(db, tmp_path, "reconcile")
+    assert db.dump()[EXP_PATH] == before
+
+def test_reconcile_refuses_a_stale_probe(db, tmp_path):
+    db.document(EXP_PATH).set(dated(("vendor/fixed:free", 10)))
+    publish_probe(db, ["vendor/fixed"], NOW - timedelta(days=3))
+    assert not run(db, tmp_path, "reconcile")
+    assert run(db, tmp_path, "reconcile", "--probe-max-age", "100")
+    assert db.dump()[EXP_PATH]["list"] == []
+
+def test_reconcile_drops_only_probed_exceptions(db, tmp_path):
+    db.document(EXP_PATH).set(dated(("vendor/fixed:free", 10), ("vendor/broken:free", 10), ("vendor/new:free", 0)))
+    # vendor/new failed for a device after the probe reached it
+    db.document(EXP_PATH).update({"byId.vendor/new.addedAt": NOW + timedelta(minutes=5)})
+    publish_probe(db, ["vendor/fixed", "vendor/new"], NOW - timedelta(hours=1))
+    assert run(db, tmp_path, "reconcile")
+
+    data = db.dump()[EXP_PATH]
+    assert [item["modelId"] for item in data["list"]] == ["vendor/broken:free", "vendor/new:free"]
+    assert set(data["byId"]) == {"vendor/broken", "vendor/new"}
+
+def test_reconcile_with_a_fresh_probe(db, tmp_path, monkeypatch):
+    db.document(EXP_PATH).set({"list": [entry("vendor/fixed:free"), entry("vendor/broken:free")]})
+    probed = []
+
+    def probe_catalog(models, provider, keys, **options):
+        probed.extend(model["apiModel"] for model in models)
+        return {model["apiModel"]: {"ok": model["apiModel"] == "vendor/fixed", "status": 200, "error": None,
+                                    "ttftMs": 100, "latencyMs": 200, "tokens": 1} for model in models}
+
+    monkeypatch.setattr(manage_exp_models, "probe_catalog", probe_catalog)
+    monkeypatch.setattr(manage_exp_models, "load_api_keys", lambda db_: {"openrouter": "test-key"})
+    assert run(db, tmp_path, "reconcile", "--probe")
+
+    assert probed == ["vendor/fixed", "vendor/broken"]
+    assert db.dump()[EXP_PATH]["list"] == [entry("vendor/broken:free")]
+
+def test_device_add_mid_run_is_kept(db, tmp_path, monkeypatch):
+    db.document(EXP_PATH).set({"list": [entry("vendor/a:free"), entry("vendor/a")]})
+    original = manage_exp_models.plan_cleanup
+    calls = []
+
+    def plan_cleanup(data, *args):
+        plan = original(data, *args)
+        if not calls:
+            # A device adds an exception after the document was read
+            db.document(EXP_PATH).update({"list": data["list"] + [entry("vendor/c:free")]})
+        calls.append(len(data["list"]))
+        return plan
+
+    monkeypatch.setattr(manage_exp_models, "plan_cleanup", plan_cleanup)
+    assert run(db, tmp_path, "compact")
+
+    assert calls == [2, 3]
+    assert db.dump()[EXP_PATH]["list"] == [entry("vendor/a:free"), entry("vendor/c:free")]
@@ -0,0 +1,197 @@
+"""Prober tests against a local stub server (no network, no API keys)"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from catalog_sync import (
+    PROBE_FIELD, compute_catalog_hash, plan_catalog_update, publish_catalogs, read_catalogs
+)
+from document_store import MemoryStore
+from import_provider_models import normalize_listing, reconcile
+from model_benchmark import benchmark_catalog
+from model_probe import CATALOG_PROVIDERS, apply_probe_results, probe_catalog, probe_measurements
+
+FIRST_TOKEN_DELAY = 0.2
+
+GEMINI_KEY = "gemini-test-key"
+
+class StubHandler(BaseHTTPRequestHandler):
+    """OpenAI-style chat completions and Gemini streamGenerateContent
+
+    The requested model picks the behavior.
+    """
+
+    def send_events(self, chunks, delay=0.0):
+        for chunk in chunks:
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(delay)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if ":streamGenerateContent" in self.path:
+            self.gemini(body)
+            return
+        model = body["model"]
+        if model == "stub/fail":
+            self.send_response(500)
+            self.end_headers()
+            self.wfile.write(b"upstream exploded")
+            return
+        if model == "stub/slow":
+            time.sleep(2)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        self.wfile.flush()
+        if model == "stub/role":
+            # Role-only and empty deltas arrive long before the first text
+            self.send_events([{"choices": [{"delta": {"role": "assistant"}}]},
+                              {"choices": [{"delta": {"content": ""}}]}])
+        elif model == "stub/drip":
+            # Never stalls long enough for a socket timeout, never finishes
+            self.send_events([{"choices": [{"delta": {"content": "."}}]}] * 50, delay=0.1)
+            return
+        time.sleep(FIRST_TOKEN_DELAY)
+        chunk = {"choices": [{"delta": {"content": "Hello"}}], "usage": {"completion_tokens": 1}}
+        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def gemini(self, body):
+        prefix = "/v1beta/models/"
+        if (not self.path.startswith(prefix) or not self.path.endswith(":streamGenerateContent?alt=sse")
+                or self.headers.get("x-goog-api-key") != GEMINI_KEY or not body.get("contents")):
+            self.send_response(400)
+            self.end_headers()
+            self.wfile.write(f"bad gemini request {self.path}".encode())
+            return
+        model = self.path[len(prefix):].split(":")[0]
+        if model == "gemini-missing":
+            self.send_response(404)
+            self.end_headers()
+            self.wfile.write(b"model not found")
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        time.sleep(FIRST_TOKEN_DELAY)
+        self.send_events([
+            {"candidates": [{"content": {"parts": [{"text": "Hel"}], "role": "model"}}]},
+            {"candidates": [{"content": {"parts": [{"text": "lo"}], "role": "model"}}],
+             "usageMetadata": {"candidatesTokenCount": 2}},
+        ])
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture(scope="module")
+def stub_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+def probe(stub_url, *api_models, timeout=5.0):
+    models = [{"apiModel": api, "isAvailable": True} for api in api_models]
+    return models, probe_catalog(models, "openrouter", {"openrouter": "test-key"}, timeout=timeout,
+                                 rates={"openrouter": 0}, base_urls={"openrouter": f"{stub_url}/v1"})
+
+def test_streaming_ttft(stub_url):
+    _, results = probe(stub_url, "stub/ok")
+    result = results["stub/ok"]
+    assert result["ok"] and result["status"] == 200 and result["tokens"] == 1
+    assert result["ttftMs"] >= FIRST_TOKEN_DELAY * 1000 * 0.9
+    assert result["latencyMs"] >= result["ttftMs"]
+
+def test_non_200(stub_url):
+    _, results = probe(stub_url, "stub/fail")
+    result = results["stub/fail"]
+    assert result["ok"] is False and result["status"] == 500
+    assert "upstream exploded" in result["error"]
+    assert result["ttftMs"] is None
+
+def test_timeout(stub_url):
+    _, results = probe(stub_url, "stub/slow", timeout=0.5)
+    result = results["stub/slow"]
+    assert result["ok"] is False and result["status"] is None
+    assert "timed out" in result["error"]
+
+def test_ttft_waits_for_text(stub_url):
+    _, results = probe(stub_url, "stub/role")
+    result = results["stub/role"]
+    assert result["ok"] and result["tokens"] == 1
+    assert result["ttftMs"] >= FIRST_TOKEN_DELAY * 1000 * 0.9
+
+def test_trickling_stream_hits_the_total_deadline(stub_url):
+    started = time.perf_counter()
+    _, results = probe(stub_url, "stub/drip", timeout=0.5)
+    assert time.perf_counter() - started < 2.0
+    result = results["stub/drip"]
+    assert result["ok"] is False and "timed out" in result["error"]
+
+def test_gemini_stream(stub_url):
+    models = [{"apiModel": "gemini-ok", "isAvailable": True},
+              {"apiModel": "gemini-missing", "isAvailable": True}]
+    results = probe_catalog(models, CATALOG_PROVIDERS["gemini_models"], {"gemini": GEMINI_KEY},
+                            rates={"gemini": 0}, base_urls={"gemini": f"{stub_url}/v1beta"})
+    ok = results["gemini-ok"]
+    assert ok["ok"] and ok["status"] == 200 and ok["tokens"] == 2
+    assert ok["ttftMs"] >= FIRST_TOKEN_DELAY * 1000 * 0.9
+    missing = results["gemini-missing"]
+    assert missing["ok"] is False and missing["status"] == 404
+    assert [model["isAvailable"] for model in apply_probe_results(models, results)] == [True, False]
+
+def test_missing_key_is_skipped():
+    models = [{"apiModel": "stub/ok", "isAvailable": True}]
+    results = probe_catalog(models, "openrouter", {})
+    assert results["stub/ok"]["ok"] is None
+    assert apply_probe_results(models, results) == models
+
+def test_probe_keeps_hash_stable(stub_url):
+    models, results = probe(stub_url, "stub/ok", "stub/fail")
+    probed = apply_probe_results(models, results)
+    assert [model["isAvailable"] for model in probed] == [True, False]
+    assert all("ttftMs" not in model and "latencyMs" not in model for model in probed)
+
+    # Publish, probe again (different latencies): no catalog write is planned
+    db = MemoryStore()
+    publish_catalogs(db, [{"document": "models", "models": probed, "plan": plan_catalog_update(None, probed),
+                           "measurements": probe_measurements(results)}])
+    current = read_catalogs(db, ["models"], keep_snapshots=False)["models"]
+    _, again = probe(stub_url, "stub/ok", "stub/fail")
+    plan = plan_catalog_update(current, apply_probe_results(models, again))
+    assert plan["needsWrite"] is False
+    assert plan["catalogVersion"] == 1
+
+def test_measurements_published_without_a_version_bump(stub_url):
+    models, results = probe(stub_url, "stub/ok")
+    db = MemoryStore()
+    ref = db.collection("app_config").document("models")
+    ref.set({"list": models, "catalogHash": compute_catalog_hash(models), "catalogVersion": 3})
+    plan = {"needsWrite": False}
+    written = publish_catalogs(db, [{"document": "models", "models": models, "plan": plan,
+                                     "measurements": probe_measurements(results)}])
+
+    data = ref.get().to_dict()
+    assert written == 0
+    assert data["catalogVersion"] == 3 and data["list"] == models
+    assert [entry["apiModel"] for entry in data[PROBE_FIELD]["models"]] == ["stub/ok"]
+    assert data[PROBE_FIELD]["models"][0]["ttftMs"] == results["stub/ok"]["ttftMs"]
+
+def test_imported_rows_route_to_the_catalog_provider(stub_url):
+    # import_provider_models sets "provider" to the model vendor, not an endpoint
+    listing = {"data": [{"id": "stub/ok:free", "name": "Stub: OK", "pricing": {"prompt": "0", "completion": "0"}}]}
+    models, _ = reconcile([], normalize_listing("openrouter", listing))
+    assert models[0]["provider"] == "stub"
+
+    options = {"rates": {"openrouter": 0}, "base_urls": {"openrouter": f"{stub_url}/v1"}}
+    results = probe_catalog(models, "openrouter", {"openrouter": "test-key"}, **options)
+    assert results["stub/ok"]["ok"]
+    benchmark = benchmark_catalog(models, "openrouter", {"openrouter": "test-key"}, repetitions=1, **options)
+    assert benchmark["stub/ok"] and all(result["ok"] for result in benchmark["stub/ok"])
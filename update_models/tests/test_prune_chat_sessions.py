@@ -0,0 +1,112 @@
+"""Retention policies, conflicts and resume against the in-memory document store"""
+
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import prune_chat_sessions
+from document_store import MemoryStore
+from prune_chat_sessions import parse_args, prune_sessions
+
+NOW = datetime.now(timezone.utc)
+
+def turns(count):
+    return [{"prompt": str(i), "isFromUser": i % 2 == 0, "id": f"m{i}"} for i in range(count)]
+
+def add_session(db, session_id, user_id, days_idle, messages=(), title="Chat"):
+    db.document(f"chat_sessions/{session_id}").set({
+        "userId": user_id, "title": title, "updatedAt": NOW - timedelta(days=days_idle), "messages": list(messages)
+    })
+
+@pytest.fixture
+def db():
+    db = MemoryStore()
+    for user in ("u1", "u2", "u3"):
+        add_session(db, f"{user}-empty", user, 30, title="New Chat")
+        add_session(db, f"{user}-fresh-empty", user, 1, title="New Chat")
+        add_session(db, f"{user}-stale", user, 400, turns(6))
+        add_session(db, f"{user}-long", user, 30, turns(30))
+        add_session(db, f"{user}-open", user, 0, turns(30))
+    return db
+
+def run(db, tmp_path, *extra):
+    args = parse_args(["--archive-days", "180", "--max-messages", "10", "--empty-days", "7",
+                       "--archive-dir", str(tmp_path / "archives"), "--cursor-file", str(tmp_path / "cursor.json"),
+                       "--writes-per-second", "100000", "--workers", "2", *extra])
+    return prune_sessions(db, args)
+
+def test_policies(db, tmp_path):
+    report, _, archive_path = run(db, tmp_path)
+    documents = db.dump("chat_sessions")
+
+    assert report["users"] == 3 and report["sessions"] == 15
+    assert report["emptyDeleted"] == 3 and report["archivedSessions"] == 3 and report["splitSessions"] == 3
+    for user in ("u1", "u2", "u3"):
+        assert f"chat_sessions/{user}-empty" not in documents
+        assert f"chat_sessions/{user}-fresh-empty" in documents
+        assert f"chat_sessions/{user}-stale" not in documents
+        # Recently updated sessions are never split
+        assert len(documents[f"chat_sessions/{user}-open"]["messages"]) == 30
+
+        long = documents[f"chat_sessions/{user}-long"]
+        assert [message["id"] for message in long["messages"]] == [f"m{i}" for i in range(20, 30)]
+        assert long["archivedMessages"] == 20
+        part = documents[f"chat_sessions/{user}-long/archive/00000000"]
+        assert part["userId"] == user and part["firstIndex"] == 0
+        assert [message["id"] for message in part["messages"]] == [f"m{i}" for i in range(20)]
+
+    with open(archive_path, encoding="utf-8") as file:
+        archived = [json.loads(line) for line in file]
+    assert sorted(record["id"] for record in archived) == ["u1-stale", "u2-stale", "u3-stale"]
+    assert all(len(record["messages"]) == 6 for record in archived)
+
+    # A second split appends after the first archive document
+    db.document("chat_sessions/u1-long").update({"messages": turns(30), "updatedAt": NOW - timedelta(days=30)})
+    run(db, tmp_path, "--user", "u1")
+    long = db.dump("chat_sessions/u1-long")
+    assert long["chat_sessions/u1-long"]["archivedMessages"] == 40
+    assert long["chat_sessions/u1-long/archive/00000020"]["firstIndex"] == 20
+
+def test_archived_session_takes_its_archive_along(db, tmp_path):
+    run(db, tmp_path, "--user", "u1")
+    db.document("chat_sessions/u1-long").update({"updatedAt": NOW - timedelta(days=400)})
+    _, _, archive_path = run(db, tmp_path, "--user", "u1")
+
+    assert not db.dump("chat_sessions/u1-long")
+    with open(archive_path, encoding="utf-8") as file:
+        record = [json.loads(line) for line in file if '"u1-long"' in line][0]
+    assert [message["id"] for message in record["messages"]] == [f"m{i}" for i in range(30)]
+    assert "archivedMessages" not in record
+
+def test_session_saved_mid_run_is_reread(db, tmp_path, monkeypatch):
+    original = prune_chat_sessions.prune_page
+    calls = []
+
+    def prune_page(db_, writer, snapshots, *args):
+        report = original(db_, writer, snapshots, *args)
+        if not calls:
+            # The app saves a new message after the page was read
+            db.document("chat_sessions/u1-stale").update({"messages": turns(7), "updatedAt": NOW})
+        calls.append(len(snapshots))
+        return report
+
+    monkeypatch.setattr(prune_chat_sessions, "prune_page", prune_page)
+    report, _, _ = run(db, tmp_path, "--user", "u1")
+
+    assert report["conflicts"] == 1
+    # Nothing of the failed batch was applied; the re-read page sees the fresh session
+    stale = db.dump("chat_sessions/u1-stale")["chat_sessions/u1-stale"]
+    assert len(stale["messages"]) == 7
+    assert report["archivedSessions"] == 0 and report["emptyDeleted"] == 1 and report["splitSessions"] == 1
+
+def test_limit_checkpoints_and_resumes(db, tmp_path):
+    first, _, _ = run(db, tmp_path, "--limit", "1")
+    assert first["users"] == 1
+    assert json.loads((tmp_path / "cursor.json").read_text())["cursor"] == "u1"
+    assert "chat_sessions/u2-empty" in db.dump("chat_sessions")
+
+    second, _, _ = run(db, tmp_path)
+    # The resumed run continues after u1 and keeps the totals of the first part
+    assert second["users"] == 3 and second["emptyDeleted"] == 3
+    assert not (tmp_path / "cursor.json").exists()
@@ -0,0 +1,661 @@
+#!/usr/bin/env python3
+"""
+Firebase Catalog Updater Script
+Syncs app_config/models, app_config/gemini_models and app_config/exp_models
+in a single run with one Firebase init and one atomic batch write
+
+The command line layer over catalog_api.CatalogSync (load, plan, apply,
+verify), which services and tests can import directly: this script adds
+the arguments, diffs, confirmation prompts and exit codes.
+
+Usage:
+    python update_firebase_catalogs.py                      # Sync every catalog
+    python update_firebase_catalogs.py --only models        # Sync selected catalogs
+    python update_firebase_catalogs.py --list               # List current catalogs
+    python update_firebase_catalogs.py --list --offline     # List the cached snapshots
+    python update_firebase_catalogs.py --plan               # Validate + diff offline
+    python update_firebase_catalogs.py --shard-by provider  # Force a sharded layout
+    python update_firebase_catalogs.py --probe              # Probe models before syncing
+    python update_firebase_catalogs.py --benchmark          # Benchmark models (no sync)
+    python update_firebase_catalogs.py --watch --yes        # Publish every CSV save
+    python update_firebase_catalogs.py --projects projects.json  # Publish to several projects
+    python update_firebase_catalogs.py --yes --report run.json   # Write a timing/cost report
+    python update_firebase_catalogs.py --only models --history   # List published versions
+    python update_firebase_catalogs.py --only models --rollback 41  # Publish version 41 again
+    python update_firebase_catalogs.py --backend emulator --yes      # Publish to the Firestore emulator
+    python update_firebase_catalogs.py --backend memory --yes        # Dry run into an in-memory store
+    generate_catalog | python update_firebase_catalogs.py --only models --models-csv - --yes
+
+Requirements:
+    pip install firebase-admin
+"""
+
+import argparse
+import os
+import sys
+
+from firebase_common import initialize_firebase, initialize_project
+from run_report import reporting
+from project_fanout import load_manifest, run_parallel, print_fanout_report
+from catalog_cache import load_snapshot_entry, describe_snapshot
+from catalog_history import load_version, read_history, print_history, default_author
+from catalog_readers import FORMATS, STDIN, detect_format, source_exists
+from csv_watcher import DEFAULT_DEBOUNCE, DEFAULT_POLL_INTERVAL, make_watcher, collect_changes
+from catalog_shards import SHARD_MODES, DEFAULT_SHARD_ROWS, choose_layout
+from model_probe import (
+    CATALOG_PROVIDERS, DEFAULT_CONCURRENCY, DEFAULT_TIMEOUT, load_api_keys, probe_catalog,
+    apply_probe_results, print_probe_results, parse_provider_values, probe_measurements
+)
+from model_benchmark import (
+    DEFAULT_REPETITIONS, DEFAULT_MAX_TOKENS, DEFAULT_RESULTS_FILE, benchmark_catalog,
+    summarize_samples, print_benchmark_summary, save_benchmark_results, rank_order
+)
+from catalog_api import CatalogError, CatalogSync, load_target
+from catalog_sync import (
+    CATALOGS, COLLECTION_PATH, load_exp_models_from_csv, save_models_to_csv,
+    exp_entries, merge_exp_models, plan_catalog_update, print_catalog_diff, read_catalogs,
+    validate_models_csv, print_validation, compute_catalog_hash, print_verification
+)
+from document_store import BACKENDS, DEFAULT_EMULATOR_HOST, open_store
+
+# ============================================================================
+# FUNCTIONS
+# ============================================================================
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Sync Mark VII model catalogs to Firestore in one atomic batch"
+    )
+    parser.add_argument("--only", nargs="+", metavar="CATALOG",
+                        choices=[catalog["name"] for catalog in CATALOGS],
+                        help="Catalogs to sync (default: all)")
+    parser.add_argument("--models-csv", help="CSV for app_config/models (or .json/.jsonl/.parquet, - for stdin)")
+    parser.add_argument("--gemini-csv", help="CSV for app_config/gemini_models (same formats)")
+    parser.add_argument("--exp-csv", help="CSV for app_config/exp_models (modelId,modelName; same formats)")
+    parser.add_argument("--stdin-format", choices=FORMATS,
+                        help="Format of a catalog read from - (default: sniffed from the input)")
+    parser.add_argument("--shard-by", choices=SHARD_MODES, default="auto",
+                        help="Shard layout for models catalogs (default: auto, shards by provider "
+                             "when the list nears the 1 MiB document limit)")
+    parser.add_argument("--shard-rows", type=int, default=DEFAULT_SHARD_ROWS,
+                        help=f"Max rows per shard (default: {DEFAULT_SHARD_ROWS})")
+    parser.add_argument("--probe", action="store_true",
+                        help="Probe every model and mark failing ones unavailable before syncing")
+    parser.add_argument("--probe-concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Max probes in flight (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--probe-timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help=f"Per-request timeout in seconds (default: {DEFAULT_TIMEOUT:.0f})")
+    parser.add_argument("--probe-rate", action="append", metavar="PROVIDER=N",
+                        help="Max requests per second for a provider (repeatable)")
+    parser.add_argument("--probe-base-url", action="append", metavar="PROVIDER=URL",
+                        help="Override a provider endpoint, e.g. a local stub server (repeatable)")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Benchmark every model with a fixed prompt set and exit (uses the --probe-* limits)")
+    parser.add_argument("--benchmark-runs", type=int, default=DEFAULT_REPETITIONS,
+                        help=f"Repetitions of the prompt set per model (default: {DEFAULT_REPETITIONS})")
+    parser.add_argument("--benchmark-max-tokens", type=int, default=DEFAULT_MAX_TOKENS,
+                        help=f"Max tokens generated per request (default: {DEFAULT_MAX_TOKENS})")
+    parser.add_argument("--benchmark-results", default=DEFAULT_RESULTS_FILE,
+                        help="Local JSON file to store benchmark results in")
+    parser.add_argument("--apply-order", action="store_true",
+                        help="With --benchmark, rewrite the CSV order column fastest first within each isPro tier")
+    parser.add_argument("--plan", action="store_true",
+                        help="Validate the CSVs and diff them against the cached snapshots, offline")
+    parser.add_argument("--strict", action="store_true",
+                        help="With --plan, fail on warnings (duplicate or gapped order) too")
+    parser.add_argument("--yes", "-y", action="store_true",
+                        help="Publish without asking for confirmation")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and publish the changed catalog whenever its CSV is saved")
+    parser.add_argument("--debounce", type=float, default=DEFAULT_DEBOUNCE,
+                        help=f"With --watch, seconds of quiet before publishing (default: {DEFAULT_DEBOUNCE:g})")
+    parser.add_argument("--poll", action="store_true",
+                        help="With --watch, poll the CSVs instead of using inotify")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help=f"Polling interval in seconds (default: {DEFAULT_POLL_INTERVAL:g})")
+    parser.add_argument("--projects", metavar="MANIFEST",
+                        help="JSON manifest of Firebase projects to publish to concurrently")
+    parser.add_argument("--fanout-workers", type=int,
+                        help="With --projects, max projects published at once (default: all)")
+    parser.add_argument("--report", metavar="FILE",
+                        help="Write a JSON run report (phase timings, Firestore reads/writes/bytes)")
+    parser.add_argument("--spans", metavar="FILE",
+                        help="Write every timed phase as OpenTelemetry-style JSON lines")
+    parser.add_argument("--author", default=default_author(),
+                        help="Author recorded in the catalog history (default: $CATALOG_AUTHOR or user@host)")
+    parser.add_argument("--history", action="store_true",
+                        help="List the published versions of the selected catalogs and exit")
+    parser.add_argument("--rollback", type=int, metavar="VERSION",
+                        help="Publish VERSION of the one catalog selected with --only again, as a new version")
+    parser.add_argument("--backend", choices=BACKENDS, default="firestore",
+                        help="Document store to publish to: firestore (default), the Firestore emulator, "
+                             "or memory (an empty in-memory store, a dry run of the whole write path)")
+    parser.add_argument("--emulator-host", metavar="HOST:PORT",
+                        help=f"With --backend emulator, the emulator address "
+                             f"(default: $FIRESTORE_EMULATOR_HOST or {DEFAULT_EMULATOR_HOST})")
+    parser.add_argument("--list", action="store_true", help="List current catalogs and exit")
+    parser.add_argument("--offline", action="store_true",
+                        help="With --list, show the local snapshots without contacting Firestore")
+    return parser.parse_args(argv)
+
+def selected_catalogs(args):
+    """Return the catalog definitions selected on the command line"""
+    overrides = {
+        "models": args.models_csv,
+        "gemini_models": args.gemini_csv,
+        "exp_models": args.exp_csv,
+    }
+    catalogs = []
+    for catalog in CATALOGS:
+        if args.only and catalog["name"] not in args.only:
+            continue
+        catalog = dict(catalog)
+        if overrides[catalog["name"]]:
+            catalog["csv"] = overrides[catalog["name"]]
+        catalog["format"] = args.stdin_format if catalog["csv"] == STDIN else None
+        catalogs.append(catalog)
+    return catalogs
+
+def load_catalogs(catalogs):
+    """Load every selected catalog from its CSV
+
+    Returns a list of targets ({catalog, document, entries}), or None when
+    any catalog is invalid (every invalid one is reported). The exception
+    catalog is optional and skipped when its CSV does not exist.
+    """
+    targets = []
+    failed = False
+    for catalog in catalogs:
+        try:
+            target = load_target(catalog)
+        except CatalogError as e:
+            print_validation(catalog["csv"], e.errors, e.warnings)
+            print(f"❌ Fix the errors above in {catalog['csv']}")
+            failed = True
+            continue
+        if target is None:
+            print(f"⏭️ Skipping {catalog['label']}: {catalog['csv']} not found")
+            continue
+        print(f"✅ Loaded {len(target['entries'])} {catalog['label']} from {catalog['csv']}")
+        targets.append(target)
+    return None if failed else targets
+
+def open_db(args):
+    """Open the document store selected with --backend"""
+    if args.backend == "firestore":
+        return initialize_firebase()
+    return open_store(args.backend, args.emulator_host)
+
+def make_sync(db, catalogs, args, project=None):
+    """CatalogSync over db with the author and shard options of the command line
+
+    Local snapshots are only used with Firestore, so emulator and memory
+    runs never replace the production baseline.
+    """
+    return CatalogSync(db, catalogs, args.author, args.shard_by, args.shard_rows, project,
+                       cache=args.backend == "firestore", report=print)
+
+def bind_targets(db, targets, args, project=None):
+    """CatalogSync over db, loaded with targets that load_catalogs() validated
+
+    The entries are passed on as lists, so a CSV (or stdin) is read once
+    however many stores it is published to. Probe measurements carry over.
+    """
+    sync = make_sync(db, [target["catalog"] for target in targets], args, project)
+    sync.load({target["catalog"]["name"]: target["entries"] for target in targets})
+    measurements = {target["document"]: target.get("measurements") for target in targets}
+    for target in sync.targets:
+        if measurements[target["document"]] is not None:
+            target["measurements"] = measurements[target["document"]]
+    return sync
+
+def probe_targets(db, targets, args):
+    """Probe the models catalogs: flip failing entries unavailable and keep the latencies"""
+    keys = load_api_keys(db)
+    rates = parse_provider_values(args.probe_rate, float)
+    base_urls = parse_provider_values(args.probe_base_url)
+    for target in targets:
+        catalog = target["catalog"]
+        if catalog["kind"] != "models":
+            continue
+        results = probe_catalog(target["entries"], CATALOG_PROVIDERS[catalog["name"]], keys,
+                                concurrency=args.probe_concurrency, timeout=args.probe_timeout,
+                                rates=rates, base_urls=base_urls)
+        print_probe_results(results, catalog["label"])
+        target["entries"] = apply_probe_results(target["entries"], results)
+        target["measurements"] = probe_measurements(results)
+    return targets
+
+def resolve_api_keys():
+    """Load API keys from the environment, initializing Firebase only if one is missing"""
+    keys = load_api_keys()
+    if not all(keys.values()):
+        keys = load_api_keys(initialize_firebase())
+    return keys
+
+def benchmark_targets(targets, args):
+    """Benchmark the models catalogs, save the results and optionally rewrite order"""
+    keys = resolve_api_keys()
+    rates = parse_provider_values(args.probe_rate, float)
+    base_urls = parse_provider_values(args.probe_base_url)
+    for target in targets:
+        catalog = target["catalog"]
+        if catalog["kind"] != "models":
+            continue
+        samples = benchmark_catalog(target["entries"], CATALOG_PROVIDERS[catalog["name"]], keys,
+                                    repetitions=args.benchmark_runs, concurrency=args.probe_concurrency,
+                                    timeout=args.probe_timeout, rates=rates, base_urls=base_urls,
+                                    max_tokens=args.benchmark_max_tokens)
+        summary = summarize_samples(samples)
+        print_benchmark_summary(summary, catalog["label"])
+        save_benchmark_results(args.benchmark_results, catalog["name"], summary,
+                               args.benchmark_runs, args.benchmark_max_tokens)
+
+        if args.apply_order:
+            if detect_format(catalog["csv"]) != "csv":
+                print(f"⏭️ --apply-order only rewrites CSV files, not {catalog['csv']}")
+                continue
+            ranked = rank_order(target["entries"], summary)
+            moved = sum(1 for old, new in zip(target["entries"], ranked) if old['apiModel'] != new['apiModel'])
+            print(f"🔀 {moved} {catalog['label']} change position")
+            save_models_to_csv(catalog["csv"], ranked)
+
+def plan_sync(sync):
+    """Plan every loaded catalog, print its diff and return the ones that changed"""
+    sync.plan()
+    for target in sync.targets:
+        print_catalog_diff(target["plan"]["diff"], target["catalog"]["label"])
+    return sync.changed
+
+def verify_sync(sync):
+    """Read back what apply() wrote and print the result of each catalog"""
+    try:
+        return print_verification(sync.verify())
+    except Exception as e:
+        print(f"❌ Error verifying update: {e}")
+        return False
+
+def plan_offline(catalogs, args):
+    """Validate every CSV and diff it against the local snapshot, without Firebase
+
+    Returns False when validation failed.
+    """
+    ok = True
+    for catalog in catalogs:
+        entry = load_snapshot_entry(catalog["document"])
+        snapshot = entry["data"] if entry else None
+        if catalog["kind"] == "exp":
+            if not source_exists(catalog["csv"]):
+                continue
+            entries = load_exp_models_from_csv(catalog["csv"], catalog["format"])
+            if entries is None:
+                ok = False
+                continue
+            models = merge_exp_models(exp_entries(snapshot), entries)
+            layout, key = None, 'modelId'
+        else:
+            models, errors, warnings = validate_models_csv(catalog["csv"], catalog["label"], catalog["format"])
+            print_validation(catalog["csv"], errors, warnings)
+            if errors or (args.strict and warnings):
+                ok = False
+            if models is None:
+                continue
+            layout, key = choose_layout(models, args.shard_by), 'apiModel'
+
+        if snapshot is None:
+            print(f"📭 No cached snapshot of {COLLECTION_PATH}/{catalog['document']} "
+                  f"- run --list once online to create one")
+            continue
+
+        print(f"📦 Baseline {COLLECTION_PATH}/{catalog['document']}: {describe_snapshot(entry)}")
+        plan = plan_catalog_update(snapshot, models, key=key, layout=layout)
+        print_catalog_diff(plan["diff"], catalog["label"])
+        if plan["needsWrite"]:
+            print(f"📦 Would publish {COLLECTION_PATH}/{catalog['document']} "
+                  f"version {plan['catalogVersion']} ({plan['reason']})")
+    return ok
+
+def sync_targets(sync, args):
+    """Plan, confirm, apply and verify the catalogs loaded into a CatalogSync
+
+    Returns False when the write or the verification failed.
+    """
+    changed = plan_sync(sync)
+    if not changed:
+        if any(target.get("measurements") is not None for target in sync.targets):
+            try:
+                sync.apply()
+            except Exception as e:
+                print(f"❌ Error writing probe latencies: {e}")
+                return False
+            print("\n✅ All catalogs are already up to date - published the probe latencies only")
+            return True
+        print("\n✅ All catalogs are already up to date - nothing to write")
+        return True
+
+    print(f"\n⚠️ This will update {len(changed)} document(s) in one batch:")
+    for target in changed:
+        print(f"   • {COLLECTION_PATH}/{target['document']} → version {target['plan']['catalogVersion']}")
+    if not args.yes:
+        confirm = input("Continue? (y/n): ").strip().lower()
+        if confirm != 'y':
+            print("❌ Cancelled")
+            return True
+
+    try:
+        written = sync.apply()
+    except Exception as e:
+        print(f"❌ Error writing batch: {e}")
+        return False
+
+    print(f"\n✅ Successfully updated {written} document(s) atomically")
+    return verify_sync(sync)
+
+def fanout_targets(projects, targets, args):
+    """Plan, confirm and publish the targets to every project of a manifest
+
+    All projects are planned concurrently. Canary projects are then
+    published one at a time; if one fails, no other project is touched.
+    The rest are published concurrently. Returns False if any project failed.
+    """
+    by_name = {project["name"]: project for project in projects}
+    results = {name: {} for name in by_name}
+    plans = {}
+
+    def plan(project):
+        own = [target for target in targets
+               if not project["catalogs"] or target["catalog"]["name"] in project["catalogs"]]
+        if not own:
+            return 0
+        db = initialize_project(project["name"], project["credentials"], project["projectId"])
+        plans[project["name"]] = bind_targets(db, own, args, project["name"])
+        return len(plan_sync(plans[project["name"]]))
+
+    def publish(project):
+        sync = plans[project["name"]]
+        written = sync.apply()
+        print(f"✅ Updated {written} document(s) atomically")
+        if not verify_sync(sync):
+            raise RuntimeError("verification failed")
+        return written
+
+    print(f"\n🌐 Planning {len(projects)} project(s)")
+    for name, outcome in run_parallel(projects, plan, args.fanout_workers).items():
+        results[name]["plan"] = outcome["seconds"]
+        if not outcome["ok"]:
+            results[name]["status"] = "❌ plan failed"
+        elif not outcome["result"]:
+            results[name]["status"] = "✅ up to date"
+
+    pending = [project for project in projects if "status" not in results[project["name"]]]
+    failed_canary = [project["name"] for project in projects
+                     if project["canary"] and results[project["name"]].get("status") == "❌ plan failed"]
+    if pending and not failed_canary:
+        print(f"\n⚠️ This will update {len(pending)} project(s):")
+        for project in pending:
+            documents = [target["document"] for target in plans[project["name"]].changed]
+            canary = " (canary)" if project["canary"] else ""
+            print(f"   • {project['name']}{canary}: {', '.join(documents)}")
+        if not args.yes and input("Continue? (y/n): ").strip().lower() != 'y':
+            print("❌ Cancelled")
+            pending = []
+
+    def record(outcomes):
+        for name, outcome in outcomes.items():
+            results[name]["publish"] = outcome["seconds"]
+            results[name]["status"] = (f"✅ published {outcome['result']} document(s)" if outcome["ok"]
+                                       else "❌ publish failed")
+            if not outcome["ok"] and by_name[name]["canary"]:
+                failed_canary.append(name)
+
+    # Canaries go first and alone: a rejected update stops the fan-out
+    for project in [project for project in pending if project["canary"]]:
+        if failed_canary:
+            break
+        print(f"\n🐤 Publishing canary {project['name']}")
+        record(run_parallel([project], publish))
+
+    rest = [project for project in pending if not project["canary"]]
+    if failed_canary:
+        print(f"\n🛑 Canary {', '.join(failed_canary)} failed - not publishing to the other projects")
+        for project in pending:
+            results[project["name"]].setdefault("status", "⏸️ skipped (canary failed)")
+    elif rest:
+        print(f"\n🚀 Publishing {len(rest)} project(s) concurrently")
+        record(run_parallel(rest, publish, args.fanout_workers))
+
+    for project in projects:
+        results[project["name"]].setdefault("status", "⏸️ not published")
+    print_fanout_report(projects, results)
+    return not any(result["status"].startswith("❌") for result in results.values())
+
+def rollback_catalog(db, catalog, version, args):
+    """Publish a version from a catalog's history again, as a new version
+
+    The models come from the compressed history snapshot, so no CSV is
+    read. Returns False when the version cannot be restored or the write
+    or verification failed.
+    """
+    document = catalog["document"]
+    if catalog["kind"] == "exp":
+        print(f"❌ {document} is also written by devices - use manage_exp_models.py instead of --rollback")
+        return False
+    try:
+        models, catalog_hash = load_version(db, COLLECTION_PATH, document, version)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return False
+    if compute_catalog_hash(models) != catalog_hash:
+        print(f"❌ {document} version {version}: snapshot does not match its catalogHash")
+        return False
+
+    sync = make_sync(db, [catalog], args)
+    try:
+        target, = sync.load({catalog["name"]: models})
+    except CatalogError as e:
+        print_validation(f"{document} version {version}", e.errors, e.warnings)
+        print(f"❌ {document} version {version} no longer validates - fix it with a normal sync instead")
+        return False
+    target["history"] = {"rollbackOf": version}
+
+    print(f"\n⏪ Rolling {COLLECTION_PATH}/{document} back to version {version} ({len(models)} entries)")
+    plan_sync(sync)
+    plan = target["plan"]
+    if not plan["needsWrite"]:
+        print(f"\n✅ {COLLECTION_PATH}/{document} already matches version {version} - nothing to write")
+        return True
+
+    print(f"\n⚠️ This will publish version {version} as {COLLECTION_PATH}/{document} "
+          f"version {plan['catalogVersion']}")
+    if not args.yes:
+        confirm = input("Continue? (y/n): ").strip().lower()
+        if confirm != 'y':
+            print("❌ Cancelled")
+            return True
+
+    try:
+        sync.apply()
+    except Exception as e:
+        print(f"❌ Error writing rollback: {e}")
+        return False
+    print(f"\n✅ Rolled back to version {version} (published as version {plan['catalogVersion']})")
+    return verify_sync(sync)
+
+def watch_catalogs(db, catalogs, args):
+    """Publish each catalog again whenever its CSV changes, until interrupted"""
+    by_path = {os.path.abspath(catalog["csv"]): catalog for catalog in catalogs}
+    watcher = make_watcher(by_path, args.poll, args.poll_interval)
+    print(f"\n👀 Watching {len(by_path)} CSV file(s) ({type(watcher).__name__}, "
+          f"debounce {args.debounce:g}s) - Ctrl+C to stop")
+    for path in sorted(by_path):
+        print(f"   • {path}")
+
+    try:
+        while True:
+            changed = collect_changes(watcher, args.debounce)
+            # Only the saved files are parsed and planned again; a half-finished
+            # edit fails validation and holds the batch back until it is fixed
+            for path in sorted(changed):
+                print(f"\n📝 {os.path.basename(path)} changed")
+            targets = load_catalogs([by_path[path] for path in sorted(changed)])
+            if targets is None:
+                print("⏸️ Not publishing until the errors above are fixed")
+                continue
+            if not targets:
+                continue
+
+            try:
+                sync = bind_targets(db, targets, args)
+                if args.probe:
+                    probe_targets(db, sync.targets, args)
+                sync_targets(sync, args)
+            except Exception as e:
+                print(f"❌ Error syncing: {e}")
+    finally:
+        watcher.close()
+
+def list_catalogs(db, catalogs, cache=True):
+    """List current catalogs in Firestore (db=None lists the local snapshots)
+
+    cache=False reads every document and leaves the local snapshots alone,
+    for the emulator and memory backends.
+    """
+    try:
+        documents = [catalog["document"] for catalog in catalogs]
+        if db is None:
+            current = {}
+            for document in documents:
+                entry = load_snapshot_entry(document)
+                if entry:
+                    print(f"📦 {COLLECTION_PATH}/{document}: {describe_snapshot(entry)}")
+                current[document] = entry["data"] if entry else None
+        else:
+            current = read_catalogs(db, documents, use_cache=cache, allow_stale=cache, keep_snapshots=cache)
+        for catalog in catalogs:
+            data = current.get(catalog["document"])
+            if data is None:
+                print(f"\n📋 {COLLECTION_PATH}/{catalog['document']} does not exist yet")
+                continue
+
+            entries = data.get('list', [])
+            layout = f", {data.get('shardCount')} shards" if data.get('sharded') else ""
+            print(f"\n📋 {COLLECTION_PATH}/{catalog['document']} ({len(entries)} total, "
+                  f"version {data.get('catalogVersion', 'N/A')}{layout}):")
+            for i, entry in enumerate(entries[:15], 1):
+                if catalog["kind"] == "exp":
+                    print(f"   {i:2d}. {entry.get('modelName', 'N/A'):35s} → {entry.get('modelId', 'N/A')}")
+                else:
+                    status = "✅" if entry.get("isAvailable", True) else "❌"
+                    print(f"   {i:2d}. {status} {entry.get('displayName', 'N/A'):35s} → {entry.get('apiModel', 'N/A')}")
+            if len(entries) > 15:
+                print(f"   ... and {len(entries) - 15} more")
+    except Exception as e:
+        print(f"❌ Error listing catalogs: {e}")
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def run(args):
+    """Run the mode selected on the command line"""
+    catalogs = selected_catalogs(args)
+    piped = [catalog["name"] for catalog in catalogs if catalog["csv"] == STDIN]
+    if len(piped) > 1:
+        print(f"❌ Only one catalog can be read from stdin (got {', '.join(piped)})")
+        sys.exit(1)
+    if piped and args.watch:
+        print("❌ --watch needs files to watch, not stdin")
+        sys.exit(1)
+
+    if args.plan:
+        if not plan_offline(catalogs, args):
+            print("\n❌ Validation failed")
+            sys.exit(1)
+        print("\n✅ Plan complete (offline, nothing written)")
+        return
+
+    if args.emulator_host and args.backend != "emulator":
+        print("❌ --emulator-host needs --backend emulator")
+        sys.exit(1)
+
+    if args.list:
+        db = None if args.offline else open_db(args)
+        list_catalogs(db, catalogs, args.backend == "firestore")
+        return
+
+    if args.history:
+        db = open_db(args)
+        for catalog in catalogs:
+            print_history(f"{COLLECTION_PATH}/{catalog['document']}",
+                          read_history(db, COLLECTION_PATH, catalog["document"]))
+        return
+
+    if args.rollback is not None:
+        if len(catalogs) != 1:
+            print("❌ --rollback needs exactly one catalog, e.g. --only models")
+            sys.exit(1)
+        if not rollback_catalog(open_db(args), catalogs[0], args.rollback, args):
+            sys.exit(1)
+        return
+
+    targets = load_catalogs(catalogs)
+    if not targets:
+        print("❌ Nothing to sync")
+        sys.exit(1)
+
+    if args.benchmark:
+        benchmark_targets(targets, args)
+        return
+
+    if args.projects:
+        if args.watch:
+            print("❌ --watch cannot be combined with --projects")
+            sys.exit(1)
+        if args.backend != "firestore":
+            print("❌ --projects publishes to the Firebase projects of its manifest, not --backend")
+            sys.exit(1)
+        try:
+            projects = load_manifest(args.projects, [catalog["name"] for catalog in CATALOGS])
+        except Exception as e:
+            print(f"❌ Invalid project manifest {args.projects}: {e}")
+            sys.exit(1)
+        if args.probe:
+            # Probe once, with the API keys of the first project
+            first = projects[0]
+            targets = probe_targets(initialize_project(first["name"], first["credentials"], first["projectId"]),
+                                    targets, args)
+        if not fanout_targets(projects, targets, args):
+            sys.exit(1)
+        return
+
+    db = open_db(args)
+    sync = bind_targets(db, targets, args)
+    if args.probe:
+        probe_targets(db, sync.targets, args)
+    if not sync_targets(sync, args):
+        sys.exit(1)
+
+    if args.watch:
+        watch_catalogs(db, catalogs, args)
+
+def main(argv=None):
+    """Main function"""
+
+    print("\n" + "="*60)
+    print("🔥 Firebase Catalog Updater for Mark VII")
+    print("="*60)
+
+    args = parse_args(argv)
+    with reporting(args.report, args.spans, "update_firebase_catalogs"):
+        run(args)
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n👋 Interrupted by user. Goodbye!")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ Unexpected error: {e}")
+        sys.exit(1)
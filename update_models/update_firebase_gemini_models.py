@@ -10,124 +10,43 @@ Requirements:
     pip install firebase-admin
 """
 
-import firebase_admin
-from firebase_admin import credentials, firestore
 import sys
 import os
 import csv
 
+from run_report import reporting
+from firebase_common import initialize_firebase, SCRIPT_DIR
+from catalog_sync import (
+    load_models_from_csv, sync_catalog, read_catalogs, COLLECTION_PATH, HASH_FIELD, VERSION_FIELD
+)
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
 
-# Path to your Firebase service account key (download from Firebase Console)
-SERVICE_ACCOUNT_KEY = "D:/Workspace/Project/Android-Studio/Mark-VII/update_models/mark-vii-firebase-service-account-key.json"
-
-# Your Firestore collection paths
-COLLECTION_PATH = "app_config"
+# Your Firestore document
 GEMINI_MODELS_DOCUMENT = "gemini_models"
 
 # Default CSV file name
-DEFAULT_CSV_FILE = "D:/Workspace/Project/Android-Studio/Mark-VII/update_models/gemini_models.csv"
+DEFAULT_CSV_FILE = os.path.join(SCRIPT_DIR, "gemini_models.csv")
 
 # ============================================================================
 # FUNCTIONS
 # ============================================================================
 
-def initialize_firebase():
-    """Initialize Firebase Admin SDK"""
-    try:
-        if not os.path.exists(SERVICE_ACCOUNT_KEY):
-            print(f"❌ Error: Service account key not found!")
-            print(f"📥 Download it from:")
-            print(f"   Firebase Console → Project Settings → Service Accounts")
-            print(f"   → Generate New Private Key")
-            print(f"📁 Save it as: {SERVICE_ACCOUNT_KEY}")
-            sys.exit(1)
-        
-        # Check if already initialized
-        try:
-            firebase_admin.get_app()
-            print("✅ Firebase already initialized")
-        except ValueError:
-            cred = credentials.Certificate(SERVICE_ACCOUNT_KEY)
-            firebase_admin.initialize_app(cred)
-            print("✅ Firebase initialized successfully")
-        
-        return firestore.client()
-    except Exception as e:
-        print(f"❌ Error initializing Firebase: {e}")
-        sys.exit(1)
-
 def load_gemini_models_from_csv(csv_file):
     """Load Gemini models from CSV file"""
-    try:
-        if not os.path.exists(csv_file):
-            print(f"❌ Error: CSV file not found: {csv_file}")
-            return None
-        
-        models = []
-        with open(csv_file, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            
-            # Check required columns
-            required_columns = ['displayName', 'apiModel', 'isAvailable', 'order', 'isPro']
-            if not all(col in reader.fieldnames for col in required_columns):
-                print(f"❌ Error: CSV must have columns: {', '.join(required_columns)}")
-                print(f"   Found columns: {', '.join(reader.fieldnames)}")
-                return None
-            
-            for i, row in enumerate(reader, 1):
-                try:
-                    # Parse isAvailable (handle various formats)
-                    is_available_str = row['isAvailable'].strip().lower()
-                    is_available = is_available_str in ['true', 'yes', '1', 'y']
-                    
-                    # Parse order
-                    order = int(row['order'].strip())
-                    
-                    # Parse isPro
-                    is_pro_str = row.get('isPro', 'FALSE').strip().lower()
-                    is_pro = is_pro_str in ['true', 'yes', '1', 'y']
-                    
-                    model = {
-                        "displayName": row['displayName'].strip(),
-                        "apiModel": row['apiModel'].strip(),
-                        "isAvailable": is_available,
-                        "order": order,
-                        "isPro": is_pro
-                    }
-                    
-                    models.append(model)
-                except Exception as e:
-                    print(f"⚠️ Warning: Error parsing row {i}: {e}")
-                    continue
-        
-        if models:
-            print(f"✅ Loaded {len(models)} Gemini models from {csv_file}")
-            return models
-        else:
-            print(f"❌ No valid models found in {csv_file}")
-            return None
-            
-    except Exception as e:
-        print(f"❌ Error reading CSV file: {e}")
-        return None
+    return load_models_from_csv(csv_file, label="Gemini models")
 
 def update_gemini_models(db, models):
-    """Update Gemini models in Firestore"""
+    """Update Gemini models in Firestore (only writes when the list changed)"""
     try:
-        # Reference to the gemini_models document
-        doc_ref = db.collection(COLLECTION_PATH).document(GEMINI_MODELS_DOCUMENT)
-        
-        # Prepare the data - Field name must be "list" to match Android app!
-        models_data = {
-            "list": models,  # Android app expects "list" not "models"
-            "lastUpdated": firestore.SERVER_TIMESTAMP
-        }
-        
-        # Update/Create the document
-        doc_ref.set(models_data, merge=True)
+        # Diff against the current document and publish catalogHash/catalogVersion
+        plan = sync_catalog(db, GEMINI_MODELS_DOCUMENT, models, label="Gemini models")
+        if plan is None:
+            return None
+        if not plan["needsWrite"]:
+            return plan
         
         print(f"\n✅ Successfully updated {len(models)} Gemini models!")
         print(f"📍 Location: {COLLECTION_PATH}/{GEMINI_MODELS_DOCUMENT}")
@@ -136,21 +55,24 @@ def update_gemini_models(db, models):
             status = "✅" if model["isAvailable"] else "❌"
             print(f"   {i:2d}. {status} {model['displayName']:40s} → {model['apiModel']}")
         
-        return True
+        return plan
     except Exception as e:
         print(f"❌ Error updating Gemini models: {e}")
-        return False
+        return None
 
-def verify_update(db):
+def verify_update(db, expected_hash=None):
     """Verify the update by reading back the data"""
     try:
-        doc_ref = db.collection(COLLECTION_PATH).document(GEMINI_MODELS_DOCUMENT)
-        doc = doc_ref.get()
+        # Reassembles the list from shards when the catalog is sharded
+        data = read_catalogs(db, [GEMINI_MODELS_DOCUMENT], use_cache=True)[GEMINI_MODELS_DOCUMENT]
         
-        if doc.exists:
-            data = doc.to_dict()
+        if data is not None:
             print(f"\n✅ Verification successful!")
             print(f"📊 Total Gemini models in Firestore: {len(data.get('list', []))}")
+            print(f"🏷️ Catalog version: {data.get(VERSION_FIELD, 'N/A')}")
+            if expected_hash and data.get(HASH_FIELD) != expected_hash:
+                print(f"⚠️ Warning: {HASH_FIELD} does not match the published catalog")
+                return False
             return True
         else:
             print(f"\n⚠️ Warning: Could not verify update")
@@ -162,11 +84,10 @@ def verify_update(db):
 def list_current_gemini_models(db):
     """List current Gemini models in Firestore"""
     try:
-        doc_ref = db.collection(COLLECTION_PATH).document(GEMINI_MODELS_DOCUMENT)
-        doc = doc_ref.get()
+        # Reassembles the list from shards when the catalog is sharded
+        data = read_catalogs(db, [GEMINI_MODELS_DOCUMENT], use_cache=True, allow_stale=True)[GEMINI_MODELS_DOCUMENT]
         
-        if doc.exists:
-            data = doc.to_dict()
+        if data is not None:
             models = data.get('list', [])
             
             if models:
@@ -211,6 +132,24 @@ def main():
     print("🔥 Firebase Gemini Model Updater for Mark VII")
     print("="*60)
     
+    # --yes / -y skips the confirmation prompt (for scripts and CI)
+    auto_confirm = any(arg in ("--yes", "-y") for arg in sys.argv[1:])
+    sys.argv = [arg for arg in sys.argv if arg not in ("--yes", "-y")]
+    
+    # --report FILE writes a JSON run report (phase timings, Firestore reads/writes)
+    report_file = None
+    if "--report" in sys.argv:
+        index = sys.argv.index("--report")
+        has_file = index + 1 < len(sys.argv) and not sys.argv[index + 1].startswith("-")
+        report_file = sys.argv[index + 1] if has_file else "run_report.json"
+        del sys.argv[index:index + (2 if has_file else 1)]
+    
+    with reporting(report_file, script="update_firebase_gemini_models"):
+        run_commands(auto_confirm)
+
+def run_commands(auto_confirm):
+    """Handle the command line arguments left after the options"""
+    
     # Check command line arguments
     if len(sys.argv) > 1:
         if sys.argv[1] == "--help" or sys.argv[1] == "-h":
@@ -218,6 +157,8 @@ def main():
             print("  python update_firebase_gemini_models.py --csv gemini_models.csv   # Update from CSV")
             print("  python update_firebase_gemini_models.py --list                    # List current models")
             print("  python update_firebase_gemini_models.py --sample                  # Create sample CSV")
+            print("  python update_firebase_gemini_models.py --yes                     # Skip the confirmation prompt")
+            print("  python update_firebase_gemini_models.py --report run.json         # Write a timing/cost report")
             print("  python update_firebase_gemini_models.py --help                    # Show this help")
             print("\nCSV Format:")
             print("  displayName,apiModel,isAvailable,order")
@@ -225,6 +166,10 @@ def main():
             print("  Gemini 2.0 Flash,gemini-2.0-flash-exp,TRUE,1")
             print("  Gemini 1.5 Flash,gemini-1.5-flash,TRUE,2")
             sys.exit(0)
+        if sys.argv[1] == "--sample":
+            # Offline - no Firebase needed
+            create_sample_csv()
+            sys.exit(0)
     
     # Initialize Firebase
     db = initialize_firebase()
@@ -245,16 +190,15 @@ def main():
                     print(f"   {i:2d}. {status} {model['displayName']:40s} → {model['apiModel']}")
                 
                 print(f"\n⚠️ This will upload {len(models)} Gemini models to Firestore")
-                confirm = input("Continue? (y/n): ").strip().lower()
+                confirm = 'y' if auto_confirm else input("Continue? (y/n): ").strip().lower()
                 if confirm == 'y':
-                    if update_gemini_models(db, models):
-                        verify_update(db)
+                    plan = update_gemini_models(db, models)
+                    if plan and plan["needsWrite"]:
+                        verify_update(db, plan["catalogHash"])
                 else:
                     print("❌ Cancelled")
         elif sys.argv[1] == "--list":
             list_current_gemini_models(db)
-        elif sys.argv[1] == "--sample":
-            create_sample_csv()
         else:
             print(f"❌ Unknown argument: {sys.argv[1]}")
             print("Use --help for usage information")
@@ -278,10 +222,11 @@ def main():
                 print(f"   {i:2d}. {status} {model['displayName']:40s} → {model['apiModel']}")
             
             print(f"\n⚠️ This will upload {len(models)} Gemini models to Firestore")
-            confirm = input("Continue? (y/n): ").strip().lower()
+            confirm = 'y' if auto_confirm else input("Continue? (y/n): ").strip().lower()
             if confirm == 'y':
-                if update_gemini_models(db, models):
-                    verify_update(db)
+                plan = update_gemini_models(db, models)
+                if plan and plan["needsWrite"]:
+                    verify_update(db, plan["catalogHash"])
             else:
                 print("❌ Cancelled")
 